@@ -67,9 +67,14 @@ ADD_SOURCE = 0
 REMOVE_SOURCE = 1
 
 class AstInterpreter(interpreterbase.InterpreterBase):
-    def __init__(self, source_root: str, subdir: str, subproject: str, visitors: T.Optional[T.List[AstVisitor]] = None):
+    def __init__(self, source_root: str, subdir: str, subproject: str, visitors: T.Optional[T.List[AstVisitor]] = None,
+                 cache_dir: T.Optional[str] = None):
         super().__init__(source_root, subdir, subproject)
         self.visitors = visitors if visitors is not None else []
+        # A build directory can share its parse cache with us
+        self.cache_dir = cache_dir
+        if cache_dir is not None:
+            self.parse_cache = mparser.ParseCache(cache_dir)
         self.processed_buildfiles = set() # type: T.Set[str]
         self.assignments = {}             # type: T.Dict[str, BaseNode]
         self.assign_vals = {}             # type: T.Dict[str, T.Any]
@@ -164,7 +169,7 @@ class AstInterpreter(interpreterbase.InterpreterBase):
             code = f.read()
         assert(isinstance(code, str))
         try:
-            codeblock = mparser.Parser(code, absname).parse()
+            codeblock = self.parse_build_file(code, absname)
         except mesonlib.MesonException as me:
             me.file = absname
             raise me
@@ -23,6 +23,7 @@ import pickle
 import re
 import typing as T
 import hashlib
+import heapq
 
 from .. import build
 from .. import dependencies
@@ -30,6 +31,7 @@ from .. import programs
 from .. import mesonlib
 from .. import mlog
 from ..compilers import LANGUAGES_USING_LDFLAGS
+from ..mparser import Lexer
 from ..mesonlib import (
     File, MachineChoice, MesonException, OptionType, OrderedSet, OptionOverrideProxy,
     classify_unity_sources, unholder, OptionKey, join_args
@@ -51,10 +53,66 @@ if T.TYPE_CHECKING:
 LANGS_CANT_UNITY = ('d', 'fortran', 'vala')
 
 class RegenInfo:
-    def __init__(self, source_dir, build_dir, depfiles):
+    def __init__(self, source_dir, build_dir, depfiles, depfile_hashes=None):
         self.source_dir = source_dir
         self.build_dir = build_dir
         self.depfiles = depfiles
+        # Content hashes of the depfiles, see hash_depfile()
+        self.depfile_hashes = depfile_hashes if depfile_hashes is not None else {}
+
+def hash_depfile(filename: str) -> T.Optional[str]:
+    """Hash a file that leads to reconfiguration when it changes.
+
+    Build definition files are hashed by their tokens, so editing comments,
+    whitespace or blank lines does not change their hash and does not
+    require running the interpreter again. Other files, like coredata.dat
+    or machine files, are hashed by their content.
+    """
+    h = hashlib.sha256()
+    try:
+        with open(filename, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    if os.path.basename(filename) not in {'meson.build', 'meson_options.txt'}:
+        h.update(data)
+        return h.hexdigest()
+    try:
+        code = data.decode('utf-8')
+        # Blank lines, including leading ones, do not matter
+        previous = 'eol'
+        for token in Lexer(code).lex(filename):
+            if token.tid == 'eol' and previous == 'eol':
+                continue
+            previous = token.tid
+            h.update(f'{token.tid}\0{token.value!r}\1'.encode('utf-8', errors='surrogateescape'))
+    except (UnicodeDecodeError, MesonException):
+        # Let the interpreter report the error
+        return None
+    return h.hexdigest()
+
+def read_ninja_log(filename: str) -> T.Dict[str, int]:
+    """Read how long building each output took from a .ninja_log.
+
+    Returns the duration in milliseconds of the last build of every output,
+    keyed by its path relative to the build directory.
+    """
+    durations = {}  # type: T.Dict[str, int]
+    try:
+        with open(filename, encoding='utf-8', errors='surrogateescape') as f:
+            for line in f:
+                if line.startswith('#'):
+                    continue
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) < 5:
+                    continue
+                try:
+                    durations[os.path.normpath(fields[3])] = int(fields[1]) - int(fields[0])
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return durations
 
 class TestProtocol(enum.Enum):
 
@@ -157,6 +215,7 @@ class ExecutableSerialisation:
         self.skip_if_destdir = False
         self.verbose = False
         self.subproject = ''
+        self.write_if_changed = []  # type: T.List[str]
 
 class TestSerialisation:
     def __init__(self, name: str, project: str, suite: str, fname: T.List[str],
@@ -165,7 +224,8 @@ class TestSerialisation:
                  env: build.EnvironmentVariables, should_fail: bool,
                  timeout: T.Optional[int], workdir: T.Optional[str],
                  extra_paths: T.List[str], protocol: TestProtocol, priority: int,
-                 cmd_is_built: bool, depends: T.List[str], version: str):
+                 cmd_is_built: bool, depends: T.List[str], version: str,
+                 cpus: int, memory: int, shared_libs: T.List[str]):
         self.name = name
         self.project_name = project
         self.suite = suite
@@ -187,6 +247,11 @@ class TestSerialisation:
         self.cmd_is_built = cmd_is_built
         self.depends = depends
         self.version = version
+        # Number of processors and megabytes of memory the test uses
+        self.cpus = cpus
+        self.memory = memory
+        # Ids of the shared libraries the programs in depends link to
+        self.shared_libs = shared_libs
 
 
 def get_backend_from_name(backend: str, build: T.Optional[build.Build] = None, interpreter: T.Optional['Interpreter'] = None) -> T.Optional['Backend']:
@@ -233,6 +298,8 @@ class Backend:
                                              self.environment.get_build_dir())
         self.src_to_build = mesonlib.relpath(self.environment.get_build_dir(),
                                              self.environment.get_source_dir())
+        # Read lazily by get_build_durations()
+        self.build_durations = None  # type: T.Optional[T.Dict[str, int]]
 
     def generate(self) -> None:
         raise RuntimeError('generate is not implemented in {}'.format(type(self).__name__))
@@ -360,6 +427,7 @@ class Backend:
         result = []
         compsrcs = classify_unity_sources(target.compilers.values(), unity_src)
         unity_size = self.get_option_for_target(OptionKey('unity_size'), target)
+        unity_partition = self.get_option_for_target(OptionKey('unity_partition'), target)
 
         def init_language_file(suffix, unity_file_number):
             unity_src = self.get_unity_source_file(target, suffix, unity_file_number)
@@ -375,24 +443,132 @@ class Backend:
 
         # For each language, generate unity source files and return the list
         for comp, srcs in compsrcs.items():
-            files_in_current = unity_size + 1
-            unity_file_number = 0
-            ofile = None
-            for src in srcs:
-                if files_in_current >= unity_size:
-                    if ofile:
-                        ofile.close()
-                    ofile = init_language_file(comp.get_default_suffix(), unity_file_number)
-                    unity_file_number += 1
-                    files_in_current = 0
-                ofile.write(f'#include<{src}>\n')
-                files_in_current += 1
-            if ofile:
-                ofile.close()
+            suffix = comp.get_default_suffix()
+            if unity_partition == 'cost':
+                groups = self.partition_unity_sources(target, suffix, srcs, unity_size)
+            else:
+                groups = [srcs[i:i + unity_size] for i in range(0, len(srcs), unity_size)]
+            for unity_file_number, group in enumerate(groups):
+                with init_language_file(suffix, unity_file_number) as ofile:
+                    for src in group:
+                        ofile.write(f'#include<{src}>\n')
 
         [mesonlib.replace_if_different(x, x + '.tmp') for x in abs_files]
         return result
 
+    def get_build_durations(self) -> T.Dict[str, int]:
+        if self.build_durations is None:
+            self.build_durations = read_ninja_log(os.path.join(self.environment.get_build_dir(), '.ninja_log'))
+        return self.build_durations
+
+    def read_unity_files(self, target, suffix: str) -> T.List[T.List[str]]:
+        """Read back the sources of the unity files written by the last generation."""
+        groups = []  # type: T.List[T.List[str]]
+        while True:
+            unity_src = self.get_unity_source_file(target, suffix, len(groups))
+            try:
+                with open(unity_src.absolute_path(self.environment.get_source_dir(),
+                                                  self.environment.get_build_dir())) as f:
+                    groups.append([l[9:-1] for l in f.read().splitlines() if l.startswith('#include<') and l.endswith('>')])
+            except OSError:
+                return groups
+
+    def get_unity_source_costs(self, target, suffix: str, srcs: T.List[str]) -> T.Dict[str, float]:
+        """Estimate how long compiling each of the sources of a unity build takes.
+
+        The time spent building the object of a previous unity file is
+        shared out among its sources by size, unless the unity file changed
+        since. Sources that were not part
+        of a unity build use the time of their own object instead, if they
+        were built before. Sources that were never built cost their size,
+        scaled by the time per byte of those that were.
+        """
+        durations = self.get_build_durations()
+        private_dir = self.get_target_private_dir(target)
+
+        def get_object_duration(src: mesonlib.File) -> T.Optional[int]:
+            obj = os.path.join(private_dir, self.object_filename_from_source(target, src))
+            return durations.get(os.path.normpath(obj))
+
+        sizes = {}  # type: T.Dict[str, int]
+
+        def get_size(src: str) -> int:
+            if src not in sizes:
+                try:
+                    sizes[src] = os.path.getsize(src)
+                except OSError:
+                    # Most likely a source that is not generated yet
+                    sizes[src] = 0
+            return sizes[src]
+
+        measured = {}  # type: T.Dict[str, float]
+        for number, group in enumerate(self.read_unity_files(target, suffix)):
+            unity_src = self.get_unity_source_file(target, suffix, number)
+            duration = get_object_duration(unity_src)
+            if duration is None or not group:
+                continue
+            # The time is meaningless if the sources changed since the build
+            obj = os.path.join(self.environment.get_build_dir(), private_dir,
+                               self.object_filename_from_source(target, unity_src))
+            try:
+                if os.path.getmtime(obj) < os.path.getmtime(unity_src.absolute_path(
+                        self.environment.get_source_dir(), self.environment.get_build_dir())):
+                    continue
+            except OSError:
+                continue
+            total = sum(get_size(s) for s in group)
+            for s in group:
+                measured[s] = duration * get_size(s) / total if total else duration / len(group)
+        for s in srcs:
+            if s not in measured and os.path.isabs(s):
+                build_dir = self.environment.get_build_dir()
+                if s.startswith(build_dir + os.sep):
+                    rel_src = os.path.relpath(s, build_dir)
+                    src = File.from_built_file(os.path.dirname(rel_src), os.path.basename(rel_src))
+                else:
+                    rel_src = os.path.relpath(s, self.environment.get_source_dir())
+                    src = File(False, os.path.dirname(rel_src), os.path.basename(rel_src))
+                duration = get_object_duration(src)
+                if duration is not None:
+                    measured[s] = duration
+
+        known_sizes = [get_size(s) for s in srcs if get_size(s)]
+        default_size = sum(known_sizes) / len(known_sizes) if known_sizes else 1
+        measured_size = sum(get_size(s) or default_size for s in srcs if s in measured)
+        scale = sum(measured[s] for s in srcs if s in measured) / measured_size if measured_size else 1
+        return {s: measured[s] if s in measured else (get_size(s) or default_size) * scale for s in srcs}
+
+    def partition_unity_sources(self, target, suffix: str, srcs: T.List[str],
+                                unity_size: int) -> T.List[T.List[str]]:
+        """Group the sources of a unity build so that the groups cost about the same.
+
+        There are as many groups as with unity_partition=order. The most
+        expensive sources are placed first, each in the cheapest group so
+        far. The previous grouping is kept unless it costs more than 10% more
+        than the new one, to avoid rebuilding everything on every reconfigure
+        because of timing noise.
+        """
+        costs = self.get_unity_source_costs(target, suffix, srcs)
+        count = (len(srcs) + unity_size - 1) // unity_size
+        # Break ties on the number of sources so that no group stays empty
+        heap = [(0.0, 0, i) for i in range(count)]
+        groups = [[] for _ in range(count)]  # type: T.List[T.List[str]]
+        for src in sorted(srcs, key=lambda s: -costs[s]):
+            cost, size, i = heapq.heappop(heap)
+            groups[i].append(src)
+            heapq.heappush(heap, (cost + costs[src], size + 1, i))
+        # Keep the order of the sources within each group
+        order = {s: i for i, s in enumerate(srcs)}
+        for g in groups:
+            g.sort(key=order.__getitem__)
+
+        previous = self.read_unity_files(target, suffix)
+        if len(previous) == count and sorted(chain.from_iterable(previous)) == sorted(srcs):
+            makespan = max(c for c, _, _ in heap)
+            if max(sum(costs[s] for s in g) for g in previous) <= makespan * 1.1:
+                return previous
+        return groups
+
     def relpath(self, todir, fromdir):
         return os.path.relpath(os.path.join('dummyprefixdir', todir),
                                os.path.join('dummyprefixdir', fromdir))
@@ -484,13 +660,18 @@ class Backend:
     def as_meson_exe_cmdline(self, tname, exe, cmd_args, workdir=None,
                              extra_bdeps=None, capture=None, force_serialize=False,
                              env: T.Optional[build.EnvironmentVariables] = None,
-                             verbose: bool = False):
+                             verbose: bool = False,
+                             write_if_changed: T.Optional[T.List[str]] = None):
         '''
         Serialize an executable for running with a generator or a custom target
+
+        The outputs listed in write_if_changed keep their timestamp when
+        the command rewrites them with the same content.
         '''
         cmd = [exe] + cmd_args
         es = self.get_executable_serialisation(cmd, workdir, extra_bdeps, capture, env)
         es.verbose = verbose
+        es.write_if_changed = write_if_changed or []
         reasons = []
         if es.extra_paths:
             reasons.append('to set PATH')
@@ -512,12 +693,18 @@ class Backend:
         if capture:
             reasons.append('to capture output')
 
+        if es.write_if_changed:
+            reasons.append('to keep unchanged outputs')
+
         if not force_serialize:
-            if not capture:
+            if not capture and not es.write_if_changed:
                 return es.cmd_args, ''
-            return ((self.environment.get_build_command() +
-                    ['--internal', 'exe', '--capture', capture, '--'] + es.cmd_args),
-                    ', '.join(reasons))
+            wrapper = self.environment.get_build_command() + ['--internal', 'exe']
+            if capture:
+                wrapper += ['--capture', capture]
+            for o in es.write_if_changed:
+                wrapper += ['--write-if-changed', o]
+            return (wrapper + ['--'] + es.cmd_args, ', '.join(reasons))
 
         if isinstance(exe, (programs.ExternalProgram,
                             build.BuildTarget, build.CustomTarget)):
@@ -531,9 +718,10 @@ class Backend:
         # Take a digest of the cmd args, env, workdir, and capture. This avoids
         # collisions and also makes the name deterministic over regenerations
         # which avoids a rebuild by Ninja because the cmdline stays the same.
-        data = bytes(str(es.env) + str(es.cmd_args) + str(es.workdir) + str(capture),
-                     encoding='utf-8')
-        digest = hashlib.sha1(data).hexdigest()
+        data = str(es.env) + str(es.cmd_args) + str(es.workdir) + str(capture)
+        if es.write_if_changed:
+            data += str(es.write_if_changed)
+        digest = hashlib.sha1(data.encode('utf-8')).hexdigest()
         scratch_file = f'meson_exe_{basename}_{digest}.dat'
         exe_data = os.path.join(self.environment.get_scratch_dir(), scratch_file)
         with open(exe_data, 'wb') as f:
@@ -722,7 +910,7 @@ class Backend:
                 if comp.language in LANGS_CANT_UNITY:
                     sources += srcs
                     continue
-                for i in range(len(srcs) // unity_size + 1):
+                for i in range((len(srcs) + unity_size - 1) // unity_size):
                     osrc = self.get_unity_source_file(extobj.target,
                                                       comp.get_default_suffix(), i)
                     sources.append(osrc)
@@ -738,11 +926,21 @@ class Backend:
         args = []
         pchpath = self.get_target_private_dir(target)
         includeargs = compiler.get_include_args(pchpath, False)
-        p = target.get_pch(compiler.get_language())
+        p = self.get_target_pch(target, compiler.get_language())
         if p:
-            args += compiler.get_pch_use_args(pchpath, p[0])
+            pch_dir = self.get_target_pch_dir(target, compiler.get_language())
+            if pch_dir != pchpath:
+                # It must be found before any header of the same name
+                includeargs = compiler.get_include_args(pch_dir, False) + includeargs
+            args += compiler.get_pch_use_args(pch_dir, p[0])
         return includeargs + args
 
+    def get_target_pch(self, target, lang: str) -> T.List[str]:
+        return target.get_pch(lang)
+
+    def get_target_pch_dir(self, target, lang: str) -> str:
+        return self.get_target_private_dir(target)
+
     def create_msvc_pch_implementation(self, target, lang, pch_header):
         # We have to include the language in the file name, otherwise
         # pch.c and pch.cpp will both end up as pch.obj in VS backends.
@@ -982,6 +1180,11 @@ class Backend:
                     cmd_args.append(self.construct_target_rel_path(a, t.workdir))
                 else:
                     raise MesonException('Bad object in test command.')
+            # The shared libraries loaded by the test programs at run time
+            shared_libs = OrderedSet()  # type: OrderedSet[build.Target]
+            for d in depends:
+                if isinstance(d, build.BuildTarget):
+                    shared_libs.update(d.get_transitive_link_deps())
             ts = TestSerialisation(t.get_name(), t.project_name, t.suite, cmd, is_cross,
                                    exe_wrapper, self.environment.need_exe_wrapper(),
                                    t.is_parallel, cmd_args, t.env,
@@ -989,7 +1192,9 @@ class Backend:
                                    extra_paths, t.protocol, t.priority,
                                    isinstance(exe, build.Executable),
                                    [x.get_id() for x in depends],
-                                   self.environment.coredata.version)
+                                   self.environment.coredata.version,
+                                   t.cpus, t.memory,
+                                   [x.get_id() for x in shared_libs if x not in depends])
             arr.append(ts)
         return arr
 
@@ -1028,9 +1233,16 @@ class Backend:
 
     def generate_regen_info(self):
         deps = self.get_regen_filelist()
+        build_dir = self.environment.get_build_dir()
+        hashes = {}
+        for d in deps:
+            h = hash_depfile(os.path.join(build_dir, d))
+            if h is not None:
+                hashes[d] = h
         regeninfo = RegenInfo(self.environment.get_source_dir(),
-                              self.environment.get_build_dir(),
-                              deps)
+                              build_dir,
+                              deps,
+                              hashes)
         filename = os.path.join(self.environment.get_scratch_dir(),
                                 'regeninfo.dump')
         with open(filename, 'wb') as f:
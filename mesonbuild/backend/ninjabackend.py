@@ -12,10 +12,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import typing as T
+import hashlib
+import io
+import json
+import multiprocessing
 import os
+import posixpath
 import re
 import pickle
 import shlex
+import shutil
 import subprocess
 from collections import OrderedDict
 from enum import Enum, unique
@@ -115,6 +121,32 @@ def get_rsp_threshold():
 # a conservative estimate of the command-line length limit
 rsp_threshold = get_rsp_threshold()
 
+# Variable values at least this long are only written once when they are
+# shared by several build statements of a target.
+INTERNED_VALUE_MIN_LENGTH = 40
+
+# With the auto_pch option, headers included by at least this share of the
+# sources of a target, and by at least two of them, are precompiled. Targets
+# with fewer sources are not worth it.
+AUTO_PCH_MIN_SHARE = 0.5
+AUTO_PCH_MIN_SOURCES = 3
+AUTO_PCH_INCLUDE_PAT = r'^[ \t]*#[ \t]*include[ \t]*<([^>\n]+)>'
+AUTO_PCH_COMMENT_PAT = r'/\*.*?\*/|//[^\n]*'
+
+# The memory used by a link is estimated from the size its inputs had in
+# the previous build, link time optimization uses several times more. Links
+# estimated to use more than HEAVY_LINK_MIN_MEMORY go to the pool limited by
+# backend_max_heavy_links. Inputs that were never built are assumed to be
+# as big as the other objects of the link, or DEFAULT_OBJECT_SIZE.
+LINK_MEMORY_FACTOR = 1
+LTO_LINK_MEMORY_FACTOR = 8
+HEAVY_LINK_MIN_MEMORY = 1024 * 1024 * 1024
+DEFAULT_OBJECT_SIZE = 64 * 1024
+
+# Set by NinjaBackend.generate_targets_parallel() right before forking the
+# worker processes, which inherit it.
+_generation_state = None  # type: T.Optional[T.Tuple[NinjaBackend, T.List[build.Target], T.Set[str]]]
+
 # ninja variables whose value should remain unquoted. The value of these ninja
 # variables (or variables we use them in) is interpreted directly by ninja
 # (e.g. the value of the depfile variable is a pathname that ninja will read
@@ -141,6 +173,38 @@ Please report this error with a test case to the Meson bug tracker.'''.format(te
         raise MesonException(errmsg)
     return quote_re.sub(r'$\g<0>', text)
 
+NINJA_EVAL_PAT = re.compile(r'\$(?:\{([\w.-]+)\}|([\w-]+)|(.))', re.DOTALL)
+NINJA_SHELL_SAFE_PAT = re.compile(r'[\w+./-]*', re.ASCII)
+
+def ninja_evaluate(text: str, variables: T.Dict[str, str]) -> str:
+    '''Expand the variables and escapes of a ninja value, like ninja does.'''
+    def repl(m: T.Match[str]) -> str:
+        if m.group(3) is not None:
+            # $$, $ and $: are escapes, $ at the end of a line continues it
+            return '' if m.group(3) == '\n' else m.group(3)
+        return variables.get(m.group(1) or m.group(2), '')
+    if '$' not in text:
+        return text
+    return NINJA_EVAL_PAT.sub(repl, text)
+
+def ninja_shell_escape(path: str) -> str:
+    '''Quote a path the way ninja does when expanding $in and $out.'''
+    if mesonlib.is_windows():
+        if ' ' not in path and '"' not in path:
+            return path
+        result = '"'
+        backslashes = 0
+        for c in path:
+            if c == '\\':
+                backslashes += 1
+                continue
+            result += '\\' * (backslashes * 2 + 1 if c == '"' else backslashes) + c
+            backslashes = 0
+        return result + '\\' * (backslashes * 2) + '"'
+    if NINJA_SHELL_SAFE_PAT.fullmatch(path):
+        return path
+    return "'" + path.replace("'", "'\\''") + "'"
+
 class TargetDependencyScannerInfo:
     def __init__(self, private_dir: str, source2object: T.Dict[str, str]):
         self.private_dir = private_dir
@@ -153,6 +217,26 @@ class Quoting(Enum):
     notNinja = 2
     none = 3
 
+def get_leading_includes(text: str) -> T.Optional[T.List[str]]:
+    """Headers included with angle brackets at the start of the C or C++
+    source text, before any other line that is not a comment.
+
+    Only these can be precompiled and included before everything else
+    without changing what the source sees. Returns None for sources that
+    start with something else, such as a macro definition, a conditional
+    or an include with quotes.
+    """
+    text = re.sub(AUTO_PCH_COMMENT_PAT, lambda m: '\n' * m.group().count('\n') or ' ', text, flags=re.DOTALL)
+    headers = []  # type: T.List[str]
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        m = re.match(AUTO_PCH_INCLUDE_PAT, line)
+        if not m:
+            break
+        headers.append(m.group(1))
+    return headers or None
+
 class NinjaCommandArg:
     def __init__(self, s, quoting = Quoting.both):
         self.s = s
@@ -309,6 +393,9 @@ class NinjaBuildElement:
         self.orderdeps = OrderedSet()
         self.elems = []
         self.all_outputs = all_outputs
+        # Subdir of the target this statement belongs to, None if it does
+        # not belong to any
+        self.fragment = None
 
     def add_dep(self, dep):
         if isinstance(dep, list):
@@ -356,14 +443,15 @@ class NinjaBuildElement:
             else:
                 self.rule.refcount += 1
 
-    def write(self, outfile):
+    def render(self):
+        '''Returns the build line and the quoted variables of the statement.'''
         self.check_outputs()
         ins = ' '.join([ninja_quote(i, True) for i in self.infilenames])
         outs = ' '.join([ninja_quote(i, True) for i in self.outfilenames])
         implicit_outs = ' '.join([ninja_quote(i, True) for i in self.implicit_outfilenames])
         if implicit_outs:
             implicit_outs = ' | ' + implicit_outs
-        use_rspfile = self._should_use_rspfile()
+        use_rspfile = self.use_rspfile = self._should_use_rspfile()
         if use_rspfile:
             rulename = self.rulename + '_RSP'
             mlog.debug("Command line for building %s is long, using a response file" % self.outfilenames)
@@ -388,7 +476,6 @@ class NinjaBuildElement:
                 (l.replace('//', '\\\\', 1) if l.startswith('//') else l)
                 for l in line.split(' ')
             )
-        outfile.write(line)
 
         if use_rspfile:
             if self.rule.rspfile_quote_style is RSPFileSyntax.MSVC:
@@ -398,19 +485,24 @@ class NinjaBuildElement:
         else:
             qf = quote_func
 
+        items = []
         for e in self.elems:
             (name, elems) = e
             should_quote = name not in raw_names
-            line = f' {name} = '
             newelems = []
             for i in elems:
                 if not should_quote or i == '&&': # Hackety hack hack
                     newelems.append(ninja_quote(i))
                 else:
                     newelems.append(ninja_quote(qf(i)))
-            line += ' '.join(newelems)
-            line += '\n'
-            outfile.write(line)
+            items.append((name, ' '.join(newelems)))
+        return line, items
+
+    def write(self, outfile):
+        line, items = self.render()
+        outfile.write(line)
+        for name, value in items:
+            outfile.write(f' {name} = {value}\n')
         outfile.write('\n')
 
     def check_outputs(self):
@@ -419,6 +511,53 @@ class NinjaBuildElement:
                 raise MesonException(f'Multiple producers for Ninja target "{n}". Please rename your targets.')
             self.all_outputs[n] = True
 
+class CompdbWriter:
+    '''
+    Writes a compile_commands.json as entries are added.
+
+    The file is written next to its destination and only replaces it if
+    it differs, so that tools watching it do not reindex everything when
+    nothing changed.
+    '''
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        self.file = open(filename + '~', 'w', encoding='utf-8')
+        self.file.write('[')
+        self.empty = True
+
+    def add(self, directory: str, command: str, file: str, output: str) -> None:
+        self.file.write('\n  {\n' if self.empty else ',\n  {\n')
+        self.empty = False
+        for key, value in [('directory', directory), ('command', command), ('file', file)]:
+            self.file.write(f'    "{key}": {json.dumps(value, ensure_ascii=False)},\n')
+        self.file.write(f'    "output": {json.dumps(output, ensure_ascii=False)}\n  }}')
+
+    def close(self) -> None:
+        self.file.write('\n]\n')
+        self.file.close()
+        mesonlib.replace_if_different(self.filename, self.filename + '~')
+
+    def abort(self) -> None:
+        '''Drop the partially written file, leaving the previous one alone.'''
+        if not self.file.closed:
+            self.file.close()
+        try:
+            os.unlink(self.filename + '~')
+        except FileNotFoundError:
+            pass
+
+def _generate_target_chunk(chunk):
+    backend, order, processed = _generation_state
+    blocks = []
+    try:
+        for target in order[chunk[0]:chunk[1]]:
+            blocks.append(backend.generate_target_block(target, processed))
+    except Exception as e:
+        return blocks, e
+    return blocks, None
+
 class NinjaBackend(backends.Backend):
 
     def __init__(self, build: T.Optional[build.Build], interpreter: T.Optional[Interpreter]):
@@ -429,6 +568,15 @@ class NinjaBackend(backends.Backend):
         self.all_outputs = {}
         self.introspection_data = {}
         self.created_llvm_ir_rule = PerMachine(False, False)
+        self.build_fragment = None
+        # Headers precompiled with the auto_pch option, per target and language
+        self.auto_pch = {}  # type: T.Dict[str, T.Dict[str, T.List[str]]]
+        # Sources that can use the automatic precompiled header, per target
+        # and language
+        self.auto_pch_sources = {}  # type: T.Dict[T.Tuple[str, str], T.Set[File]]
+        # Directory of the precompiled headers shared by several targets, per
+        # target and language, and whether that target builds it
+        self.shared_pch = {}  # type: T.Dict[T.Tuple[str, str], T.Tuple[str, bool]]
 
     def create_target_alias(self, to_target):
         # We need to use aliases for targets that might be used as directory
@@ -534,60 +682,139 @@ int dummy;
   depth = {}
 
 '''.format(num_pools))
+            num_heavy = self.environment.coredata.options[OptionKey('backend_max_heavy_links')].value
+            if num_heavy > 0:
+                outfile.write(f'pool heavy_link_pool\n  depth = {num_heavy}\n\n')
 
-        with self.detect_vs_dep_prefix(tempfilename) as outfile:
-            self.generate_rules()
-
-            self.build_elements = []
-            self.generate_phony()
-            self.add_build_comment(NinjaComment('Build rules for targets'))
-            for t in ProgressBar(self.build.get_targets().values(), desc='Generating targets'):
-                self.generate_target(t)
-            self.add_build_comment(NinjaComment('Test rules'))
-            self.generate_tests()
-            self.add_build_comment(NinjaComment('Install rules'))
-            self.generate_install()
-            self.generate_dist()
-            key = OptionKey('b_coverage')
-            if (key in self.environment.coredata.options and
-                    self.environment.coredata.options[key].value):
-                self.add_build_comment(NinjaComment('Coverage rules'))
-                self.generate_coverage_rules()
-            self.add_build_comment(NinjaComment('Suffix'))
-            self.generate_utils()
-            self.generate_ending()
-
-            self.write_rules(outfile)
-            self.write_builds(outfile)
-
-            default = 'default all\n\n'
-            outfile.write(default)
-        # Only overwrite the old build file after the new one has been
-        # fully created.
-        os.replace(tempfilename, outfilename)
-        mlog.cmd_ci_include(outfilename)  # For CI debugging
-        self.generate_compdb()
+        buildsfilename = outfilename + '.builds~'
+        self.compdb_writers = OrderedDict()  # type: T.Dict[str, CompdbWriter]
+        self.fragments = OrderedDict()
+        try:
+            with self.detect_vs_dep_prefix(tempfilename) as outfile, \
+                    open(buildsfilename, 'w+', encoding='utf-8') as self.builds_file:
+                self.generate_rules()
+
+                self.build_elements = []
+                self.fragments = OrderedDict()
+                self.start_compdb()
+                self.generate_phony()
+                self.add_build_comment(NinjaComment('Build rules for targets'))
+                self.flush_builds()
+                self.prepare_pch()
+                self.generate_targets()
+                self.add_build_comment(NinjaComment('Test rules'))
+                self.generate_tests()
+                self.add_build_comment(NinjaComment('Install rules'))
+                self.generate_install()
+                self.generate_dist()
+                key = OptionKey('b_coverage')
+                if (key in self.environment.coredata.options and
+                        self.environment.coredata.options[key].value):
+                    self.add_build_comment(NinjaComment('Coverage rules'))
+                    self.generate_coverage_rules()
+                self.add_build_comment(NinjaComment('Suffix'))
+                self.generate_utils()
+                self.generate_ending()
+                self.generate_regen_info()
+
+                self.flush_builds()
+                self.write_fragments()
+
+                self.write_rules(outfile)
+                self.builds_file.seek(0)
+                shutil.copyfileobj(self.builds_file, outfile)
+
+                default = 'default all\n\n'
+                outfile.write(default)
+            # Only overwrite the old build file after the new one has been
+            # fully created.
+            os.replace(tempfilename, outfilename)
+            mlog.cmd_ci_include(outfilename)  # For CI debugging
+            self.finish_compdb()
+        except BaseException:
+            # Leave the files of the previous run alone
+            self.abort_compdb()
+            self.abort_fragments()
+            try:
+                os.unlink(tempfilename)
+            except FileNotFoundError:
+                pass
+            raise
+        finally:
+            try:
+                os.unlink(buildsfilename)
+            except FileNotFoundError:
+                pass
 
     # http://clang.llvm.org/docs/JSONCompilationDatabase.html
-    def generate_compdb(self):
-        rules = []
+    def start_compdb(self):
+        '''
+        Prepare to write the compilation database along with the build
+        statements, instead of running `ninja -t compdb` over the whole
+        build.ninja afterwards.
+        '''
+        self.compdb_rules = set()
         # TODO: Rather than an explicit list here, rules could be marked in the
         # rule store as being wanted in compdb
         for for_machine in MachineChoice:
             for lang in self.environment.coredata.compilers[for_machine]:
-                rules += [f"{rule}{ext}" for rule in [self.get_compiler_rule_name(lang, for_machine)]
-                          for ext in ['', '_RSP']]
-                rules += [f"{rule}{ext}" for rule in [self.get_pch_rule_name(lang, for_machine)]
-                          for ext in ['', '_RSP']]
-        compdb_options = ['-x'] if mesonlib.version_compare(self.ninja_version, '>=1.9') else []
-        ninja_compdb = self.ninja_command + ['-t', 'compdb'] + compdb_options + rules
-        builddir = self.environment.get_build_dir()
-        try:
-            jsondb = subprocess.check_output(ninja_compdb, cwd=builddir)
-            with open(os.path.join(builddir, 'compile_commands.json'), 'wb') as f:
-                f.write(jsondb)
-        except Exception:
-            mlog.warning('Could not create compilation database.')
+                self.compdb_rules.add(self.get_compiler_rule_name(lang, for_machine))
+                self.compdb_rules.add(self.get_pch_rule_name(lang, for_machine))
+        self.compdb_templates = {}  # type: T.Dict[T.Tuple[str, bool], str]
+        self.compdb_writers = OrderedDict()  # type: T.Dict[str, CompdbWriter]
+        self.compdb_writers[''] = CompdbWriter(os.path.join(self.environment.get_build_dir(), 'compile_commands.json'))
+        # Subproject of the statements of each subdir
+        self.compdb_subprojects = {}  # type: T.Dict[str, str]
+        if self.environment.coredata.get_option(OptionKey('backend_split_compdb')):
+            for t in self.build.get_targets().values():
+                self.compdb_subprojects[t.get_subdir()] = t.subproject
+
+    def get_compdb_filename(self, subproject: str) -> str:
+        build_dir = self.environment.get_build_dir()
+        if not subproject:
+            return os.path.join(build_dir, 'compile_commands.json')
+        return os.path.join(build_dir, self.build.get_subproject_dir(), subproject, 'compile_commands.json')
+
+    def add_compdb_entry(self, elem, items):
+        '''Add the command of a build statement, as `ninja -t compdb -x` would.'''
+        rule = elem.rule
+        key = (rule.name, elem.use_rspfile)
+        template = self.compdb_templates.get(key)
+        if template is None:
+            if elem.use_rspfile:
+                # The response file is expanded in place
+                qf = cmd_quote if rule.rspfile_quote_style is RSPFileSyntax.MSVC else gcc_rsp_quote
+                template = ' '.join([rule._quoter(x) for x in rule.command] +
+                                    [rule._quoter(x, qf) for x in rule.args])
+            else:
+                template = ' '.join([rule._quoter(x) for x in rule.command + rule.args])
+            self.compdb_templates[key] = template
+        ins = [posixpath.normpath(i.replace('\\', '/')) for i in elem.infilenames]
+        outs = [posixpath.normpath(o.replace('\\', '/')) for o in elem.outfilenames]
+        variables = {name: ninja_evaluate(value, {}) for name, value in items}
+        variables['in'] = ' '.join([ninja_shell_escape(i) for i in ins])
+        variables['out'] = ' '.join([ninja_shell_escape(o) for o in outs])
+        subproject = self.compdb_subprojects.get(getattr(elem, 'fragment', None), '')
+        writer = self.compdb_writers.get(subproject)
+        if writer is None:
+            writer = self.compdb_writers[subproject] = CompdbWriter(self.get_compdb_filename(subproject))
+        writer.add(self.environment.get_build_dir(), ninja_evaluate(template, variables),
+                   ins[0] if ins else '', outs[0])
+
+    def abort_compdb(self):
+        for writer in self.compdb_writers.values():
+            writer.abort()
+
+    def finish_compdb(self):
+        for writer in self.compdb_writers.values():
+            writer.close()
+        # Remove the databases of subprojects that no longer have their own
+        for subproject in set(self.compdb_subprojects.values()) | set(self.build.subprojects):
+            if subproject and subproject not in self.compdb_writers:
+                try:
+                    os.unlink(self.get_compdb_filename(subproject))
+                except FileNotFoundError:
+                    pass
 
     # Get all generated headers. Any source file might need them so
     # we need to add an order dependency to them.
@@ -697,12 +924,136 @@ int dummy;
         src_block['sources'] += sources
         src_block['generated_sources'] += generated_sources
 
+    def generate_targets(self):
+        targets = list(self.build.get_targets().values())
+        jobs = self.environment.coredata.options[OptionKey('backend_generate_jobs')].value
+        if jobs == 0:
+            jobs = multiprocessing.cpu_count()
+        if jobs > 1 and len(targets) > 1 and self.can_generate_targets_in_parallel(targets):
+            self.generate_targets_parallel(targets, jobs)
+            self.build_fragment = None
+            return
+        for t in ProgressBar(targets, desc='Generating targets'):
+            self.generate_target(t)
+            self.flush_builds()
+        self.build_fragment = None
+
+    def can_generate_targets_in_parallel(self, targets):
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            return False
+        # Vala targets add their header and vapi to their outputs while they
+        # are generated, targets depending on them would miss those.
+        return not any(isinstance(t, build.BuildTarget) and 'vala' in t.compilers for t in targets)
+
+    def get_target_generation_order(self, targets):
+        '''
+        Mirrors what calling generate_target() on every target does.
+
+        Returns the targets in the order their build statements are added,
+        which is a depth first post-order of the dependency graph, and the
+        ids of the build targets in the order they are first processed.
+        '''
+        order = []
+        first_seen = []
+        processed = set(self.processed_targets)
+
+        def visit(target):
+            if isinstance(target, (build.CustomTarget, build.RunTarget)):
+                order.append(target)
+                processed.add(target.get_id())
+                return
+            name = target.get_id()
+            if name in processed:
+                return
+            processed.add(name)
+            first_seen.append(name)
+            for t in target.get_dependencies():
+                if t.get_id() not in processed:
+                    visit(t)
+            order.append(target)
+
+        for t in targets:
+            visit(t)
+        return order, first_seen
+
+    def generate_targets_parallel(self, targets, jobs):
+        '''
+        Generate the build statements of the targets in forked processes.
+
+        Every worker generates a contiguous slice of the serial order, with
+        all the other targets marked as processed so that dependencies are
+        not generated again. The results are merged in the serial order so
+        build.ninja is byte for byte the same as with a single process.
+        '''
+        global _generation_state
+        order, first_seen = self.get_target_generation_order(targets)
+        for t in targets:
+            if isinstance(t, build.BuildTarget):
+                os.makedirs(self.get_target_private_dir_abs(t), exist_ok=True)
+        # generate_target() creates the introspection entries before
+        # recursing into the dependencies, keep the same key order.
+        for name in first_seen:
+            self.introspection_data[name] = {}
+        num_chunks = min(len(order), jobs * 4)
+        bounds = [len(order) * i // num_chunks for i in range(num_chunks + 1)]
+        chunks = list(zip(bounds[:-1], bounds[1:]))
+        _generation_state = (self, order, self.processed_targets | {t.get_id() for t in order})
+        # Do not let the workers inherit pending output
+        self.builds_file.flush()
+        for writer in self.compdb_writers.values():
+            writer.file.flush()
+        try:
+            with multiprocessing.get_context('fork').Pool(jobs) as pool:
+                results = pool.imap(_generate_target_chunk, chunks)
+                for (start, _), (blocks, exc) in zip(chunks, ProgressBar(results, total=len(chunks), desc='Generating targets')):
+                    for i, (elements, introspection, rpath_dirs_to_remove, calls) in enumerate(blocks, start):
+                        target = order[i]
+                        mlog.replay(calls)
+                        self.build_fragment = target.get_subdir()
+                        for elem in elements:
+                            elem.all_outputs = self.all_outputs
+                            self.add_build(elem)
+                        if introspection is not None:
+                            self.introspection_data[target.get_id()] = introspection
+                        if rpath_dirs_to_remove is not None:
+                            target.rpath_dirs_to_remove = rpath_dirs_to_remove
+                        self.processed_targets.add(target.get_id())
+                        self.flush_builds()
+                    if exc is not None:
+                        raise exc
+        finally:
+            _generation_state = None
+
+    def generate_target_block(self, target, processed):
+        '''Generate the build statements of a single target in a worker.'''
+        name = target.get_id()
+        self.build_elements = []
+        self.processed_targets = processed
+        processed.discard(name)
+        with mlog.capture() as calls:
+            try:
+                self.generate_target(target)
+            finally:
+                processed.add(name)
+        for elem in self.build_elements:
+            if isinstance(elem, NinjaBuildElement):
+                # The parent links them to its own output set and rules
+                elem.all_outputs = None
+                elem.__dict__.pop('rule', None)
+        introspection = None
+        rpath_dirs_to_remove = None
+        if isinstance(target, build.BuildTarget):
+            introspection = self.introspection_data[name]
+            rpath_dirs_to_remove = target.rpath_dirs_to_remove
+        return self.build_elements, introspection, rpath_dirs_to_remove, calls
+
     def generate_target(self, target):
         try:
             if isinstance(target, build.BuildTarget):
                 os.makedirs(self.get_target_private_dir_abs(target))
         except FileExistsError:
             pass
+        self.build_fragment = target.get_subdir()
         if isinstance(target, build.CustomTarget):
             self.generate_custom_target(target)
         if isinstance(target, build.RunTarget):
@@ -717,6 +1068,7 @@ int dummy;
         self.introspection_data[name] = {}
         # Generate rules for all dependency targets
         self.process_target_dependencies(target)
+        self.build_fragment = target.get_subdir()
         # If target uses a language that cannot link to C objects,
         # just generate for that language and return.
         if isinstance(target, build.Jar):
@@ -757,6 +1109,8 @@ int dummy;
         # Generate rules for GeneratedLists
         self.generate_generator_list_rules(target)
 
+        use_pch = self.environment.coredata.options.get(OptionKey('b_pch'))
+
         # Generate rules for building the remaining source files in this target
         outname = self.get_target_filename(target)
         obj_list = []
@@ -815,8 +1169,7 @@ int dummy;
             source2object[s] = o
             obj_list.append(o)
 
-        use_pch = self.environment.coredata.options.get(OptionKey('b_pch'))
-        if use_pch and target.has_pch():
+        if use_pch and (target.has_pch() or target.get_id() in self.auto_pch):
             pch_objects = self.generate_pch(target, header_deps=header_deps)
         else:
             pch_objects = []
@@ -934,6 +1287,7 @@ int dummy;
         for t in target.get_dependencies():
             if t.get_id() not in self.processed_targets:
                 self.generate_target(t)
+                self.flush_builds()
 
     def custom_target_generator_inputs(self, target):
         for s in unholder(target.sources):
@@ -970,10 +1324,14 @@ int dummy;
             for output in d.get_outputs():
                 elem.add_dep(os.path.join(self.get_target_dir(d), output))
 
+        write_if_changed = None
+        if target.write_if_changed and not target.restat:
+            write_if_changed = ofilenames
         cmd, reason = self.as_meson_exe_cmdline(target.name, target.command[0], cmd[1:],
                                                 extra_bdeps=target.get_transitive_build_target_deps(),
                                                 capture=ofilenames[0] if target.capture else None,
-                                                env=target.env)
+                                                env=target.env,
+                                                write_if_changed=write_if_changed)
         if reason:
             cmd_type = f' (wrapped by meson {reason})'
         else:
@@ -986,6 +1344,9 @@ int dummy;
             elem.add_item('DEPFILE', rel_dfile)
         if target.console:
             elem.add_item('pool', 'console')
+        if target.write_if_changed or target.restat:
+            # Do not rebuild what depends on outputs that did not change
+            elem.add_item('restat', '1')
         elem.add_item('COMMAND', cmd)
         elem.add_item('description', desc.format(target.name, cmd_type))
         self.add_build(elem)
@@ -1146,6 +1507,17 @@ int dummy;
                                 'Regenerating build files.',
                                 extra='generator = 1'))
 
+        # Used when a dependency of build.ninja changed, does not regenerate
+        # if only comments or whitespace changed in the build definition.
+        c = self.environment.get_build_command() + \
+            ['--internal',
+             'regencheck',
+             os.path.join(self.environment.get_build_dir(), 'meson-private')]
+        self.add_rule(NinjaRule('REGENERATE_BUILD_IF_CHANGED',
+                                c, [],
+                                'Checking whether build files need to be regenerated.',
+                                extra='generator = 1'))
+
     def add_rule_comment(self, comment):
         self.rules.append(comment)
 
@@ -1160,6 +1532,7 @@ int dummy;
 
     def add_build(self, build):
         self.build_elements.append(build)
+        build.fragment = self.build_fragment
 
         if build.rulename != 'phony':
             # reference rule
@@ -1169,16 +1542,144 @@ int dummy;
                 mlog.warning(f"build statement for {build.outfilenames} references non-existent rule {build.rulename}")
 
     def write_rules(self, outfile):
-        for b in self.build_elements:
+        for r in self.rules:
+            r.write(outfile)
+
+    def flush_builds(self):
+        '''
+        Write the build statements added since the last call and forget them.
+
+        This is called after generating every target, so that all their
+        elements do not have to be kept in memory until the end. Variables
+        with the same long value in several statements of a target are
+        written once as a file level variable the statements refer to.
+        '''
+        elements = self.build_elements
+        self.build_elements = []
+        split = self.environment.coredata.get_option(OptionKey('backend_split_build_ninja'))
+        rendered = []
+        counts = {}  # type: T.Dict[T.Tuple[T.Optional[str], str, str], int]
+        for b in elements:
+            fragment = getattr(b, 'fragment', None) if split else None
             if isinstance(b, NinjaBuildElement):
                 b.count_rule_references()
+                line, items = b.render()
+                if b.rulename in self.compdb_rules and hasattr(b, 'rule'):
+                    self.add_compdb_entry(b, items)
+                for name, value in items:
+                    if len(value) >= INTERNED_VALUE_MIN_LENGTH:
+                        key = (fragment, name, value)
+                        counts[key] = counts.get(key, 0) + 1
+                rendered.append((fragment, b, line, items))
+            else:
+                rendered.append((fragment, b, None, None))
+
+        outputs = OrderedDict()  # type: T.Dict[str, io.StringIO]
+        variables = {}  # type: T.Dict[T.Tuple[T.Optional[str], str, str], str]
+        num_variables = {}  # type: T.Dict[T.Tuple[T.Optional[str], str], int]
+        for fragment, b, line, items in rendered:
+            if fragment is None:
+                outfile = self.builds_file
+            else:
+                outfile = outputs.get(fragment)
+                if outfile is None:
+                    outfile = outputs[fragment] = io.StringIO()
+                    if fragment not in self.fragments:
+                        self.start_fragment(fragment, outfile)
+            if line is None:
+                b.write(outfile)
+                continue
+            values = []
+            for name, value in items:
+                key = (fragment, name, value)
+                if counts.get(key, 0) > 1:
+                    var = variables.get(key)
+                    if var is None:
+                        index = num_variables.get((fragment, name), 0)
+                        num_variables[(fragment, name)] = index + 1
+                        var = variables[key] = f'{name}_{index}'
+                        outfile.write(f'{var} = {value}\n\n')
+                    value = '$' + var
+                values.append((name, value))
+            outfile.write(line)
+            for name, value in values:
+                outfile.write(f' {name} = {value}\n')
+            outfile.write('\n')
 
-        for r in self.rules:
-            r.write(outfile)
+        build_dir = self.environment.get_build_dir()
+        for fragment, outfile in outputs.items():
+            content = outfile.getvalue()
+            self.fragments[fragment].update(content.encode('utf-8'))
+            with open(os.path.join(build_dir, self.get_fragment_filename(fragment) + '~'), 'a', encoding='utf-8') as f:
+                f.write(content)
+
+    def start_fragment(self, subdir, outfile):
+        filename = self.get_fragment_filename(subdir)
+        self.builds_file.write('subninja {}\n\n'.format(ninja_quote(filename, True)))
+        self.fragments[subdir] = hashlib.sha256()
+        abs_filename = os.path.join(self.environment.get_build_dir(), filename)
+        os.makedirs(os.path.dirname(abs_filename), exist_ok=True)
+        # Truncate what a previous run could have left
+        open(abs_filename + '~', 'w', encoding='utf-8').close()
+        where = f'"{subdir}"' if subdir else 'the top level directory'
+        outfile.write(f'# Build statements of the targets in {where}\n')
+        outfile.write('# It is autogenerated by the Meson build system.\n')
+        outfile.write('# Do not edit by hand.\n\n')
+
+    def abort_fragments(self):
+        build_dir = self.environment.get_build_dir()
+        for subdir in self.fragments:
+            try:
+                os.unlink(os.path.join(build_dir, self.get_fragment_filename(subdir) + '~'))
+            except FileNotFoundError:
+                pass
 
-    def write_builds(self, outfile):
-        for b in ProgressBar(self.build_elements, desc='Writing build.ninja'):
-            b.write(outfile)
+    @staticmethod
+    def get_fragment_filename(subdir):
+        path = PurePath(subdir)
+        if not path.parts:
+            return 'meson-private/ninja-fragments/build.ninja'
+        # Subdirs like a@b and a/b, or only differing by case, must not share
+        # a fragment
+        h = hashlib.sha256(path.as_posix().encode('utf-8', errors='replace')).hexdigest()[:7]
+        return f'meson-private/ninja-fragments/build@{h}' + ''.join('@' + p for p in path.parts) + '.ninja'
+
+    def write_fragments(self):
+        '''
+        Only replace the fragments whose content changed.
+
+        Their hashes are kept next to them, so neither ninja nor we have to
+        look at the ones that did not change.
+        '''
+        if not self.environment.coredata.get_option(OptionKey('backend_split_build_ninja')):
+            return
+        build_dir = self.environment.get_build_dir()
+        fragment_dir = os.path.join(build_dir, 'meson-private', 'ninja-fragments')
+        os.makedirs(fragment_dir, exist_ok=True)
+        hashfile = os.path.join(fragment_dir, 'hashes.json')
+        try:
+            with open(hashfile, encoding='utf-8') as f:
+                old_hashes = json.load(f)
+        except (OSError, ValueError):
+            old_hashes = {}
+        hashes = {}
+        for subdir, h in self.fragments.items():
+            filename = self.get_fragment_filename(subdir)
+            digest = h.hexdigest()
+            hashes[filename] = digest
+            abs_filename = os.path.join(build_dir, filename)
+            if old_hashes.get(filename) != digest or not os.path.exists(abs_filename):
+                os.replace(abs_filename + '~', abs_filename)
+            else:
+                os.unlink(abs_filename + '~')
+            mlog.cmd_ci_include(abs_filename)
+        for filename in old_hashes.keys() - hashes.keys():
+            try:
+                os.unlink(os.path.join(build_dir, filename))
+            except FileNotFoundError:
+                pass
+        with open(hashfile, 'w', encoding='utf-8') as f:
+            json.dump(hashes, f)
 
     def generate_phony(self):
         self.add_build_comment(NinjaComment('Phony build target, always out of date'))
@@ -2448,7 +2949,12 @@ https://gcc.gnu.org/bugzilla/show_bug.cgi?id=47485'''))
         # Include PCH header as first thing as it must be the first one or it will be
         # ignored by gcc https://gcc.gnu.org/bugzilla/show_bug.cgi?id=100462
         if self.environment.coredata.options.get(OptionKey('b_pch')) and is_generated != 'pch':
-            commands += self.get_pch_include_args(compiler, target)
+            auto_pch_sources = self.auto_pch_sources.get((target.get_id(), compiler.get_language()))
+            if auto_pch_sources is not None and src not in auto_pch_sources:
+                # Includes something else before the precompiled headers
+                commands += compiler.get_include_args(self.get_target_private_dir(target), False)
+            else:
+                commands += self.get_pch_include_args(compiler, target)
 
         commands += self._generate_single_compile_target_args(target, compiler, is_generated)
         commands = commands.compiler.compiler_args(commands)
@@ -2481,7 +2987,7 @@ https://gcc.gnu.org/bugzilla/show_bug.cgi?id=47485'''))
 
         # PCH handling
         if self.environment.coredata.options.get(OptionKey('b_pch')):
-            pchlist = target.get_pch(compiler.language)
+            pchlist = self.get_target_pch(target, compiler.language)
         else:
             pchlist = []
         if not pchlist:
@@ -2490,7 +2996,7 @@ https://gcc.gnu.org/bugzilla/show_bug.cgi?id=47485'''))
             pch_dep = []
         else:
             arr = []
-            i = os.path.join(self.get_target_private_dir(target), compiler.get_pch_name(pchlist[0]))
+            i = os.path.join(self.get_target_pch_dir(target, compiler.language), compiler.get_pch_name(pchlist[0]))
             arr.append(i)
             pch_dep = arr
 
@@ -2613,7 +3119,7 @@ https://gcc.gnu.org/bugzilla/show_bug.cgi?id=47485'''))
             # Explicitly compile pch headers as C++. If Clang is invoked in C++ mode, it actually warns if
             # this option is not set, and for gcc it also makes sense to use it.
             commands += ['-x', 'c++-header']
-        dst = os.path.join(self.get_target_private_dir(target),
+        dst = os.path.join(self.get_target_pch_dir(target, compiler.language),
                            os.path.basename(pch) + '.' + compiler.get_pch_suffix())
         dep = dst + '.' + compiler.get_depfile_suffix()
         return commands, dep, dst, []  # Gcc does not create an object file during pch generation.
@@ -2622,16 +3128,25 @@ https://gcc.gnu.org/bugzilla/show_bug.cgi?id=47485'''))
         header_deps = header_deps if header_deps is not None else []
         pch_objects = []
         for lang in ['c', 'cpp']:
-            pch = target.get_pch(lang)
+            pch = self.get_target_pch(target, lang)
             if not pch:
                 continue
-            if not has_path_sep(pch[0]) or not has_path_sep(pch[-1]):
+            compiler = target.compilers[lang]
+            shared = self.shared_pch.get((target.get_id(), lang))
+            if shared and not shared[1]:
+                # Built by another target
+                continue
+            if not target.get_pch(lang):
+                # Automatic header, in the build directory
+                src = pch[0]
+                (commands, dep, dst, objs) = self.generate_gcc_pch_command(target, compiler, pch[0])
+                extradep = None
+            elif not has_path_sep(pch[0]) or not has_path_sep(pch[-1]):
                 msg = 'Precompiled header of {!r} must not be in the same ' \
                       'directory as source, please put it in a subdirectory.' \
                       ''.format(target.get_basename())
                 raise InvalidArguments(msg)
-            compiler = target.compilers[lang]
-            if isinstance(compiler, VisualStudioLikeCompiler):
+            elif isinstance(compiler, VisualStudioLikeCompiler):
                 (commands, dep, dst, objs, src) = self.generate_msvc_pch_command(target, compiler, pch)
                 extradep = os.path.join(self.build_to_src, target.get_source_subdir(), pch[0])
             elif compiler.id == 'intel':
@@ -2652,6 +3167,216 @@ https://gcc.gnu.org/bugzilla/show_bug.cgi?id=47485'''))
             self.add_build(elem)
         return pch_objects
 
+    def get_target_pch(self, target, lang):
+        return target.get_pch(lang) or self.auto_pch.get(target.get_id(), {}).get(lang, [])
+
+    def get_target_pch_dir(self, target, lang):
+        shared = self.shared_pch.get((target.get_id(), lang))
+        if shared:
+            return shared[0]
+        return self.get_target_private_dir(target)
+
+    def prepare_pch(self):
+        """Decide which precompiled headers to build before generating the targets.
+
+        This chooses the automatic precompiled headers. Targets that would
+        build their precompiled header from the same header with the same
+        arguments share one, built by the first of them.
+        """
+        self.auto_pch = {}
+        self.auto_pch_sources = {}
+        self.shared_pch = {}
+        if not self.environment.coredata.options.get(OptionKey('b_pch')):
+            return
+        auto_headers = OrderedDict()  # type: T.Dict[T.Tuple[build.BuildTarget, str], T.List[str]]
+        users = OrderedDict()  # type: T.Dict[T.Tuple, T.List[T.Tuple[build.BuildTarget, str]]]
+        for target in self.build.get_targets().values():
+            # Targets that generate_target() does not build with C compilers
+            if not isinstance(target, build.BuildTarget) or isinstance(target, build.Jar) or \
+                    target.uses_rust() or 'cs' in target.compilers or 'swift' in target.compilers:
+                continue
+            auto_pch = self.get_option_for_target(OptionKey('auto_pch'), target) != 'off'
+            for lang in ['c', 'cpp']:
+                compiler = target.compilers.get(lang)
+                # Only compilers that can use the precompiled header through
+                # get_pch_use_args() with no implementation file
+                if compiler is None or compiler.get_id() not in {'gcc', 'clang'}:
+                    continue
+                if auto_pch and not target.get_pch(lang):
+                    headers, sources = self.get_auto_pch_headers(target, compiler)
+                    if not headers:
+                        continue
+                    auto_headers[(target, lang)] = headers
+                    self.auto_pch_sources[(target.get_id(), lang)] = set(sources)
+                    # The actual path is only known once sharing is decided
+                    self.auto_pch.setdefault(target.get_id(), {})[lang] = [f'meson_auto_pch-{lang}.h']
+                key = self.get_pch_sharing_key(target, lang, auto_headers.get((target, lang)))
+                if key is not None:
+                    users.setdefault(key, []).append((target, lang))
+        for key, targets in users.items():
+            if len(targets) < 2:
+                continue
+            digest = hashlib.sha256(repr(key).encode('utf-8', errors='surrogateescape')).hexdigest()[:16]
+            pch_dir = os.path.join('meson-pch', digest)
+            for i, (target, lang) in enumerate(targets):
+                self.shared_pch[(target.get_id(), lang)] = (pch_dir, i == 0)
+                # Files from when the target had a precompiled header of its
+                # own would be found before the shared one.
+                pch = self.get_target_pch(target, lang)
+                private_dir = os.path.join(self.environment.get_build_dir(), self.get_target_private_dir(target))
+                stale = [target.compilers[lang].get_pch_name(pch[0])]
+                if not target.get_pch(lang):
+                    stale.append(os.path.basename(pch[0]))
+                for f in stale:
+                    try:
+                        os.unlink(os.path.join(private_dir, f))
+                    except FileNotFoundError:
+                        pass
+            mlog.debug('Sharing precompiled header {} of {} targets.'.format(
+                os.path.join(pch_dir, os.path.basename(self.get_target_pch(*targets[0])[0])), len(targets)))
+        for (target, lang), headers in auto_headers.items():
+            self.write_auto_pch_header(target, lang, headers)
+
+    def get_pch_sharing_key(self, target, lang, auto_headers=None):
+        """What makes the precompiled header of target for lang unique, or None
+        if it has none."""
+        pch = self.get_target_pch(target, lang)
+        if not pch:
+            return None
+        compiler = target.compilers[lang]
+        if auto_headers:
+            header = '\n'.join(auto_headers)
+        elif not has_path_sep(pch[0]):
+            # generate_pch() reports the error
+            return None
+        else:
+            header = os.path.join(self.build_to_src, target.get_source_subdir(), pch[0])
+        # The private directory is the only include directory that always
+        # differs between targets. Precompiled headers do not include from it.
+        private_args = compiler.get_include_args(self.get_target_private_dir(target), False)
+        args = tuple(a for a in self._generate_single_compile(target, compiler) if a not in private_args)
+        return (compiler.get_id(), lang, target.for_machine.get_lower_case_name(), header, args)
+
+    def is_own_project_header(self, target, header: str) -> bool:
+        """Whether header, as included with angle brackets by the sources of
+        target, is found in the source tree of the (sub)project of target."""
+        source_dir = self.environment.get_source_dir()
+        subproject_dir = self.build.get_subproject_dir()
+        if target.subproject:
+            project_dir = os.path.join(source_dir, subproject_dir, target.subproject)
+        else:
+            project_dir = source_dir
+        dirs = []  # type: T.List[str]
+        if target.implicit_include_directories:
+            dirs.append(os.path.join(source_dir, target.get_subdir()))
+        for i in target.get_include_dirs():
+            if not i.is_system:
+                dirs += [os.path.join(source_dir, i.get_curdir(), d) for d in i.get_incdirs()]
+        for d in dirs:
+            path = os.path.normpath(os.path.join(d, header))
+            if os.path.isfile(path):
+                if not target.subproject and path.startswith(os.path.join(source_dir, subproject_dir, '')):
+                    return False
+                return path.startswith(os.path.join(project_dir, ''))
+        return False
+
+    def get_auto_pch_headers(self, target, compiler) -> T.Tuple[T.List[str], T.List[File]]:
+        """Find the headers worth precompiling for the sources of target
+        built with compiler, and the sources that can use them.
+
+        Candidates are headers included with angle brackets at the start of
+        the sources, before any macro definition or conditional, that are
+        not part of the project of the target, so that they rarely change,
+        and that the compiler finds. They are returned in the order they
+        are first included.
+        """
+        sources = [s for s in target.get_sources()
+                   if isinstance(s, File) and not s.is_built and not self.environment.is_header(s) and
+                   get_compiler_for_source(target.compilers.values(), s) is compiler]
+        if len(sources) < AUTO_PCH_MIN_SOURCES:
+            return [], []
+        leading = OrderedDict()  # type: T.Dict[File, T.Tuple[T.List[str], T.List[str]]]
+        for s in sources:
+            try:
+                with open(s.absolute_path(self.environment.get_source_dir(), self.environment.get_build_dir()),
+                          encoding='utf-8', errors='replace') as f:
+                    text = f.read()
+            except OSError:
+                continue
+            headers = get_leading_includes(text)
+            if headers is not None:
+                leading[s] = (headers, re.findall(AUTO_PCH_INCLUDE_PAT, text, re.MULTILINE))
+        if len(leading) < AUTO_PCH_MIN_SOURCES:
+            return [], []
+        counts = OrderedDict()  # type: T.Dict[str, int]
+        for headers, _ in leading.values():
+            for h in dict.fromkeys(headers):
+                counts[h] = counts.get(h, 0) + 1
+        threshold = max(2, len(leading) * AUTO_PCH_MIN_SHARE)
+        candidates = [h for h, count in counts.items()
+                      if count >= threshold and not self.is_own_project_header(target, h)]
+        if not candidates:
+            return [], []
+        # Drop those the compiler does not find, such as headers of other
+        # platforms included unconditionally
+        check_args = self.get_auto_pch_check_args(target, compiler)
+        candidates = [h for h in candidates
+                      if compiler.has_header(h, '', self.environment, extra_args=check_args,
+                                             dependencies=target.external_deps)[0]]
+        # The precompiled header is included before anything else, so only
+        # sources that start with the candidates they include can use it.
+        users = []  # type: T.List[File]
+        for s, (headers, all_headers) in leading.items():
+            prefix = list(itertools.takewhile(lambda h: h in candidates, headers))
+            if prefix and all(h in prefix for h in candidates if h in all_headers):
+                users.append(s)
+        if not candidates or len(users) < AUTO_PCH_MIN_SOURCES:
+            return [], []
+        return candidates, users
+
+    def get_auto_pch_check_args(self, target, compiler) -> T.List[str]:
+        """Arguments to look for the headers of target with compiler from
+        outside the build directory."""
+        source_dir = self.environment.get_source_dir()
+        build_dir = self.environment.get_build_dir()
+        args = []  # type: T.List[str]
+        for i in target.get_include_dirs():
+            for d in i.get_incdirs():
+                args += compiler.get_include_args(os.path.join(source_dir, i.get_curdir(), d), i.is_system)
+                args += compiler.get_include_args(os.path.join(build_dir, i.get_curdir(), d), i.is_system)
+        args += self.build.get_project_args(compiler, target.subproject, target.for_machine)
+        args += target.get_extra_args(compiler.get_language())
+        return args
+
+    def write_auto_pch_header(self, target, lang, headers):
+        header = os.path.join(self.get_target_pch_dir(target, lang), f'meson_auto_pch-{lang}.h')
+        abs_header = os.path.join(self.environment.get_build_dir(), header)
+        os.makedirs(os.path.dirname(abs_header), exist_ok=True)
+        with open(abs_header + '.tmp', 'w', encoding='utf-8') as f:
+            f.write('// Generated by Meson from the headers most included by the sources\n')
+            f.write('// of a target, see the auto_pch option.\n')
+            f.writelines(f'#include <{h}>\n' for h in headers)
+        mesonlib.replace_if_different(abs_header, abs_header + '.tmp')
+        self.auto_pch[target.get_id()][lang] = [header]
+        self.log_auto_pch_durations(target, lang, header, headers)
+
+    def log_auto_pch_durations(self, target, lang, header, headers):
+        # Measurement hook: compare with the times logged after building
+        # with auto_pch=off to see what the precompiled header saves.
+        durations = self.get_build_durations()
+        compiler = target.compilers[lang]
+        pch = os.path.normpath(os.path.join(self.get_target_pch_dir(target, lang), compiler.get_pch_name(header)))
+        suffix = '.' + self.environment.machines[target.for_machine].get_object_suffix()
+        private_dir = os.path.join(os.path.normpath(self.get_target_private_dir(target)), '')
+        objects = [d for o, d in durations.items() if o.startswith(private_dir) and o.endswith(suffix)]
+        msg = f'Automatic precompiled header for {target.get_basename()} ({lang}): {", ".join(headers)}.'
+        if objects:
+            msg += ' Last build: {} objects in {} ms'.format(len(objects), sum(objects))
+            if pch in durations:
+                msg += f', precompiled header in {durations[pch]} ms'
+            msg += '.'
+        mlog.debug(msg)
+
     def get_target_shsym_filename(self, target):
         # Always name the .symbols file after the primary build output because it always exists
         targetdir = self.get_target_private_dir(target)
@@ -2977,8 +3702,42 @@ https://gcc.gnu.org/bugzilla/show_bug.cgi?id=47485'''))
         elem = NinjaBuildElement(self.all_outputs, outname, linker_rule, obj_list, implicit_outs=implicit_outs)
         elem.add_dep(dep_targets + custom_target_libraries)
         elem.add_item('LINK_ARGS', commands)
+        if linker_base != 'STATIC' and self.environment.coredata.options[OptionKey('backend_max_heavy_links')].value > 0:
+            memory = self.estimate_link_memory(target, obj_list, dependencies)
+            if memory >= HEAVY_LINK_MIN_MEMORY:
+                mlog.debug(f'Linking {outname} is estimated to use {memory // (1024 * 1024)} MiB, '
+                           'using the heavy link pool.')
+                elem.add_item('pool', 'heavy_link_pool')
         return elem
 
+    def estimate_link_memory(self, target, obj_list, dependencies) -> int:
+        '''
+        Estimate the memory used to link a target from the size of the
+        objects and static libraries it links in the previous build.
+        '''
+        build_dir = self.environment.get_build_dir()
+        sizes = []
+        missing = 0
+        for o in obj_list:
+            try:
+                sizes.append(os.stat(os.path.join(build_dir, str(o))).st_size)
+            except OSError:
+                missing += 1
+        libs = 0
+        for d in dependencies:
+            if not isinstance(d, build.StaticLibrary):
+                continue
+            try:
+                libs += os.stat(os.path.join(build_dir, self.get_target_filename(d))).st_size
+            except OSError:
+                missing += max(1, len(d.sources))
+        object_size = sum(sizes) // len(sizes) if sizes else DEFAULT_OBJECT_SIZE
+        total = sum(sizes) + libs + missing * object_size
+        lto = self.get_base_options_for_target(target).get(OptionKey('b_lto'))
+        if lto is not None and lto.value:
+            return total * LTO_LINK_MEMORY_FACTOR
+        return total * LINK_MEMORY_FACTOR
+
     def get_dependency_filename(self, t):
         if isinstance(t, build.SharedLibrary):
             return self.get_target_shsym_filename(t)
@@ -3173,7 +3932,7 @@ https://gcc.gnu.org/bugzilla/show_bug.cgi?id=47485'''))
         self.add_build(elem)
 
         deps = self.get_regen_filelist()
-        elem = NinjaBuildElement(self.all_outputs, 'build.ninja', 'REGENERATE_BUILD', deps)
+        elem = NinjaBuildElement(self.all_outputs, 'build.ninja', 'REGENERATE_BUILD_IF_CHANGED', deps)
         elem.add_item('pool', 'console')
         self.add_build(elem)
 
@@ -195,6 +195,44 @@ class InstallDir:
         self.subproject = subproject
 
 
+class SubdirRecord:
+    """What the evaluation of the meson.build file of a subdirectory of the
+    main project used and produced, to evaluate it again on its own."""
+
+    def __init__(self, subdir: str):
+        self.subdir = subdir
+        # Why it cannot be evaluated on its own, or None if it can
+        self.not_rerunnable: T.Optional[str] = None
+        # Values of the variables read before being assigned, as saved by
+        # interpreter.incremental.save_value(), None if it was not set
+        self.consumed: T.Dict[str, T.Any] = {}
+        self.assigned: T.Set[str] = set()
+        # Plain values of the variables assigned when leaving it
+        self.exported: T.Dict[str, T.Any] = {}
+        # Position of the reads after leaving it, see SubdirState.last_read
+        self.exit_seq = 0
+        # Index of its first item in each list of SUBDIR_PRODUCTS and in the
+        # targets, and the items it added
+        self.positions: T.Dict[str, int] = {}
+        self.products: T.Dict[str, T.List[T.Any]] = {}
+        self.build_def_files: T.List[str] = []
+
+class SubdirState:
+    """Records of the subdirectories of the main project, in the order
+    they were entered."""
+
+    def __init__(self) -> None:
+        self.records: T.Dict[str, SubdirRecord] = OrderedDict()
+        # Position of the last read of each variable in the whole run
+        self.last_read: T.Dict[str, int] = {}
+        self.build_def_files: T.List[str] = []
+        # Set by the main project, without the one of the backend
+        self.devenv: T.List[EnvironmentVariables] = []
+
+# Lists of Build that subdirectories add to with the functions that can be
+# evaluated again on their own
+SUBDIR_PRODUCTS = ('tests', 'benchmarks', 'headers', 'man', 'data', 'install_dirs')
+
 class Build:
     """A class that holds the status of one build including
     all dependencies and so on.
@@ -240,6 +278,8 @@ class Build:
         self.dependency_overrides: PerMachine[T.Dict[T.Tuple, DependencyOverride]] = PerMachineDefaultable.default(
             environment.is_cross_build(), {}, {})
         self.devenv: T.List[EnvironmentVariables] = []
+        # Used to only evaluate the subdirectories that changed again
+        self.subdir_state: T.Optional[SubdirState] = None
 
     def get_build_targets(self):
         build_targets = OrderedDict()
@@ -2235,6 +2275,7 @@ class CustomTarget(Target, CommandBase):
         'override_options',
         'console',
         'env',
+        'write_if_changed',
     }
 
     def __init__(self, name: str, subdir: str, subproject: str, kwargs: T.Dict[str, T.Any],
@@ -2326,6 +2367,12 @@ class CustomTarget(Target, CommandBase):
             raise InvalidArguments('"console" kwarg only accepts booleans')
         if self.capture and self.console:
             raise InvalidArguments("Can't both capture output and output to console")
+        self.write_if_changed = kwargs.get('write_if_changed', False)
+        if not isinstance(self.write_if_changed, bool):
+            raise InvalidArguments('"write_if_changed" kwarg only accepts booleans')
+        # Whether the command itself does not touch outputs whose content
+        # did not change, captured output is only written if it changed.
+        self.restat = self.capture
         if 'command' not in kwargs:
             raise InvalidArguments('Missing keyword argument "command".')
         if 'depfile' in kwargs:
@@ -2471,7 +2518,10 @@ class CustomTarget(Target, CommandBase):
             yield CustomTargetIndex(self, i)
 
 class RunTarget(Target, CommandBase):
-    def __init__(self, name, command, dependencies, subdir, subproject, env=None):
+    def __init__(self, name: str,
+                 command: T.Sequence[T.Union[str, File, programs.ExternalProgram, BuildTarget, 'CustomTarget']],
+                 dependencies: T.List[Target], subdir: str, subproject: str,
+                 env: T.Optional['EnvironmentVariables'] = None):
         self.typename = 'run'
         # These don't produce output artifacts
         super().__init__(name, subdir, subproject, False, MachineChoice.BUILD)
@@ -2674,6 +2724,17 @@ def get_sources_string_names(sources, backend):
             raise AssertionError(f'Unknown source type: {s!r}')
     return names
 
+# Parts of the Build that save() also writes on their own, so that commands
+# needing only them, like `meson test`, do not have to unpickle every
+# target of the project.
+BUILD_CHUNKS: T.Dict[str, T.Tuple[str, ...]] = {
+    'test_setups': ('project_name', 'test_setups', 'test_setup_default_name'),
+    'devenv': ('project_name', 'devenv'),
+}
+
+def get_chunk_filename(build_dir: str, chunk: str) -> str:
+    return os.path.join(build_dir, 'meson-private', f'build-{chunk}.dat')
+
 def load(build_dir: str) -> Build:
     filename = os.path.join(build_dir, 'meson-private', 'build.dat')
     load_fail_msg = f'Build data file {filename!r} is corrupted. Try with a fresh build tree.'
@@ -2695,6 +2756,29 @@ def load(build_dir: str) -> Build:
         raise MesonException(load_fail_msg)
     return obj
 
+def load_chunk(build_dir: str, chunk: str) -> Build:
+    """Load only the attributes of the Build listed in BUILD_CHUNKS[chunk].
+
+    Accessing any other attribute of the returned object raises an
+    AttributeError. Falls back to loading the whole build data if the
+    chunk is missing, e.g. in build directories configured by an older
+    version of Meson.
+    """
+    try:
+        with open(get_chunk_filename(build_dir, chunk), 'rb') as f:
+            attrs = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ModuleNotFoundError):
+        return load(build_dir)
+    if not isinstance(attrs, dict) or set(attrs) != set(BUILD_CHUNKS[chunk]):
+        return load(build_dir)
+    obj = Build.__new__(Build)
+    obj.__dict__.update(attrs)
+    return obj
+
 def save(obj: Build, filename: str) -> None:
     with open(filename, 'wb') as f:
         pickle.dump(obj, f)
+    build_dir = os.path.dirname(os.path.dirname(filename))
+    for chunk, attrs in BUILD_CHUNKS.items():
+        with open(get_chunk_filename(build_dir, chunk), 'wb') as f:
+            pickle.dump({a: getattr(obj, a) for a in attrs}, f)
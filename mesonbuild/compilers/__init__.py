@@ -32,6 +32,7 @@ __all__ = [
     'is_source',
     'is_known_suffix',
     'lang_suffixes',
+    'run_checks',
     'sort_clink',
 
     'AppleClangCCompiler',
@@ -128,6 +129,7 @@ from .compilers import (
     is_known_suffix,
     lang_suffixes,
     LANGUAGES_USING_LDFLAGS,
+    run_checks,
     sort_clink,
 )
 from .c import (
@@ -0,0 +1,175 @@
+# Copyright 2021 The Meson development team
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Persistent, user level cache of compiler check results.
+
+The per build directory cache in CoreData.compiler_check_cache is lost
+whenever a build directory is wiped or a new one is created. This cache
+lives in a directory chosen by the user (the `check_cache` option) and
+is shared by every build directory pointing at it, in the same spirit
+as ccache.
+
+Every entry is a single pickled file named after the hash of its key.
+Entries are written atomically so several meson processes can share one
+cache directory. Least recently used entries are evicted once the cache
+grows over its size limit; the file mtime doubles as the access time.
+"""
+
+import hashlib
+import os
+import pickle
+import shutil
+import threading
+import typing as T
+from functools import lru_cache
+
+from .. import mlog
+
+if T.TYPE_CHECKING:
+    from .compilers import CompileResult
+
+# Bump this when the layout of the entries changes
+CACHE_FORMAT_VERSION = 1
+
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+
+@lru_cache(maxsize=None)
+def _stat_fingerprint(path: str) -> str:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return path
+    return f'{path}:{st.st_size}:{st.st_mtime_ns}'
+
+
+def toolchain_fingerprint(exelist: T.Sequence[str]) -> str:
+    """Identify the exact binaries behind an exelist.
+
+    The path, size and modification time of every element of the exelist
+    that resolves to a file is used, so upgrading a compiler in place
+    invalidates all of its cached results even if its version string did
+    not change.
+    """
+    parts = []  # type: T.List[str]
+    for e in exelist:
+        path = shutil.which(e) if not os.path.isabs(e) else e
+        parts.append(_stat_fingerprint(os.path.realpath(path)) if path else e)
+    return '\0'.join(parts)
+
+
+class CompilerCheckCache:
+
+    """A size bounded on-disk LRU cache of CompileResult objects."""
+
+    def __init__(self, cache_dir: str, max_size: int = DEFAULT_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        # Lazily computed the first time something is stored
+        self.size = None  # type: T.Optional[int]
+
+    def make_key(self, exelist: T.Sequence[str], version: str, code: str,
+                 args: T.Sequence[str], mode: str) -> str:
+        from ..coredata import version as meson_version
+        h = hashlib.sha256()
+        for p in [str(CACHE_FORMAT_VERSION), meson_version, toolchain_fingerprint(exelist),
+                  version, code, '\0'.join(args), mode]:
+            h.update(p.encode('utf-8', errors='surrogateescape'))
+            h.update(b'\1')
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key[2:])
+
+    def get(self, key: str) -> T.Optional['CompileResult']:
+        from .compilers import CompileResult
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+            if not isinstance(result, CompileResult):
+                raise pickle.UnpicklingError(f'unexpected {type(result).__name__} object')
+            # Bump the access time used for LRU eviction
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            mlog.debug(f'Ignoring unreadable compiler check cache entry {path}: {e}')
+            return None
+        return result
+
+    def put(self, key: str, result: 'CompileResult') -> None:
+        path = self._path(key)
+        tempname = f'{path}.{os.getpid()}.{threading.get_ident()}~'
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tempname, 'wb') as f:
+                pickle.dump(result, f)
+            os.replace(tempname, path)
+            entry_size = os.path.getsize(path)
+        except OSError as e:
+            mlog.debug(f'Could not write compiler check cache entry {path}: {e}')
+            return
+        if self.size is None:
+            self.size = self._scan_size()
+        else:
+            self.size += entry_size
+        if self.size > self.max_size:
+            self.evict()
+
+    def _entries(self) -> T.List[T.Tuple[float, int, str]]:
+        entries = []  # type: T.List[T.Tuple[float, int, str]]
+        try:
+            subdirs = os.listdir(self.cache_dir)
+        except OSError:
+            return entries
+        for d in subdirs:
+            subdir = os.path.join(self.cache_dir, d)
+            if len(d) != 2 or not os.path.isdir(subdir):
+                continue
+            with os.scandir(subdir) as it:
+                for e in it:
+                    try:
+                        st = e.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, e.path))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(e[1] for e in self._entries())
+
+    def evict(self) -> None:
+        """Remove the least recently used entries.
+
+        Evict down to 90% of the maximum size so that we do not have to
+        rescan the whole cache for every new entry once it is full.
+        """
+        entries = sorted(self._entries())
+        size = sum(e[1] for e in entries)
+        target = self.max_size * 9 // 10
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            size -= entry_size
+        self.size = size
+
+
+@lru_cache(maxsize=None)
+def get_check_cache(cache_dir: str) -> CompilerCheckCache:
+    return CompilerCheckCache(cache_dir)
@@ -17,6 +17,7 @@ import contextlib, os.path, re
 import enum
 import itertools
 import typing as T
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 
 from .. import coredata
@@ -28,6 +29,7 @@ from ..mesonlib import (
 )
 
 from ..arglist import CompilerArgs
+from .checkcache import CompilerCheckCache, get_check_cache
 
 if T.TYPE_CHECKING:
     from ..build import BuildTarget
@@ -798,6 +800,15 @@ class Compiler(metaclass=abc.ABCMeta):
                 result.output_name = output
             yield result
 
+    @staticmethod
+    def _log_cached_compile(header: str, code: str, p: CompileResult) -> None:
+        p.cached = True
+        mlog.debug(header)
+        mlog.debug('Cached command line: ', ' '.join(p.command), '\n')
+        mlog.debug('Code:\n', code)
+        mlog.debug('Cached compiler stdout:\n', p.stdout)
+        mlog.debug('Cached compiler stderr:\n', p.stderr)
+
     @contextlib.contextmanager
     def cached_compile(self, code: str, cdata: coredata.CoreData, *,
                        extra_args: T.Union[None, T.List[str], CompilerArgs] = None,
@@ -812,17 +823,28 @@ class Compiler(metaclass=abc.ABCMeta):
         # Check if not cached, and generate, otherwise get from the cache
         if key in cdata.compiler_check_cache:
             p = cdata.compiler_check_cache[key]  # type: CompileResult
-            p.cached = True
-            mlog.debug('Using cached compile:')
-            mlog.debug('Cached command line: ', ' '.join(p.command), '\n')
-            mlog.debug('Code:\n', code)
-            mlog.debug('Cached compiler stdout:\n', p.stdout)
-            mlog.debug('Cached compiler stderr:\n', p.stderr)
+            self._log_cached_compile('Using cached compile:', code, p)
             yield p
-        else:
-            with self.compile(code, extra_args=extra_args, mode=mode, want_output=False, temp_dir=temp_dir) as p:
+            return
+
+        # Then look into the persistent cache shared between build directories
+        persistent_cache = None  # type: T.Optional[CompilerCheckCache]
+        cache_opt = cdata.options.get(OptionKey('check_cache'))
+        if cache_opt is not None and cache_opt.value:
+            persistent_cache = get_check_cache(cache_opt.value)
+            pkey = persistent_cache.make_key(self.exelist, self.version, code, textra_args, mode)
+            p = persistent_cache.get(pkey)
+            if p is not None:
                 cdata.compiler_check_cache[key] = p
+                self._log_cached_compile('Using compile from persistent cache:', code, p)
                 yield p
+                return
+
+        with self.compile(code, extra_args=extra_args, mode=mode, want_output=False, temp_dir=temp_dir) as p:
+            cdata.compiler_check_cache[key] = p
+            if persistent_cache is not None:
+                persistent_cache.put(pkey, p)
+            yield p
 
     def get_colorout_args(self, colortype: str) -> T.List[str]:
         # TODO: colortype can probably be an emum
@@ -1233,6 +1255,40 @@ class Compiler(metaclass=abc.ABCMeta):
         return []
 
 
+def _run_captured(check: T.Callable[[], '_T']) -> T.Tuple[T.Optional['_T'], T.Optional[Exception], T.List['mlog.CapturedCall']]:
+    with mlog.capture() as calls:
+        try:
+            return check(), None, calls
+        except Exception as e:
+            return None, e, calls
+
+def run_checks(checks: T.Sequence[T.Callable[[], '_T']]) -> T.List['_T']:
+    """Run independent compiler checks concurrently.
+
+    Each check is a callable that does not depend on the result of any of
+    the others, typically a partial application of one of the Compiler
+    check methods. The results are returned in the same order as the
+    checks and everything they logged is written out in that order too, so
+    meson-log.txt stays deterministic. The first exception raised by a
+    check is re-raised after its preceding checks were logged.
+    """
+    if len(checks) < 2:
+        return [c() for c in checks]
+    workers = min(len(checks), os.cpu_count() or 1)
+    results = []  # type: T.List[_T]
+    with ThreadPoolExecutor(max_workers=workers) as e:
+        futures = [e.submit(_run_captured, c) for c in checks]
+        for f in futures:
+            result, exc, calls = f.result()
+            mlog.replay(calls)
+            if exc is not None:
+                for pending in futures:
+                    pending.cancel()
+                raise exc
+            results.append(result)
+    return results
+
+
 def get_global_options(lang: str,
                        comp: T.Type[Compiler],
                        for_machine: MachineChoice,
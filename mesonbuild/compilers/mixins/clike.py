@@ -506,10 +506,59 @@ class CLikeCompiler(Compiler):
         return self.compiles(t.format(**fargs), env, extra_args=extra_args,
                              dependencies=dependencies)[0]
 
+    def _extract_int(self, expression: str, prefix: str, env: 'Environment',
+                     extra_args: T.Optional[T.List[str]],
+                     dependencies: T.Optional[T.List['Dependency']]) -> T.Optional[int]:
+        """Get the value of a constant expression with a single compilation.
+
+        The decimal digits of the value are stored in a character array
+        surrounded by a marker, which ends up verbatim in the data section of
+        the object file whatever its format is. This is the same trick
+        CMake's CheckTypeSize uses. None is returned if the code does not
+        compile or the marker can't be found in the object file, for
+        instance because it only contains LTO bytecode.
+        """
+        digits = ',\n            '.join(
+            f"(char)('0' + (MESON_VALUE < 0 ? -((MESON_VALUE / {10 ** i}LL) % 10) : (MESON_VALUE / {10 ** i}LL) % 10))"
+            for i in reversed(range(19)))
+        t = f'''#include <stdio.h>
+        {prefix}
+        #define MESON_VALUE ((long long)({expression}))
+        char meson_int_value[] = {{
+            'M', 'E', 'S', 'O', 'N', '_', 'I', 'N', 'T', '[',
+            (char)(MESON_VALUE < 0 ? '-' : '+'),
+            {digits},
+            ']', '\\0'
+        }};'''
+        with self._build_wrapper(t, env, extra_args, dependencies, mode='compile', want_output=True) as p:
+            if p.returncode != 0:
+                return None
+            try:
+                with open(p.output_name, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                return None
+        values = set(re.findall(rb'MESON_INT\[([+-][0-9]{19})\]', data))
+        if len(values) != 1:
+            return None
+        return int(values.pop())
+
     def cross_compute_int(self, expression: str, low: T.Optional[int], high: T.Optional[int],
                           guess: T.Optional[int], prefix: str, env: 'Environment',
                           extra_args: T.Optional[T.List[str]] = None,
                           dependencies: T.Optional[T.List['Dependency']] = None) -> int:
+        value = self._extract_int(expression, prefix, env, extra_args, dependencies)
+        if value is not None:
+            if isinstance(low, int) and isinstance(high, int):
+                if high < low:
+                    raise mesonlib.EnvironmentException('high limit smaller than low limit')
+                if not low <= value <= high:
+                    raise mesonlib.EnvironmentException('Value out of given range')
+            return value
+
+        # The value could not be read from the object file, find it with
+        # one compilation per probe instead.
+
         # Try user's guess first
         if isinstance(guess, int):
             if self._compile_int('%s == %d' % (expression, guess), prefix, env, extra_args, dependencies):
@@ -441,7 +441,15 @@ class CoreData:
             DependencyCache(self.options, MachineChoice.BUILD),
             DependencyCache(self.options, MachineChoice.HOST))
 
-        self.compiler_check_cache = OrderedDict()  # type: T.Dict[CompilerCheckCacheKey, compiler.CompileResult]
+        # The compiler check cache is by far the biggest part of the coredata
+        # and is only needed when (re)configuring, so it is pickled into its
+        # own file and only loaded when accessed, see the compiler_check_cache
+        # property.
+        self._compiler_check_cache = OrderedDict()  # type: T.Optional[T.Dict[CompilerCheckCacheKey, CompileResult]]
+        self._compiler_check_cache_file = None  # type: T.Optional[str]
+        # Number of entries when the cache was last loaded or saved, -1 if it
+        # has never been saved.
+        self._compiler_check_cache_saved = -1
 
         # CMake cache
         self.cmake_cache: PerMachine[CMakeStateCache] = PerMachine(CMakeStateCache(), CMakeStateCache())
@@ -451,6 +459,22 @@ class CoreData:
         self.builtin_options_libdir_cross_fixup()
         self.init_builtins('')
 
+    def __getstate__(self) -> T.Dict[str, T.Any]:
+        state = self.__dict__.copy()
+        # Saved separately, see save()
+        state['_compiler_check_cache'] = None
+        state['_compiler_check_cache_file'] = None
+        return state
+
+    @property
+    def compiler_check_cache(self) -> T.Dict['CompilerCheckCacheKey', 'CompileResult']:
+        if self._compiler_check_cache is None:
+            self._compiler_check_cache = OrderedDict()
+            if self._compiler_check_cache_file is not None:
+                self._compiler_check_cache.update(_load_section(self._compiler_check_cache_file, dict) or {})
+            self._compiler_check_cache_saved = len(self._compiler_check_cache)
+        return self._compiler_check_cache
+
     @staticmethod
     def __load_config_files(options: argparse.Namespace, scratch_dir: str, ftype: str) -> T.List[str]:
         # Need to try and make the passed filenames absolute because when the
@@ -534,6 +558,14 @@ class CoreData:
                 prefix = prefix[:-1]
         return prefix
 
+    @staticmethod
+    def sanitize_check_cache(value: T.Any) -> T.Any:
+        # The option outlives the current working directory, so always store
+        # an absolute path.
+        if not isinstance(value, str) or not value:
+            return value
+        return os.path.abspath(os.path.expanduser(value))
+
     def sanitize_dir_option_value(self, prefix: str, option: OptionKey, value: T.Any) -> T.Any:
         '''
         If the option is an installation directory option and the value is an
@@ -594,6 +626,22 @@ class CoreData:
                 'Maximum number of linker processes to run or 0 for no '
                 'limit',
                 (0, None, 0))
+            self.options[OptionKey('backend_max_heavy_links')] = UserIntegerOption(
+                'Maximum number of linker processes estimated to use a lot '
+                'of memory to run or 0 to not limit them separately',
+                (0, None, 0))
+            self.options[OptionKey('backend_generate_jobs')] = UserIntegerOption(
+                'Number of processes used to generate build.ninja or 0 for '
+                'the number of CPUs',
+                (0, None, 1))
+            self.options[OptionKey('backend_split_build_ninja')] = UserBooleanOption(
+                'Write the build statements of the targets of each '
+                'subdirectory to a separate file',
+                False)
+            self.options[OptionKey('backend_split_compdb')] = UserBooleanOption(
+                'Write the compile commands of each subproject to a '
+                'separate compile_commands.json',
+                False)
         elif backend_name.startswith('vs'):
             self.options[OptionKey('backend_startup_project')] = UserStringOption(
                 'Default project to execute in Visual Studio',
@@ -623,6 +671,8 @@ class CoreData:
         if key.is_builtin():
             if key.name == 'prefix':
                 value = self.sanitize_prefix(value)
+            elif key.name == 'check_cache':
+                value = self.sanitize_check_cache(value)
             else:
                 prefix = self.options[OptionKey('prefix')].value
                 value = self.sanitize_dir_option_value(prefix, key, value)
@@ -986,6 +1036,28 @@ def get_cmd_line_options(build_dir: str, options: argparse.Namespace) -> str:
 def major_versions_differ(v1: str, v2: str) -> bool:
     return v1.split('.')[0:2] != v2.split('.')[0:2]
 
+def _load_section(filename: str, expected_type: type) -> T.Any:
+    """Load a section of the coredata stored in its own file.
+
+    Sections only hold data that can be recomputed, so a missing, corrupted
+    or outdated section is silently ignored.
+    """
+    try:
+        with open(filename, 'rb') as f:
+            file_version, obj = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError,
+            ModuleNotFoundError, AttributeError):
+        return None
+    if major_versions_differ(file_version, version) or not isinstance(obj, expected_type):
+        return None
+    return obj
+
+def _save_section(obj: T.Any, filename: str) -> None:
+    tempfilename = filename + '~'
+    with open(tempfilename, 'wb') as f:
+        pickle.dump((version, obj), f)
+    os.replace(tempfilename, filename)
+
 def load(build_dir: str) -> CoreData:
     filename = os.path.join(build_dir, 'meson-private', 'coredata.dat')
     load_fail_msg = f'Coredata file {filename!r} is corrupted. Try with a fresh build tree.'
@@ -1003,6 +1075,7 @@ def load(build_dir: str) -> CoreData:
         raise MesonException(load_fail_msg)
     if major_versions_differ(obj.version, version):
         raise MesonVersionMismatchException(obj.version, version)
+    obj._compiler_check_cache_file = os.path.join(build_dir, 'meson-private', 'compiler_check_cache.dat')
     return obj
 
 def save(obj: CoreData, build_dir: str) -> str:
@@ -1011,11 +1084,31 @@ def save(obj: CoreData, build_dir: str) -> str:
     tempfilename = filename + '~'
     if major_versions_differ(obj.version, version):
         raise MesonException('Fatal version mismatch corruption.')
+
+    # The compiler check cache only ever grows, so it only needs to be
+    # rewritten if it was loaded and got new entries.
+    cache = obj._compiler_check_cache
+    if cache is not None and len(cache) != obj._compiler_check_cache_saved:
+        _save_section(cache, os.path.join(build_dir, 'meson-private', 'compiler_check_cache.dat'))
+        obj._compiler_check_cache_saved = len(cache)
+
+    data = pickle.dumps(obj)
     if os.path.exists(filename):
-        import shutil
-        shutil.copyfile(filename, prev_filename)
+        # Keep the previous version around so that a failed configuration
+        # can be rolled back. Hard linking it avoids copying the file.
+        if os.path.exists(prev_filename):
+            os.unlink(prev_filename)
+        try:
+            os.link(filename, prev_filename)
+        except OSError:
+            import shutil
+            shutil.copyfile(filename, prev_filename)
+        # Avoid the costly fsync when nothing changed
+        with open(filename, 'rb') as f:
+            if f.read() == data:
+                return filename
     with open(tempfilename, 'wb') as f:
-        pickle.dump(obj, f)
+        f.write(data)
         f.flush()
         os.fsync(f.fileno())
     os.replace(tempfilename, filename)
@@ -1160,19 +1253,23 @@ BUILTIN_DIR_OPTIONS: 'KeyedOptionDictType' = OrderedDict([
 
 BUILTIN_CORE_OPTIONS: 'KeyedOptionDictType' = OrderedDict([
     (OptionKey('auto_features'),   BuiltinOption(UserFeatureOption, "Override value of all 'auto' features", 'auto')),
+    (OptionKey('auto_pch'),        BuiltinOption(UserComboOption, 'Precompile the headers most included by the sources of each target', 'off', choices=['off', 'target'])),
     (OptionKey('backend'),         BuiltinOption(UserComboOption, 'Backend to use', 'ninja', choices=backendlist)),
     (OptionKey('buildtype'),       BuiltinOption(UserComboOption, 'Build type to use', 'debug',
                                                  choices=['plain', 'debug', 'debugoptimized', 'release', 'minsize', 'custom'])),
+    (OptionKey('check_cache'),     BuiltinOption(UserStringOption, 'Directory of a compiler check cache shared between build directories', '')),
     (OptionKey('debug'),           BuiltinOption(UserBooleanOption, 'Debug', True)),
     (OptionKey('default_library'), BuiltinOption(UserComboOption, 'Default library type', 'shared', choices=['shared', 'static', 'both'],
                                                  yielding=False)),
     (OptionKey('errorlogs'),       BuiltinOption(UserBooleanOption, "Whether to print the logs from failing tests", True)),
+    (OptionKey('incremental_regen'), BuiltinOption(UserBooleanOption, 'Only evaluate the changed build files of subdirectories again when regenerating', False)),
     (OptionKey('install_umask'),   BuiltinOption(UserUmaskOption, 'Default umask to apply on permissions of installed files', '022')),
     (OptionKey('layout'),          BuiltinOption(UserComboOption, 'Build directory layout', 'mirror', choices=['mirror', 'flat'])),
     (OptionKey('optimization'),    BuiltinOption(UserComboOption, 'Optimization level', '0', choices=['0', 'g', '1', '2', '3', 's'])),
     (OptionKey('stdsplit'),        BuiltinOption(UserBooleanOption, 'Split stdout and stderr in test logs', True)),
     (OptionKey('strip'),           BuiltinOption(UserBooleanOption, 'Strip targets on install', False)),
     (OptionKey('unity'),           BuiltinOption(UserComboOption, 'Unity build', 'off', choices=['on', 'off', 'subprojects'])),
+    (OptionKey('unity_partition'), BuiltinOption(UserComboOption, 'How sources are grouped into unity files', 'order', choices=['order', 'cost'])),
     (OptionKey('unity_size'),      BuiltinOption(UserIntegerOption, 'Unity block size', (2, None, 4))),
     (OptionKey('warning_level'),   BuiltinOption(UserComboOption, 'Compiler warning level to use', '1', choices=['0', '1', '2', '3'], yielding=False)),
     (OptionKey('werror'),          BuiltinOption(UserBooleanOption, 'Treat warnings as errors', False, yielding=False)),
@@ -12,50 +12,78 @@
 # limitations under the License.
 
 import collections
+import re
+import typing as T
+from concurrent.futures import ThreadPoolExecutor
 
-def parse(lines):
-    rules = []
-    targets = []
-    deps = []
-    in_deps = False
-    out = ''
-    for line in lines:
-        if not line.endswith('\n'):
-            line += '\n'
-        escape = None
-        for c in line:
-            if escape:
-                if escape == '$' and c != '$':
-                    out += '$'
-                if escape == '\\' and c == '\n':
-                    continue
-                out += c
-                escape = None
-                continue
-            if c == '\\' or c == '$':
-                escape = c
-                continue
-            elif c in (' ', '\n'):
-                if out != '':
-                    if in_deps:
-                        deps.append(out)
-                    else:
-                        targets.append(out)
-                out = ''
-                if c == '\n':
-                    rules.append((targets, deps))
-                    targets = []
-                    deps = []
-                    in_deps = False
-                continue
-            elif c == ':':
-                targets.append(out)
-                out = ''
-                in_deps = True
-                continue
-            out += c
+Rule = T.Tuple[T.List[str], T.List[str]]
+
+# Escaped separators are replaced by these placeholders until the text is
+# split, NUL itself is escaped as \0z.
+_placeholders = {' ': '\0s', ':': '\0c', '\n': '\0n'}
+_escape_re = re.compile(r'[\\$].', re.DOTALL)
+
+def _unescape(m: T.Match[str]) -> str:
+    s = m.group()
+    if s[0] == '\\':
+        if s[1] == '\n':
+            # Line continuation
+            return ''
+        return _placeholders.get(s[1], s[1])
+    if s == '$$':
+        return '$'
+    return '$' + _placeholders.get(s[1], s[1])
+
+def _restore(name: str) -> str:
+    if '\0' not in name:
+        return name
+    return name.replace('\0s', ' ').replace('\0c', ':').replace('\0n', '\n').replace('\0z', '\0')
+
+def parse(lines: T.Iterable[str]) -> T.List[Rule]:
+    """Parse the lines of a Makefile style depfile, as read from the file."""
+    text = ''.join(line if line.endswith('\n') else line + '\n' for line in lines)
+    text = text.replace('\0', '\0z')
+    # Get rid of the escapes first, so that the text can be split on the
+    # remaining separators.
+    if '$' in text:
+        text = _escape_re.sub(_unescape, text)
+    elif '\\' in text:
+        # The same as above, without calling back into Python for every
+        # escaped character. Escaped backslashes must be paired first.
+        text = text.replace('\\\\', '\0b').replace('\\\n', '').replace('\\ ', '\0s').replace('\\:', '\0c')
+        text = text.replace('\\', '').replace('\0b', '\\')
+    rules = []  # type: T.List[Rule]
+    for line in text.split('\n')[:-1]:
+        targets = []  # type: T.List[str]
+        deps = []  # type: T.List[str]
+        names = targets
+        segments = line.split(':')
+        for segment in segments[:-1]:
+            words = segment.split(' ')
+            names.extend(_restore(w) for w in words[:-1] if w)
+            # Whatever is right before a colon is a target, even nothing
+            targets.append(_restore(words[-1]))
+            names = deps
+        names.extend(_restore(w) for w in segments[-1].split(' ') if w)
+        rules.append((targets, deps))
     return rules
 
+def _parse_file(filename: str) -> T.List[Rule]:
+    with open(filename, encoding='utf-8', errors='surrogateescape') as f:
+        return parse(f)
+
+def parse_files(filenames: T.Sequence[str]) -> T.List[T.List[Rule]]:
+    """Parse many depfiles at once.
+
+    The files are read by a pool of threads, so that waiting for the
+    filesystem overlaps with parsing. The rules of every file are returned
+    in the same order as the filenames. Errors reading a file are raised.
+    """
+    if len(filenames) < 2:
+        return [_parse_file(f) for f in filenames]
+    with ThreadPoolExecutor(max_workers=min(len(filenames), 8)) as e:
+        return list(e.map(_parse_file, filenames))
+
 Target = collections.namedtuple('Target', ['deps'])
 
 class DepFile:
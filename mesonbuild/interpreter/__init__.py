@@ -18,6 +18,7 @@
 
 from .interpreter import Interpreter, permitted_test_kwargs, permitted_dependency_kwargs
 from .compiler import CompilerHolder
+from .incremental import IncrementalFallback, check_subdirs
 from .interpreterobjects import (ExecutableHolder, BuildTargetHolder, CustomTargetHolder,
                                  CustomTargetIndexHolder, MachineHolder, Test,
                                  ConfigurationDataHolder, SubprojectHolder, DependencyHolder,
@@ -6,6 +6,7 @@ from .interpreterobjects import (IncludeDirsHolder, ExternalLibraryHolder,
 from .. import mesonlib
 from .. import mlog
 from .. import dependencies
+from ..compilers import run_checks
 from ..interpreterbase import (InterpreterObject, noPosargs, noKwargs, permittedKwargs,
                                FeatureNew, FeatureNewKwargs, disablerIfNotFound,
                                check_stringlist, InterpreterException, InvalidArguments,
@@ -77,8 +78,10 @@ class CompilerHolder(InterpreterObject):
                              'check_header': self.check_header_method,
                              'has_header': self.has_header_method,
                              'has_header_symbol': self.has_header_symbol_method,
+                             'get_supported_headers': self.get_supported_headers_method,
                              'run': self.run_method,
                              'has_function': self.has_function_method,
+                             'get_supported_functions': self.get_supported_functions_method,
                              'has_member': self.has_member_method,
                              'has_members': self.has_members_method,
                              'has_type': self.has_type_method,
@@ -333,6 +336,9 @@ class CompilerHolder(InterpreterObject):
         had, cached = self.compiler.has_function(funcname, prefix, self.environment,
                                                  extra_args=extra_args,
                                                  dependencies=deps)
+        return self._log_has_function(funcname, msg, had, cached)
+
+    def _log_has_function(self, funcname, msg, had, cached):
         cached = mlog.blue('(cached)') if cached else ''
         if had:
             hadtxt = mlog.green('YES')
@@ -341,6 +347,27 @@ class CompilerHolder(InterpreterObject):
         mlog.log('Checking for function', mlog.bold(funcname, True), msg, hadtxt, cached)
         return had
 
+    @FeatureNew('compiler.get_supported_functions', '0.59.0')
+    @permittedKwargs({
+        'prefix',
+        'no_builtin_args',
+        'include_directories',
+        'args',
+        'dependencies',
+    })
+    def get_supported_functions_method(self, args, kwargs):
+        funcnames = mesonlib.stringlistify(args)
+        prefix = kwargs.get('prefix', '')
+        if not isinstance(prefix, str):
+            raise InterpreterException('Prefix argument of get_supported_functions must be a string.')
+        extra_args = self.determine_args(kwargs)
+        deps, msg = self.determine_dependencies(kwargs)
+        results = run_checks([functools.partial(self.compiler.has_function, f, prefix, self.environment,
+                                                extra_args=extra_args, dependencies=deps)
+                              for f in funcnames])
+        return [f for f, (had, cached) in zip(funcnames, results)
+                if self._log_has_function(f, msg, had, cached)]
+
     @permittedKwargs({
         'prefix',
         'no_builtin_args',
@@ -565,16 +592,31 @@ class CompilerHolder(InterpreterObject):
         deps, msg = self.determine_dependencies(kwargs)
         haz, cached = self.compiler.has_header(hname, prefix, self.environment,
                                                extra_args=extra_args, dependencies=deps)
-        cached = mlog.blue('(cached)') if cached else ''
         if required and not haz:
             raise InterpreterException(f'{self.compiler.get_display_language()} header {hname!r} not found')
-        elif haz:
-            h = mlog.green('YES')
-        else:
-            h = mlog.red('NO')
+        return self._log_has_header(hname, msg, haz, cached)
+
+    def _log_has_header(self, hname, msg, haz, cached):
+        cached = mlog.blue('(cached)') if cached else ''
+        h = mlog.green('YES') if haz else mlog.red('NO')
         mlog.log('Has header', mlog.bold(hname, True), msg, h, cached)
         return haz
 
+    @FeatureNew('compiler.get_supported_headers', '0.59.0')
+    @permittedKwargs(header_permitted_kwargs - {'required'})
+    def get_supported_headers_method(self, args, kwargs):
+        hnames = mesonlib.stringlistify(args)
+        prefix = kwargs.get('prefix', '')
+        if not isinstance(prefix, str):
+            raise InterpreterException('Prefix argument of get_supported_headers must be a string.')
+        extra_args = functools.partial(self.determine_args, kwargs)
+        deps, msg = self.determine_dependencies(kwargs)
+        results = run_checks([functools.partial(self.compiler.has_header, h, prefix, self.environment,
+                                                extra_args=extra_args, dependencies=deps)
+                              for h in hnames])
+        return [h for h, (haz, cached) in zip(hnames, results)
+                if self._log_has_header(h, msg, haz, cached)]
+
     @FeatureNewKwargs('compiler.has_header_symbol', '0.50.0', ['required'])
     @permittedKwargs(header_permitted_kwargs)
     def has_header_symbol_method(self, args, kwargs):
@@ -667,14 +709,17 @@ class CompilerHolder(InterpreterObject):
     def has_multi_arguments_method(self, args: T.Sequence[str], kwargs: dict):
         args = mesonlib.stringlistify(args)
         result, cached = self.compiler.has_multi_arguments(args, self.environment)
+        return self._log_has_arguments('arguments', args, result, cached)
+
+    def _log_has_arguments(self, kind, args, result, cached):
         if result:
             h = mlog.green('YES')
         else:
             h = mlog.red('NO')
         cached = mlog.blue('(cached)') if cached else ''
         mlog.log(
-            'Compiler for {} supports arguments {}:'.format(
-                self.compiler.get_display_language(), ' '.join(args)),
+            'Compiler for {} supports {} {}:'.format(
+                self.compiler.get_display_language(), kind, ' '.join(args)),
             h, cached)
         return result
 
@@ -682,11 +727,10 @@ class CompilerHolder(InterpreterObject):
     @permittedKwargs({})
     def get_supported_arguments_method(self, args, kwargs):
         args = mesonlib.stringlistify(args)
-        supported_args = []
-        for arg in args:
-            if self.has_argument_method(arg, kwargs):
-                supported_args.append(arg)
-        return supported_args
+        results = run_checks([functools.partial(self.compiler.has_multi_arguments, [a], self.environment)
+                              for a in args])
+        return [a for a, (result, cached) in zip(args, results)
+                if self._log_has_arguments('arguments', [a], result, cached)]
 
     @permittedKwargs({})
     def first_supported_argument_method(self, args: T.Sequence[str], kwargs: dict) -> T.List[str]:
@@ -710,26 +754,16 @@ class CompilerHolder(InterpreterObject):
     def has_multi_link_arguments_method(self, args, kwargs):
         args = mesonlib.stringlistify(args)
         result, cached = self.compiler.has_multi_link_arguments(args, self.environment)
-        cached = mlog.blue('(cached)') if cached else ''
-        if result:
-            h = mlog.green('YES')
-        else:
-            h = mlog.red('NO')
-        mlog.log(
-            'Compiler for {} supports link arguments {}:'.format(
-                self.compiler.get_display_language(), ' '.join(args)),
-            h, cached)
-        return result
+        return self._log_has_arguments('link arguments', args, result, cached)
 
     @FeatureNew('compiler.get_supported_link_arguments_method', '0.46.0')
     @permittedKwargs({})
     def get_supported_link_arguments_method(self, args, kwargs):
         args = mesonlib.stringlistify(args)
-        supported_args = []
-        for arg in args:
-            if self.has_link_argument_method(arg, kwargs):
-                supported_args.append(arg)
-        return supported_args
+        results = run_checks([functools.partial(self.compiler.has_multi_link_arguments, [a], self.environment)
+                              for a in args])
+        return [a for a, (result, cached) in zip(args, results)
+                if self._log_has_arguments('link arguments', [a], result, cached)]
 
     @FeatureNew('compiler.first_supported_link_argument_method', '0.46.0')
     @permittedKwargs({})
@@ -748,16 +782,16 @@ class CompilerHolder(InterpreterObject):
         if len(args) != 1:
             raise InterpreterException('has_func_attribute takes exactly one argument.')
         result, cached = self.compiler.has_func_attribute(args[0], self.environment)
-        cached = mlog.blue('(cached)') if cached else ''
-        h = mlog.green('YES') if result else mlog.red('NO')
-        mlog.log('Compiler for {} supports function attribute {}:'.format(self.compiler.get_display_language(), args[0]), h, cached)
-        return result
+        return self._log_has_arguments('function attribute', args, result, cached)
 
     @FeatureNew('compiler.get_supported_function_attributes', '0.48.0')
     @permittedKwargs({})
     def get_supported_function_attributes_method(self, args, kwargs):
         args = mesonlib.stringlistify(args)
-        return [a for a in args if self.has_func_attribute_method(a, kwargs)]
+        results = run_checks([functools.partial(self.compiler.has_func_attribute, a, self.environment)
+                              for a in args])
+        return [a for a, (result, cached) in zip(args, results)
+                if self._log_has_arguments('function attribute', [a], result, cached)]
 
     @FeatureNew('compiler.get_argument_syntax_method', '0.49.0')
     @noPosargs
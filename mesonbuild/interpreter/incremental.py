@@ -0,0 +1,403 @@
+# Copyright 2021 The Meson development team
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Evaluating the meson.build files of subdirectories again on their own.
+
+While the main project is evaluated, the SubdirRecorder writes down for
+every subdir() what it read from the variables set before, what it set
+that is read afterwards, and what it added to the build. When only the
+meson.build files of some subdirectories changed, rerun_subdirs() starts
+from the previous build, removes what these subdirectories added and
+evaluates them again with the variables they read. It raises
+IncrementalFallback whenever the result could differ from evaluating the
+whole project again.
+"""
+
+import itertools
+import os
+import typing as T
+from collections import OrderedDict
+
+from .. import build
+from .. import mesonlib
+from ..interpreterbase import Disabler
+from .compiler import CompilerHolder
+from .interpreterobjects import (
+    BothLibrariesHolder, CustomTargetHolder, CustomTargetIndexHolder, DependencyHolder,
+    ExecutableHolder, ExternalLibraryHolder, ExternalProgramHolder, FeatureOptionHolder,
+    GeneratedListHolder, IncludeDirsHolder, JarHolder, RunTargetHolder, SharedLibraryHolder,
+    SharedModuleHolder, StaticLibraryHolder,
+)
+
+if T.TYPE_CHECKING:
+    from .interpreter import Interpreter
+
+# Functions that only add to the lists of SUBDIR_PRODUCTS and to the
+# targets, or have no effect on the build at all. Subdirectories that call
+# any other are always evaluated with the whole project.
+RERUNNABLE_FUNCTIONS = frozenset([
+    'alias_target', 'assert', 'benchmark', 'both_libraries', 'build_target',
+    'configuration_data', 'configure_file', 'custom_target', 'declare_dependency',
+    'dependency', 'disabler', 'environment', 'error', 'executable', 'files',
+    'find_library', 'find_program', 'generator', 'get_option', 'get_variable',
+    'include_directories', 'install_data', 'install_headers', 'install_man',
+    'install_subdir', 'is_disabler', 'is_variable', 'jar', 'join_paths', 'library',
+    'message', 'range', 'run_command', 'run_target', 'set_variable', 'shared_library',
+    'shared_module', 'static_library', 'subdir_done', 'test', 'vcs_tag', 'warning',
+])
+
+# Fields of Build that evaluating the main project only fills after
+# project(), taken from the previous build when evaluating subdirectories
+# again
+RESTORED_FIELDS = (
+    'targets', 'run_target_names', 'global_args', 'global_link_args', 'projects_args',
+    'projects_link_args', 'tests', 'benchmarks', 'headers', 'man', 'data', 'subprojects',
+    'install_scripts', 'postconf_scripts', 'dist_scripts', 'install_dirs',
+    'dep_manifest_name', 'test_setups', 'test_setup_default_name', 'find_overrides',
+    'searched_programs', 'dependency_overrides',
+)
+# Dictionaries of Build that project() adds to
+MERGED_FIELDS = ('projects', 'dep_manifest')
+
+TARGET_HOLDERS = {c.__name__: c for c in [
+    CustomTargetHolder, CustomTargetIndexHolder, ExecutableHolder, JarHolder,
+    RunTargetHolder, SharedLibraryHolder, SharedModuleHolder, StaticLibraryHolder]}
+PLAIN_HOLDERS = {c.__name__: c for c in [GeneratedListHolder, IncludeDirsHolder]}
+SUBPROJECT_HOLDERS = {c.__name__: c for c in [DependencyHolder, ExternalLibraryHolder]}
+
+# Saved value of a variable that was not set
+MISSING = ('missing',)
+
+class IncrementalFallback(Exception):
+    """The whole project has to be evaluated again."""
+
+def save_value(value: T.Any) -> T.Optional[T.Tuple]:
+    """Save the value of a variable to be restored by restore_value() in
+    another interpreter, or return None if that is not possible.
+
+    Objects of the build are kept as they are, so that they are pickled
+    along with the build and restored as the same objects.
+    """
+    if isinstance(value, (str, int, float, mesonlib.File)):
+        return ('plain', value)
+    if isinstance(value, list):
+        items = [save_value(v) for v in value]
+        if any(i is None for i in items):
+            return None
+        if all(i[0] == 'plain' for i in items):
+            return ('plain', value)
+        return ('list', items)
+    if isinstance(value, dict):
+        saved = {k: save_value(v) for k, v in value.items()}
+        if any(i is None for i in saved.values()):
+            return None
+        if all(i[0] == 'plain' for i in saved.values()):
+            return ('plain', value)
+        return ('dict', saved)
+    if isinstance(value, Disabler):
+        return ('disabler',)
+    name = type(value).__name__
+    if name in TARGET_HOLDERS or name in PLAIN_HOLDERS:
+        return ('holder', name, value.held_object)
+    if name in SUBPROJECT_HOLDERS:
+        return ('holder', name, value.held_object, value.subproject)
+    if isinstance(value, BothLibrariesHolder):
+        return ('both', value.shared_holder.held_object, value.static_holder.held_object)
+    if isinstance(value, ExternalProgramHolder):
+        return ('program', value.held_object, value.subproject, value.backend is not None)
+    if isinstance(value, CompilerHolder):
+        return ('compiler', value.compiler, value.subproject)
+    if isinstance(value, FeatureOptionHolder):
+        return ('feature', value.name)
+    return None
+
+def restore_value(saved: T.Tuple, interp: 'Interpreter') -> T.Any:
+    kind = saved[0]
+    if kind == 'plain':
+        return saved[1]
+    if kind == 'list':
+        return [restore_value(v, interp) for v in saved[1]]
+    if kind == 'dict':
+        return {k: restore_value(v, interp) for k, v in saved[1].items()}
+    if kind == 'disabler':
+        return Disabler()
+    if kind == 'holder':
+        name = saved[1]
+        if name in TARGET_HOLDERS:
+            return TARGET_HOLDERS[name](saved[2], interp)
+        if name in PLAIN_HOLDERS:
+            return PLAIN_HOLDERS[name](saved[2])
+        return SUBPROJECT_HOLDERS[name](saved[2], saved[3])
+    if kind == 'both':
+        return BothLibrariesHolder(SharedLibraryHolder(saved[1], interp),
+                                   StaticLibraryHolder(saved[2], interp), interp)
+    if kind == 'program':
+        return ExternalProgramHolder(saved[1], saved[2], interp.backend if saved[3] else None)
+    if kind == 'compiler':
+        return CompilerHolder(saved[1], interp.environment, saved[2])
+    assert kind == 'feature'
+    return FeatureOptionHolder(interp.environment, saved[1], interp.get_option_internal(saved[1]))
+
+class VariableTracker(dict):
+    """The variables of the main project, reporting their use to a
+    SubdirRecorder."""
+
+    def __init__(self, recorder: 'SubdirRecorder', variables: T.Dict[str, T.Any]):
+        super().__init__(variables)
+        self.recorder = recorder
+
+    def __getitem__(self, name: str) -> T.Any:
+        self.recorder.read(name)
+        return super().__getitem__(name)
+
+    def __contains__(self, name: object) -> bool:
+        self.recorder.read(T.cast(str, name))
+        return super().__contains__(name)
+
+    def get(self, name: str, default: T.Any = None) -> T.Any:
+        self.recorder.read(name)
+        return super().get(name, default)
+
+    def __setitem__(self, name: str, value: T.Any) -> None:
+        self.recorder.assign(name)
+        super().__setitem__(name, value)
+
+class SubdirRecorder:
+    def __init__(self, interp: 'Interpreter'):
+        self.interpreter = interp
+        self.state = build.SubdirState()
+        self.stack = []  # type: T.List[T.Tuple[build.SubdirRecord, T.Tuple]]
+        self.seq = 0
+        # Previous record of the subdirectory evaluated by rerun_subdirs()
+        self.rerun_of = None  # type: T.Optional[build.SubdirRecord]
+
+    def global_state(self) -> T.Tuple:
+        """What can only change through functions and methods that
+        subdirectories evaluated again must not call."""
+        b = self.interpreter.build
+        return (len(self.interpreter.subprojects), len(b.install_scripts), len(b.postconf_scripts), len(b.dist_scripts),
+                len(b.find_overrides), len(b.dependency_overrides.host),
+                len(b.dependency_overrides.build), len(b.devenv), len(b.test_setups),
+                b.test_setup_default_name, b.dep_manifest_name)
+
+    def read(self, name: str) -> None:
+        variables = self.interpreter.variables
+        if self.rerun_of is None:
+            self.state.last_read[name] = self.seq
+        for record, _ in self.stack:
+            if record.not_rerunnable is not None or name in record.assigned or name in record.consumed:
+                continue
+            if self.rerun_of is not None and name not in self.rerun_of.consumed:
+                raise IncrementalFallback(f'{record.subdir} uses variable {name!r} that it did not use before')
+            if not dict.__contains__(variables, name):
+                record.consumed[name] = MISSING
+                continue
+            saved = save_value(dict.__getitem__(variables, name))
+            record.consumed[name] = saved
+            if saved is None and record.not_rerunnable is None:
+                record.not_rerunnable = f'uses variable {name!r} of a type that cannot be saved'
+
+    def assign(self, name: str) -> None:
+        for record, _ in self.stack:
+            record.assigned.add(name)
+
+    def function_called(self, name: str) -> None:
+        if not self.stack or name in RERUNNABLE_FUNCTIONS:
+            return
+        if self.rerun_of is not None:
+            raise IncrementalFallback(f'{self.rerun_of.subdir} calls {name}()')
+        for record, _ in self.stack:
+            if record.not_rerunnable is None:
+                record.not_rerunnable = f'calls {name}()'
+
+    def enter(self, subdir: str) -> None:
+        b = self.interpreter.build
+        record = build.SubdirRecord(subdir)
+        record.positions = {n: len(getattr(b, n)) for n in build.SUBDIR_PRODUCTS}
+        record.positions['targets'] = len(b.targets)
+        record.positions['build_def_files'] = len(self.interpreter.build_def_files)
+        self.state.records[subdir] = record
+        self.stack.append((record, self.global_state()))
+        self.seq += 1
+
+    def exit(self) -> None:
+        b = self.interpreter.build
+        record, global_state = self.stack.pop()
+        self.seq += 1
+        record.exit_seq = self.seq
+        if global_state != self.global_state() and record.not_rerunnable is None:
+            record.not_rerunnable = 'changes the global state of the build'
+        if record.not_rerunnable is not None:
+            # Not needed anymore
+            record.consumed = {}
+            record.assigned = set()
+            return
+        for n in build.SUBDIR_PRODUCTS:
+            record.products[n] = getattr(b, n)[record.positions[n]:]
+        record.products['targets'] = list(itertools.islice(b.targets, record.positions['targets'], None))
+        record.build_def_files = self.interpreter.build_def_files[record.positions['build_def_files']:]
+        variables = self.interpreter.variables
+        for name in record.assigned:
+            if dict.__contains__(variables, name):
+                record.exported[name] = save_value(dict.__getitem__(variables, name))
+            else:
+                record.exported[name] = MISSING
+
+    def prune_exported(self, record: build.SubdirRecord) -> None:
+        """Only keep the variables read after the subdirectory."""
+        last_read = self.state.last_read
+        record.exported = {n: v for n, v in record.exported.items()
+                           if last_read.get(n, -1) >= record.exit_seq}
+        for name, saved in record.exported.items():
+            if (saved is None or saved[0] not in {'plain', 'missing'}) and record.not_rerunnable is None:
+                # Evaluating it again creates new objects
+                record.not_rerunnable = f'variable {name!r} is used afterwards'
+
+    def finish(self) -> build.SubdirState:
+        for record in self.state.records.values():
+            self.prune_exported(record)
+        self.state.build_def_files = list(self.interpreter.build_def_files)
+        self.state.devenv = list(self.interpreter.build.devenv)
+        return self.state
+
+def _move_products(b: build.Build, old: build.SubdirRecord, new: build.SubdirRecord) -> T.Dict[str, int]:
+    """Put what new added at the end of the build where old was, return how
+    much each list grew."""
+    growth = {}
+    for n in build.SUBDIR_PRODUCTS:
+        items = getattr(b, n)
+        added = items[new.positions[n]:]
+        del items[new.positions[n]:]
+        items[old.positions[n]:old.positions[n]] = added
+        growth[n] = len(added) - len(old.products[n])
+        new.products[n] = added
+        new.positions[n] = old.positions[n]
+    targets = list(b.targets.items())
+    added = targets[new.positions['targets']:]
+    del targets[new.positions['targets']:]
+    targets[old.positions['targets']:old.positions['targets']] = added
+    b.targets = OrderedDict(targets)
+    growth['targets'] = len(added) - len(old.products['targets'])
+    new.positions['targets'] = old.positions['targets']
+    return growth
+
+def _remove_products(b: build.Build, record: build.SubdirRecord) -> None:
+    for n in build.SUBDIR_PRODUCTS:
+        items = getattr(b, n)
+        start = record.positions[n]
+        end = start + len(record.products[n])
+        if any(a is not o for a, o in itertools.zip_longest(items[start:end], record.products[n])):
+            raise IncrementalFallback(f'the build does not match what {record.subdir} added to it')
+        del items[start:end]
+    start = record.positions['targets']
+    ids = list(itertools.islice(b.targets, start, start + len(record.products['targets'])))
+    if ids != record.products['targets']:
+        raise IncrementalFallback(f'the build does not match what {record.subdir} added to it')
+    for i in ids:
+        target = b.targets.pop(i)
+        if isinstance(target, build.RunTarget):
+            b.run_target_names.discard((target.subproject, target.name))
+
+def _check_exported(record: build.SubdirRecord, old: build.SubdirRecord, last_read: T.Dict[str, int]) -> None:
+    """Check that the variables read after the subdirectory did not change."""
+    for name in record.assigned | set(old.exported):
+        if last_read.get(name, -1) < old.exit_seq:
+            continue
+        # The values from before the subdirectory are only known if it
+        # read them before setting them.
+        before = old.exported[name] if name in old.exported else old.consumed.get(name)
+        after = record.exported[name] if name in record.assigned else old.consumed.get(name)
+        if before is None or after is None or after[0] not in {'plain', 'missing'} or after != before:
+            raise IncrementalFallback(f'{record.subdir} changes variable {name!r} that is used afterwards')
+
+def check_subdirs(previous: build.Build, subdirs: T.List[str]) -> T.List[str]:
+    """Check what can be known before evaluating anything: that subdirs
+    were recorded by the previous configuration and can be evaluated again
+    on their own. Returns subdirs in the order they were evaluated."""
+    state = previous.subdir_state
+    if state is None:
+        raise IncrementalFallback('the previous configuration did not record its subdirectories')
+    order = list(state.records)
+    for subdir in subdirs:
+        if subdir not in state.records:
+            raise IncrementalFallback(f'{subdir} was not used by the previous configuration')
+        not_rerunnable = state.records[subdir].not_rerunnable
+        if not_rerunnable is not None:
+            raise IncrementalFallback(f'{subdir} {not_rerunnable}')
+    return sorted(subdirs, key=order.index)
+
+def _restore_build(b: build.Build, previous: build.Build) -> None:
+    """Add what the previous evaluation of the main project added after
+    project() to b, whose project() was just evaluated again."""
+    for n in RESTORED_FIELDS:
+        setattr(b, n, getattr(previous, n))
+    # project() of the subprojects added to these too
+    for n in MERGED_FIELDS:
+        merged = dict(getattr(previous, n))
+        merged.update(getattr(b, n))
+        setattr(b, n, merged)
+    for m in mesonlib.MachineChoice:
+        stdlibs = dict(previous.stdlibs[m])
+        stdlibs.update(b.stdlibs[m])
+        b.stdlibs[m] = stdlibs
+        if b.static_linker[m] is None:
+            b.static_linker[m] = previous.static_linker[m]
+    # Without the one of the backend, which is added after evaluating
+    b.devenv = list(previous.subdir_state.devenv)
+
+def rerun_subdirs(interp: 'Interpreter', previous: build.Build, subdirs: T.List[str]) -> T.List[str]:
+    """Evaluate the meson.build files of subdirs again, on top of previous,
+    the build of the last time the whole project was evaluated.
+
+    interp must have only evaluated project(), what its build is missing is
+    taken from the previous one. Returns subdirs in the order they were
+    evaluated.
+    """
+    subdirs = check_subdirs(previous, subdirs)
+    state = previous.subdir_state
+    b = interp.build
+    _restore_build(b, previous)
+    interp.build_def_files = list(state.build_def_files)
+    recorder = interp.subdir_recorder
+    recorder.state = state
+    order = list(state.records)
+    for subdir in subdirs:
+        old = state.records[subdir]
+        _remove_products(b, old)
+        for f in old.build_def_files:
+            interp.build_def_files.remove(f)
+        variables = interp.variables
+        variables.clear()
+        for name, saved in old.consumed.items():
+            if saved != MISSING:
+                dict.__setitem__(variables, name, restore_value(saved, interp))
+        recorder.rerun_of = old
+        interp.subdir = os.path.dirname(subdir)
+        try:
+            interp.func_subdir(None, [os.path.basename(subdir)], {})
+        finally:
+            recorder.rerun_of = None
+        new = state.records[subdir]
+        if new.not_rerunnable is not None:
+            raise IncrementalFallback(f'{subdir} {new.not_rerunnable}')
+        new.exit_seq = old.exit_seq
+        _check_exported(new, old, state.last_read)
+        recorder.prune_exported(new)
+        growth = _move_products(b, old, new)
+        for record in itertools.islice(state.records.values(), order.index(subdir) + 1, None):
+            for n, g in growth.items():
+                record.positions[n] += g
+    state.build_def_files = list(interp.build_def_files)
+    b.subdir_state = state
+    return subdirs
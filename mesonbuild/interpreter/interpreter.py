@@ -30,7 +30,7 @@ from ..interpreterbase import noPosargs, noKwargs, stringArgs, permittedKwargs,
 from ..interpreterbase import InterpreterException, InvalidArguments, InvalidCode, SubdirDoneRequest
 from ..interpreterbase import InterpreterObject, Disabler, disablerIfNotFound
 from ..interpreterbase import FeatureNew, FeatureDeprecated, FeatureNewKwargs, FeatureDeprecatedKwargs
-from ..interpreterbase import ObjectHolder, RangeHolder
+from ..interpreterbase import ObjectHolder, RangeHolder, TYPE_var
 from ..modules import ModuleObject, MutableModuleObject
 from ..cmake import CMakeInterpreter
 from ..backend.backends import Backend, ExecutableSerialisation
@@ -47,6 +47,7 @@ from .interpreterobjects import (SubprojectHolder, MachineHolder, EnvironmentVar
                                  BuildTargetHolder, DataHolder, JarHolder, Test, RunProcess,
                                  ManHolder, GeneratorHolder, InstallDirHolder, extract_required_kwarg,
                                  extract_search_dirs, MutableModuleObjectHolder)
+from .incremental import SubdirRecorder, VariableTracker, rerun_subdirs
 
 from pathlib import Path
 import os
@@ -167,8 +168,10 @@ known_build_target_kwargs = (
 
 permitted_test_kwargs = {
     'args',
+    'cpus',
     'depends',
     'env',
+    'memory',
     'priority',
     'protocol',
     'should_fail',
@@ -221,6 +224,9 @@ class Interpreter(InterpreterBase):
         self.coredata = self.environment.get_coredata()
         self.backend = backend
         self.summary = {}
+        # Records what the subdirectories of the main project use, to only
+        # evaluate those that changed when reconfiguring
+        self.subdir_recorder = None  # type: T.Optional[SubdirRecorder]
         if modules is None:
             self.modules = {}
         else:
@@ -230,6 +236,7 @@ class Interpreter(InterpreterBase):
         self.subproject_directory_name = subdir.split(os.path.sep)[-1]
         self.subproject_dir = subproject_dir
         self.option_file = os.path.join(self.source_root, self.subdir, 'meson_options.txt')
+        self.parse_cache = mparser.ParseCache(os.path.join(self.environment.get_scratch_dir(), 'parse-cache'))
         if not mock and ast is None:
             self.load_root_meson_file()
             self.sanity_check_ast()
@@ -264,6 +271,10 @@ class Interpreter(InterpreterBase):
         if not mock:
             self.parse_project()
         self._redetect_machines()
+        # project() sets the option
+        if subproject == '' and self.coredata.get_option(OptionKey('incremental_regen')):
+            self.subdir_recorder = SubdirRecorder(self)
+            self.variables = VariableTracker(self.subdir_recorder, self.variables)
 
     def _redetect_machines(self):
         # Re-initialize machine descriptions. We can do a better job now because we
@@ -1825,7 +1836,10 @@ external dependencies (including libraries) must go to "dependencies".''')
              regex_selector] + vcs_cmd
         kwargs.setdefault('build_by_default', True)
         kwargs.setdefault('build_always_stale', True)
-        return self._func_custom_target_impl(node, [kwargs['output']], kwargs)
+        tg = self._func_custom_target_impl(node, [kwargs['output']], kwargs)
+        # vcstagger only writes the output if it changed
+        tg.held_object.restat = True
+        return tg
 
     @FeatureNew('subdir_done', '0.46.0')
     @noPosargs
@@ -1834,13 +1848,15 @@ external dependencies (including libraries) must go to "dependencies".''')
         raise SubdirDoneRequest()
 
     @stringArgs
+    @FeatureNewKwargs('custom_target', '0.59.0', ['write_if_changed'])
     @FeatureNewKwargs('custom_target', '0.57.0', ['env'])
     @FeatureNewKwargs('custom_target', '0.48.0', ['console'])
     @FeatureNewKwargs('custom_target', '0.47.0', ['install_mode', 'build_always_stale'])
     @FeatureNewKwargs('custom_target', '0.40.0', ['build_by_default'])
     @permittedKwargs({'input', 'output', 'command', 'install', 'install_dir', 'install_mode',
                       'build_always', 'capture', 'depends', 'depend_files', 'depfile',
-                      'build_by_default', 'build_always_stale', 'console', 'env'})
+                      'build_by_default', 'build_always_stale', 'console', 'env',
+                      'write_if_changed'})
     def func_custom_target(self, node, args, kwargs):
         if len(args) != 1:
             raise InterpreterException('custom_target: Only one positional argument is allowed, and it must be a string name')
@@ -1928,6 +1944,7 @@ This will become a hard error in the future.''' % kwargs['input'], location=self
         self.generators.append(gen)
         return gen
 
+    @FeatureNewKwargs('benchmark', '0.59.0', ['cpus', 'memory'])
     @FeatureNewKwargs('benchmark', '0.46.0', ['depends'])
     @FeatureNewKwargs('benchmark', '0.52.0', ['priority'])
     @permittedKwargs(permitted_test_kwargs)
@@ -1937,6 +1954,7 @@ This will become a hard error in the future.''' % kwargs['input'], location=self
             del kwargs['is_parallel']
         self.add_test(node, args, kwargs, False)
 
+    @FeatureNewKwargs('test', '0.59.0', ['cpus', 'memory'])
     @FeatureNewKwargs('test', '0.46.0', ['depends'])
     @FeatureNewKwargs('test', '0.52.0', ['priority'])
     @permittedKwargs(permitted_test_kwargs | {'is_parallel'})
@@ -2015,8 +2033,14 @@ This will become a hard error in the future.''' % kwargs['input'], location=self
         priority = kwargs.get('priority', 0)
         if not isinstance(priority, int):
             raise InterpreterException('Keyword argument priority must be an integer.')
+        cpus = kwargs.get('cpus', 1)
+        if not isinstance(cpus, int) or cpus < 1:
+            raise InterpreterException('Keyword argument cpus must be a positive integer.')
+        memory = kwargs.get('memory', 0)
+        if not isinstance(memory, int) or memory < 0:
+            raise InterpreterException('Keyword argument memory must be a non-negative integer.')
         return Test(name, prj, suite, exe.held_object, depends, par, cmd_args,
-                    env, should_fail, timeout, workdir, protocol, priority)
+                    env, should_fail, timeout, workdir, protocol, priority, cpus, memory)
 
     def add_test(self, node: mparser.BaseNode, args: T.List, kwargs: T.Dict[str, T.Any], is_base_test: bool):
         t = self.make_test(node, args, kwargs)
@@ -2100,6 +2124,8 @@ This will become a hard error in the future.''' % kwargs['input'], location=self
         self.processed_buildfiles.add(build_file)
         self.subdir = subdir
         os.makedirs(os.path.join(self.environment.build_dir, subdir), exist_ok=True)
+        if self.subdir_recorder is not None:
+            self.subdir_recorder.enter(subdir)
         buildfilename = os.path.join(self.subdir, environment.build_filename)
         self.build_def_files.append(buildfilename)
         absname = os.path.join(self.environment.get_source_dir(), buildfilename)
@@ -2110,7 +2136,7 @@ This will become a hard error in the future.''' % kwargs['input'], location=self
             code = f.read()
         assert(isinstance(code, str))
         try:
-            codeblock = mparser.Parser(code, absname).parse()
+            codeblock = self.parse_build_file(code, absname)
         except mesonlib.MesonException as me:
             me.file = absname
             raise me
@@ -2118,6 +2144,8 @@ This will become a hard error in the future.''' % kwargs['input'], location=self
             self.evaluate_codeblock(codeblock)
         except SubdirDoneRequest:
             pass
+        if self.subdir_recorder is not None:
+            self.subdir_recorder.exit()
         self.subdir = prev_subdir
 
     def _get_kwarg_install_mode(self, kwargs: T.Dict[str, T.Any]) -> T.Optional[FileMode]:
@@ -2635,6 +2663,8 @@ This warning will become a hard error in a future Meson release.
 
     def run(self) -> None:
         super().run()
+        if self.subdir_recorder is not None:
+            self.build.subdir_state = self.subdir_recorder.finish()
         mlog.log('Build targets in project:', mlog.bold(str(len(self.build.targets))))
         FeatureNew.report(self.subproject)
         FeatureDeprecated.report(self.subproject)
@@ -2643,6 +2673,24 @@ This warning will become a hard error in a future Meson release.
         if self.subproject == '':
             self._print_summary()
 
+    def rerun_subdirs(self, previous: build.Build, subdirs: T.List[str]) -> None:
+        """Only evaluate the meson.build files of subdirs again, on top of
+        the previous build.
+
+        Raises IncrementalFallback if the whole project must be evaluated
+        instead. This interpreter cannot be used anymore in that case.
+        """
+        subdirs = rerun_subdirs(self, previous, subdirs)
+        mlog.log('Evaluated again:', mlog.bold(', '.join(subdirs)))
+        mlog.log('Build targets in project:', mlog.bold(str(len(self.build.targets))))
+        FeatureNew.report(self.subproject)
+        FeatureDeprecated.report(self.subproject)
+
+    def function_call(self, node: mparser.FunctionNode) -> T.Optional[TYPE_var]:
+        if self.subdir_recorder is not None:
+            self.subdir_recorder.function_called(node.func_name)
+        return super().function_call(node)
+
     def print_extra_warnings(self) -> None:
         # TODO cross compilation
         for c in self.coredata.compilers.host.values():
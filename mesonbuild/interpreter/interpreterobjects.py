@@ -716,7 +716,7 @@ class Test(InterpreterObject):
                  depends: T.List[T.Union[build.CustomTarget, build.BuildTarget]],
                  is_parallel: bool, cmd_args: T.List[str], env: build.EnvironmentVariables,
                  should_fail: bool, timeout: int, workdir: T.Optional[str], protocol: str,
-                 priority: int):
+                 priority: int, cpus: int, memory: int):
         InterpreterObject.__init__(self)
         self.name = name
         self.suite = suite
@@ -731,6 +731,8 @@ class Test(InterpreterObject):
         self.workdir = workdir
         self.protocol = TestProtocol.from_str(protocol)
         self.priority = priority
+        self.cpus = cpus
+        self.memory = memory
 
     def get_exe(self):
         return self.exe
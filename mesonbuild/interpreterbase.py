@@ -747,6 +747,82 @@ class InterpreterBase:
         # If it was part of a if-clause, it is used to temporally override the
         # current meson version target within that if-block.
         self.tmp_meson_version = None # type: T.Optional[str]
+        # Set by subclasses that have a place to store parsed build files
+        self.parse_cache = None  # type: T.Optional[mparser.ParseCache]
+        # Dispatch tables, so that evaluating a node or calling a method of a
+        # builtin type is a dict lookup instead of a chain of tests
+        self.statement_evaluators = {
+            mparser.FunctionNode: self.function_call,
+            mparser.AssignmentNode: self.assignment,
+            mparser.MethodNode: self.method_call,
+            mparser.StringNode: self.evaluate_elementary,
+            mparser.BooleanNode: self.evaluate_elementary,
+            mparser.IfClauseNode: self.evaluate_if,
+            mparser.IdNode: self.evaluate_id,
+            mparser.ComparisonNode: self.evaluate_comparison,
+            mparser.ArrayNode: self.evaluate_arraystatement,
+            mparser.DictNode: self.evaluate_dictstatement,
+            mparser.NumberNode: self.evaluate_elementary,
+            mparser.AndNode: self.evaluate_andstatement,
+            mparser.OrNode: self.evaluate_orstatement,
+            mparser.NotNode: self.evaluate_notstatement,
+            mparser.UMinusNode: self.evaluate_uminusstatement,
+            mparser.ArithmeticNode: self.evaluate_arithmeticstatement,
+            mparser.ForeachClauseNode: self.evaluate_foreach,
+            mparser.PlusAssignmentNode: self.evaluate_plusassign,
+            mparser.IndexNode: self.evaluate_indexing,
+            mparser.TernaryNode: self.evaluate_ternary,
+            mparser.FormatStringNode: self.evaluate_fstring,
+            mparser.ContinueNode: self.evaluate_continue,
+            mparser.BreakNode: self.evaluate_break,
+        }  # type: T.Dict[T.Type[mparser.BaseNode], T.Callable[[T.Any], T.Optional[TYPE_var]]]
+        self.builtin_method_calls = {
+            str: self.string_method_call,
+            bool: self.bool_method_call,
+            int: self.int_method_call,
+            list: self.array_method_call,
+            dict: self.dict_method_call,
+        }  # type: T.Dict[type, T.Callable[[T.Any, str, T.List[TYPE_nvar], T.Dict[str, T.Any]], TYPE_var]]
+        self.bool_methods = {
+            'to_string': self.bool_to_string_method,
+            'to_int': self.bool_to_int_method,
+        }  # type: T.Dict[str, T.Callable[[bool, T.List[TYPE_nvar]], T.Union[str, int]]]
+        self.int_methods = {
+            'is_even': self.int_is_even_method,
+            'is_odd': self.int_is_odd_method,
+            'to_string': self.int_to_string_method,
+        }  # type: T.Dict[str, T.Callable[[int, T.List[TYPE_nvar]], T.Union[str, bool]]]
+        self.string_methods = {
+            'strip': self.string_strip_method,
+            'format': self.string_format_method,
+            'to_upper': self.string_to_upper_method,
+            'to_lower': self.string_to_lower_method,
+            'underscorify': self.string_underscorify_method,
+            'split': self.string_split_method,
+            'startswith': self.string_startswith_method,
+            'contains': self.string_contains_method,
+            'endswith': self.string_endswith_method,
+            'to_int': self.string_to_int_method,
+            'join': self.string_join_method,
+            'version_compare': self.string_version_compare_method,
+            'substring': self.string_substring_method,
+            'replace': self.string_replace_method,
+        }  # type: T.Dict[str, T.Callable[[str, T.List[TYPE_nvar]], T.Union[str, int, bool, T.List[str]]]]
+        self.array_methods = {
+            'contains': self.array_contains_method,
+            'length': self.array_length_method,
+            'get': self.array_get_method,
+        }  # type: T.Dict[str, T.Callable[[T.List[TYPE_var], T.List[TYPE_nvar]], TYPE_var]]
+        self.dict_methods = {
+            'has_key': self.dict_has_key_method,
+            'get': self.dict_get_method,
+            'keys': self.dict_keys_method,
+        }  # type: T.Dict[str, T.Callable[[T.Dict[str, TYPE_var], T.List[TYPE_nvar]], TYPE_var]]
+
+    def parse_build_file(self, code: str, filename: str) -> mparser.CodeBlockNode:
+        if self.parse_cache is None:
+            return mparser.Parser(code, filename).parse()
+        return self.parse_cache.parse(code, filename)
 
     def load_root_meson_file(self) -> None:
         mesonfile = os.path.join(self.source_root, self.subdir, environment.build_filename)
@@ -758,7 +834,7 @@ class InterpreterBase:
             raise InvalidCode('Builder file is empty.')
         assert(isinstance(code, str))
         try:
-            self.ast = mparser.Parser(code, mesonfile).parse()
+            self.ast = self.parse_build_file(code, mesonfile)
         except mesonlib.MesonException as me:
             me.file = mesonfile
             raise me
@@ -816,57 +892,25 @@ class InterpreterBase:
 
     def evaluate_statement(self, cur: mparser.BaseNode) -> T.Optional[TYPE_var]:
         self.current_node = cur
-        if isinstance(cur, mparser.FunctionNode):
-            return self.function_call(cur)
-        elif isinstance(cur, mparser.AssignmentNode):
-            self.assignment(cur)
-        elif isinstance(cur, mparser.MethodNode):
-            return self.method_call(cur)
-        elif isinstance(cur, mparser.StringNode):
-            return cur.value
-        elif isinstance(cur, mparser.BooleanNode):
-            return cur.value
-        elif isinstance(cur, mparser.IfClauseNode):
-            return self.evaluate_if(cur)
-        elif isinstance(cur, mparser.IdNode):
-            return self.get_variable(cur.value)
-        elif isinstance(cur, mparser.ComparisonNode):
-            return self.evaluate_comparison(cur)
-        elif isinstance(cur, mparser.ArrayNode):
-            return self.evaluate_arraystatement(cur)
-        elif isinstance(cur, mparser.DictNode):
-            return self.evaluate_dictstatement(cur)
-        elif isinstance(cur, mparser.NumberNode):
-            return cur.value
-        elif isinstance(cur, mparser.AndNode):
-            return self.evaluate_andstatement(cur)
-        elif isinstance(cur, mparser.OrNode):
-            return self.evaluate_orstatement(cur)
-        elif isinstance(cur, mparser.NotNode):
-            return self.evaluate_notstatement(cur)
-        elif isinstance(cur, mparser.UMinusNode):
-            return self.evaluate_uminusstatement(cur)
-        elif isinstance(cur, mparser.ArithmeticNode):
-            return self.evaluate_arithmeticstatement(cur)
-        elif isinstance(cur, mparser.ForeachClauseNode):
-            self.evaluate_foreach(cur)
-        elif isinstance(cur, mparser.PlusAssignmentNode):
-            self.evaluate_plusassign(cur)
-        elif isinstance(cur, mparser.IndexNode):
-            return self.evaluate_indexing(cur)
-        elif isinstance(cur, mparser.TernaryNode):
-            return self.evaluate_ternary(cur)
-        elif isinstance(cur, mparser.FormatStringNode):
-            return self.evaluate_fstring(cur)
-        elif isinstance(cur, mparser.ContinueNode):
-            raise ContinueRequest()
-        elif isinstance(cur, mparser.BreakNode):
-            raise BreakRequest()
+        evaluator = self.statement_evaluators.get(type(cur))
+        if evaluator is not None:
+            return evaluator(cur)
         elif isinstance(cur, self.elementary_types):
             return cur
         else:
             raise InvalidCode("Unknown statement.")
-        return None
+
+    def evaluate_elementary(self, cur: T.Union[mparser.StringNode, mparser.BooleanNode, mparser.NumberNode]) -> TYPE_var:
+        return cur.value
+
+    def evaluate_id(self, cur: mparser.IdNode) -> TYPE_var:
+        return self.get_variable(cur.value)
+
+    def evaluate_continue(self, cur: mparser.ContinueNode) -> None:
+        raise ContinueRequest()
+
+    def evaluate_break(self, cur: mparser.BreakNode) -> None:
+        raise BreakRequest()
 
     def evaluate_arraystatement(self, cur: mparser.ArrayNode) -> list:
         (arguments, kwargs) = self.reduce_arguments(cur.args)
@@ -1212,6 +1256,10 @@ The result of this is undefined and will become a hard error in a future Meson r
         (args, kwargs) = self.reduce_arguments(node.args)
         if is_disabled(args, kwargs):
             return Disabler()
+        builtin_method_call = self.builtin_method_calls.get(type(obj))
+        if builtin_method_call is not None:
+            return builtin_method_call(obj, method_name, args, kwargs)
+        # Subclasses of the builtin types, like MesonVersionString
         if isinstance(obj, str):
             return self.string_method_call(obj, method_name, args, kwargs)
         if isinstance(obj, bool):
@@ -1242,46 +1290,55 @@ The result of this is undefined and will become a hard error in a future Meson r
 
     @builtinMethodNoKwargs
     def bool_method_call(self, obj: bool, method_name: str, posargs: T.List[TYPE_nvar], kwargs: T.Dict[str, T.Any]) -> T.Union[str, int]:
-        if method_name == 'to_string':
-            if not posargs:
-                if obj:
-                    return 'true'
-                else:
-                    return 'false'
-            elif len(posargs) == 2 and isinstance(posargs[0], str) and isinstance(posargs[1], str):
-                if obj:
-                    return posargs[0]
-                else:
-                    return posargs[1]
+        method = self.bool_methods.get(method_name)
+        if method is None:
+            raise InterpreterException('Unknown method "%s" for a boolean.' % method_name)
+        return method(obj, posargs)
+
+    def bool_to_string_method(self, obj: bool, posargs: T.List[TYPE_nvar]) -> str:
+        if not posargs:
+            if obj:
+                return 'true'
             else:
-                raise InterpreterException('bool.to_string() must have either no arguments or exactly two string arguments that signify what values to return for true and false.')
-        elif method_name == 'to_int':
+                return 'false'
+        elif len(posargs) == 2 and isinstance(posargs[0], str) and isinstance(posargs[1], str):
             if obj:
-                return 1
+                return posargs[0]
             else:
-                return 0
+                return posargs[1]
         else:
-            raise InterpreterException('Unknown method "%s" for a boolean.' % method_name)
+            raise InterpreterException('bool.to_string() must have either no arguments or exactly two string arguments that signify what values to return for true and false.')
+
+    def bool_to_int_method(self, obj: bool, posargs: T.List[TYPE_nvar]) -> int:
+        if obj:
+            return 1
+        else:
+            return 0
 
     @builtinMethodNoKwargs
     def int_method_call(self, obj: int, method_name: str, posargs: T.List[TYPE_nvar], kwargs: T.Dict[str, T.Any]) -> T.Union[str, bool]:
-        if method_name == 'is_even':
-            if not posargs:
-                return obj % 2 == 0
-            else:
-                raise InterpreterException('int.is_even() must have no arguments.')
-        elif method_name == 'is_odd':
-            if not posargs:
-                return obj % 2 != 0
-            else:
-                raise InterpreterException('int.is_odd() must have no arguments.')
-        elif method_name == 'to_string':
-            if not posargs:
-                return str(obj)
-            else:
-                raise InterpreterException('int.to_string() must have no arguments.')
-        else:
+        method = self.int_methods.get(method_name)
+        if method is None:
             raise InterpreterException('Unknown method "%s" for an integer.' % method_name)
+        return method(obj, posargs)
+
+    def int_is_even_method(self, obj: int, posargs: T.List[TYPE_nvar]) -> bool:
+        if not posargs:
+            return obj % 2 == 0
+        else:
+            raise InterpreterException('int.is_even() must have no arguments.')
+
+    def int_is_odd_method(self, obj: int, posargs: T.List[TYPE_nvar]) -> bool:
+        if not posargs:
+            return obj % 2 != 0
+        else:
+            raise InterpreterException('int.is_odd() must have no arguments.')
+
+    def int_to_string_method(self, obj: int, posargs: T.List[TYPE_nvar]) -> str:
+        if not posargs:
+            return str(obj)
+        else:
+            raise InterpreterException('int.to_string() must have no arguments.')
 
     @staticmethod
     def _get_one_string_posarg(posargs: T.List[TYPE_nvar], method_name: str) -> str:
@@ -1298,76 +1355,97 @@ The result of this is undefined and will become a hard error in a future Meson r
 
     @builtinMethodNoKwargs
     def string_method_call(self, obj: str, method_name: str, posargs: T.List[TYPE_nvar], kwargs: T.Dict[str, T.Any]) -> T.Union[str, int, bool, T.List[str]]:
-        if method_name == 'strip':
-            s1 = self._get_one_string_posarg(posargs, 'strip')
-            if s1 is not None:
-                return obj.strip(s1)
-            return obj.strip()
-        elif method_name == 'format':
-            return self.format_string(obj, posargs)
-        elif method_name == 'to_upper':
-            return obj.upper()
-        elif method_name == 'to_lower':
-            return obj.lower()
-        elif method_name == 'underscorify':
-            return re.sub(r'[^a-zA-Z0-9]', '_', obj)
-        elif method_name == 'split':
-            s2 = self._get_one_string_posarg(posargs, 'split')
-            if s2 is not None:
-                return obj.split(s2)
-            return obj.split()
-        elif method_name == 'startswith' or method_name == 'contains' or method_name == 'endswith':
-            s3 = posargs[0]
-            if not isinstance(s3, str):
-                raise InterpreterException('Argument must be a string.')
-            if method_name == 'startswith':
-                return obj.startswith(s3)
-            elif method_name == 'contains':
-                return obj.find(s3) >= 0
-            return obj.endswith(s3)
-        elif method_name == 'to_int':
-            try:
-                return int(obj)
-            except Exception:
-                raise InterpreterException(f'String {obj!r} cannot be converted to int')
-        elif method_name == 'join':
-            if len(posargs) != 1:
-                raise InterpreterException('Join() takes exactly one argument.')
-            strlist = posargs[0]
-            check_stringlist(strlist)
-            assert isinstance(strlist, list)  # Required for mypy
-            return obj.join(strlist)
-        elif method_name == 'version_compare':
-            if len(posargs) != 1:
-                raise InterpreterException('Version_compare() takes exactly one argument.')
-            cmpr = posargs[0]
-            if not isinstance(cmpr, str):
-                raise InterpreterException('Version_compare() argument must be a string.')
-            if isinstance(obj, MesonVersionString):
-                self.tmp_meson_version = cmpr
-            return mesonlib.version_compare(obj, cmpr)
-        elif method_name == 'substring':
-            if len(posargs) > 2:
-                raise InterpreterException('substring() takes maximum two arguments.')
-            start = 0
-            end = len(obj)
-            if len (posargs) > 0:
-                if not isinstance(posargs[0], int):
-                    raise InterpreterException('substring() argument must be an int')
-                start = posargs[0]
-            if len (posargs) > 1:
-                if not isinstance(posargs[1], int):
-                    raise InterpreterException('substring() argument must be an int')
-                end = posargs[1]
-            return obj[start:end]
-        elif method_name == 'replace':
-            FeatureNew.single_use('str.replace', '0.58.0', self.subproject)
-            if len(posargs) != 2:
-                raise InterpreterException('replace() takes exactly two arguments.')
-            if not isinstance(posargs[0], str) or not isinstance(posargs[1], str):
-                raise InterpreterException('replace() requires that both arguments be strings')
-            return obj.replace(posargs[0], posargs[1])
-        raise InterpreterException('Unknown method "%s" for a string.' % method_name)
+        method = self.string_methods.get(method_name)
+        if method is None:
+            raise InterpreterException('Unknown method "%s" for a string.' % method_name)
+        return method(obj, posargs)
+
+    def string_strip_method(self, obj: str, posargs: T.List[TYPE_nvar]) -> str:
+        s1 = self._get_one_string_posarg(posargs, 'strip')
+        if s1 is not None:
+            return obj.strip(s1)
+        return obj.strip()
+
+    def string_format_method(self, obj: str, posargs: T.List[TYPE_nvar]) -> str:
+        return self.format_string(obj, posargs)
+
+    def string_to_upper_method(self, obj: str, posargs: T.List[TYPE_nvar]) -> str:
+        return obj.upper()
+
+    def string_to_lower_method(self, obj: str, posargs: T.List[TYPE_nvar]) -> str:
+        return obj.lower()
+
+    def string_underscorify_method(self, obj: str, posargs: T.List[TYPE_nvar]) -> str:
+        return re.sub(r'[^a-zA-Z0-9]', '_', obj)
+
+    def string_split_method(self, obj: str, posargs: T.List[TYPE_nvar]) -> T.List[str]:
+        s2 = self._get_one_string_posarg(posargs, 'split')
+        if s2 is not None:
+            return obj.split(s2)
+        return obj.split()
+
+    @staticmethod
+    def _get_substring_posarg(posargs: T.List[TYPE_nvar]) -> str:
+        s3 = posargs[0]
+        if not isinstance(s3, str):
+            raise InterpreterException('Argument must be a string.')
+        return s3
+
+    def string_startswith_method(self, obj: str, posargs: T.List[TYPE_nvar]) -> bool:
+        return obj.startswith(self._get_substring_posarg(posargs))
+
+    def string_contains_method(self, obj: str, posargs: T.List[TYPE_nvar]) -> bool:
+        return obj.find(self._get_substring_posarg(posargs)) >= 0
+
+    def string_endswith_method(self, obj: str, posargs: T.List[TYPE_nvar]) -> bool:
+        return obj.endswith(self._get_substring_posarg(posargs))
+
+    def string_to_int_method(self, obj: str, posargs: T.List[TYPE_nvar]) -> int:
+        try:
+            return int(obj)
+        except Exception:
+            raise InterpreterException(f'String {obj!r} cannot be converted to int')
+
+    def string_join_method(self, obj: str, posargs: T.List[TYPE_nvar]) -> str:
+        if len(posargs) != 1:
+            raise InterpreterException('Join() takes exactly one argument.')
+        strlist = posargs[0]
+        check_stringlist(strlist)
+        assert isinstance(strlist, list)  # Required for mypy
+        return obj.join(strlist)
+
+    def string_version_compare_method(self, obj: str, posargs: T.List[TYPE_nvar]) -> bool:
+        if len(posargs) != 1:
+            raise InterpreterException('Version_compare() takes exactly one argument.')
+        cmpr = posargs[0]
+        if not isinstance(cmpr, str):
+            raise InterpreterException('Version_compare() argument must be a string.')
+        if isinstance(obj, MesonVersionString):
+            self.tmp_meson_version = cmpr
+        return mesonlib.version_compare(obj, cmpr)
+
+    def string_substring_method(self, obj: str, posargs: T.List[TYPE_nvar]) -> str:
+        if len(posargs) > 2:
+            raise InterpreterException('substring() takes maximum two arguments.')
+        start = 0
+        end = len(obj)
+        if len (posargs) > 0:
+            if not isinstance(posargs[0], int):
+                raise InterpreterException('substring() argument must be an int')
+            start = posargs[0]
+        if len (posargs) > 1:
+            if not isinstance(posargs[1], int):
+                raise InterpreterException('substring() argument must be an int')
+            end = posargs[1]
+        return obj[start:end]
+
+    def string_replace_method(self, obj: str, posargs: T.List[TYPE_nvar]) -> str:
+        FeatureNew.single_use('str.replace', '0.58.0', self.subproject)
+        if len(posargs) != 2:
+            raise InterpreterException('replace() takes exactly two arguments.')
+        if not isinstance(posargs[0], str) or not isinstance(posargs[1], str):
+            raise InterpreterException('replace() requires that both arguments be strings')
+        return obj.replace(posargs[0], posargs[1])
 
     def format_string(self, templ: str, args: T.List[TYPE_nvar]) -> str:
         arg_strings = []
@@ -1391,81 +1469,90 @@ The result of this is undefined and will become a hard error in a future Meson r
 
     @builtinMethodNoKwargs
     def array_method_call(self, obj: T.List[TYPE_var], method_name: str, posargs: T.List[TYPE_nvar], kwargs: T.Dict[str, T.Any]) -> TYPE_var:
-        if method_name == 'contains':
-            def check_contains(el: list) -> bool:
-                if len(posargs) != 1:
-                    raise InterpreterException('Contains method takes exactly one argument.')
-                item = posargs[0]
-                for element in el:
-                    if isinstance(element, list):
-                        found = check_contains(element)
-                        if found:
-                            return True
-                    if element == item:
+        method = self.array_methods.get(method_name)
+        if method is None:
+            m = 'Arrays do not have a method called {!r}.'
+            raise InterpreterException(m.format(method_name))
+        return method(obj, posargs)
+
+    def array_contains_method(self, obj: T.List[TYPE_var], posargs: T.List[TYPE_nvar]) -> bool:
+        def check_contains(el: list) -> bool:
+            if len(posargs) != 1:
+                raise InterpreterException('Contains method takes exactly one argument.')
+            item = posargs[0]
+            for element in el:
+                if isinstance(element, list):
+                    found = check_contains(element)
+                    if found:
                         return True
-                return False
-            return check_contains(obj)
-        elif method_name == 'length':
-            return len(obj)
-        elif method_name == 'get':
-            index = posargs[0]
-            fallback = None
-            if len(posargs) == 2:
-                fallback = posargs[1]
-            elif len(posargs) > 2:
-                m = 'Array method \'get()\' only takes two arguments: the ' \
-                    'index and an optional fallback value if the index is ' \
-                    'out of range.'
-                raise InvalidArguments(m)
-            if not isinstance(index, int):
-                raise InvalidArguments('Array index must be a number.')
-            if index < -len(obj) or index >= len(obj):
-                if fallback is None:
-                    m = 'Array index {!r} is out of bounds for array of size {!r}.'
-                    raise InvalidArguments(m.format(index, len(obj)))
-                if isinstance(fallback, mparser.BaseNode):
-                    return self.evaluate_statement(fallback)
-                return fallback
-            return obj[index]
-        m = 'Arrays do not have a method called {!r}.'
-        raise InterpreterException(m.format(method_name))
+                if element == item:
+                    return True
+            return False
+        return check_contains(obj)
+
+    def array_length_method(self, obj: T.List[TYPE_var], posargs: T.List[TYPE_nvar]) -> int:
+        return len(obj)
+
+    def array_get_method(self, obj: T.List[TYPE_var], posargs: T.List[TYPE_nvar]) -> TYPE_var:
+        index = posargs[0]
+        fallback = None
+        if len(posargs) == 2:
+            fallback = posargs[1]
+        elif len(posargs) > 2:
+            m = 'Array method \'get()\' only takes two arguments: the ' \
+                'index and an optional fallback value if the index is ' \
+                'out of range.'
+            raise InvalidArguments(m)
+        if not isinstance(index, int):
+            raise InvalidArguments('Array index must be a number.')
+        if index < -len(obj) or index >= len(obj):
+            if fallback is None:
+                m = 'Array index {!r} is out of bounds for array of size {!r}.'
+                raise InvalidArguments(m.format(index, len(obj)))
+            if isinstance(fallback, mparser.BaseNode):
+                return self.evaluate_statement(fallback)
+            return fallback
+        return obj[index]
 
     @builtinMethodNoKwargs
     def dict_method_call(self, obj: T.Dict[str, TYPE_var], method_name: str, posargs: T.List[TYPE_nvar], kwargs: T.Dict[str, T.Any]) -> TYPE_var:
-        if method_name in ('has_key', 'get'):
-            if method_name == 'has_key':
-                if len(posargs) != 1:
-                    raise InterpreterException('has_key() takes exactly one argument.')
-            else:
-                if len(posargs) not in (1, 2):
-                    raise InterpreterException('get() takes one or two arguments.')
-
-            key = posargs[0]
-            if not isinstance(key, (str)):
-                raise InvalidArguments('Dictionary key must be a string.')
-
-            has_key = key in obj
+        method = self.dict_methods.get(method_name)
+        if method is None:
+            raise InterpreterException('Dictionaries do not have a method called "%s".' % method_name)
+        return method(obj, posargs)
 
-            if method_name == 'has_key':
-                return has_key
-
-            if has_key:
-                return obj[key]
-
-            if len(posargs) == 2:
-                fallback = posargs[1]
-                if isinstance(fallback, mparser.BaseNode):
-                    return self.evaluate_statement(fallback)
-                return fallback
-
-            raise InterpreterException(f'Key {key!r} is not in the dictionary.')
-
-        if method_name == 'keys':
-            if len(posargs) != 0:
-                raise InterpreterException('keys() takes no arguments.')
-            return sorted(obj.keys())
-
-        raise InterpreterException('Dictionaries do not have a method called "%s".' % method_name)
+    @staticmethod
+    def _get_dict_key_posarg(posargs: T.List[TYPE_nvar]) -> str:
+        key = posargs[0]
+        if not isinstance(key, (str)):
+            raise InvalidArguments('Dictionary key must be a string.')
+        return key
+
+    def dict_has_key_method(self, obj: T.Dict[str, TYPE_var], posargs: T.List[TYPE_nvar]) -> bool:
+        if len(posargs) != 1:
+            raise InterpreterException('has_key() takes exactly one argument.')
+        return self._get_dict_key_posarg(posargs) in obj
+
+    def dict_get_method(self, obj: T.Dict[str, TYPE_var], posargs: T.List[TYPE_nvar]) -> TYPE_var:
+        if len(posargs) not in (1, 2):
+            raise InterpreterException('get() takes one or two arguments.')
+        key = self._get_dict_key_posarg(posargs)
+
+        if key in obj:
+            return obj[key]
+
+        if len(posargs) == 2:
+            fallback = posargs[1]
+            if isinstance(fallback, mparser.BaseNode):
+                return self.evaluate_statement(fallback)
+            return fallback
+
+        raise InterpreterException(f'Key {key!r} is not in the dictionary.')
+
+    def dict_keys_method(self, obj: T.Dict[str, TYPE_var], posargs: T.List[TYPE_nvar]) -> T.List[str]:
+        if len(posargs) != 0:
+            raise InterpreterException('keys() takes no arguments.')
+        return sorted(obj.keys())
 
     def reduce_arguments(
                 self,
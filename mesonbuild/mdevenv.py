@@ -41,7 +41,7 @@ def run(options: argparse.Namespace) -> int:
     buildfile = Path(options.wd) / 'meson-private' / 'build.dat'
     if not buildfile.is_file():
         raise MesonException(f'Directory {options.wd!r} does not seem to be a Meson build directory.')
-    b = build.load(options.wd)
+    b = build.load_chunk(options.wd, 'devenv')
 
     devenv = get_env(b, options.wd)
 
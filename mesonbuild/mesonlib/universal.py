@@ -1921,6 +1921,7 @@ _BUILTIN_NAMES = {
     'auto_features',
     'backend',
     'buildtype',
+    'check_cache',
     'debug',
     'default_library',
     'errorlogs',
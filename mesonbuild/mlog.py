@@ -17,6 +17,7 @@ import io
 import sys
 import time
 import platform
+import threading
 import typing as T
 from contextlib import contextmanager
 from pathlib import Path
@@ -77,6 +78,8 @@ log_errors_only = False      # type: bool
 _in_ci = 'CI' in os.environ  # type: bool
 _logged_once = set()         # type: T.Set[T.Tuple[str, ...]]
 log_warnings_counter = 0     # type: int
+# Per thread list of deferred log calls, see capture()
+_thread_state = threading.local()
 
 def disable() -> None:
     global log_disable_stdout
@@ -138,6 +141,7 @@ class AnsiDecorator:
 
 TV_Loggable = T.Union[str, AnsiDecorator]
 TV_LoggableList = T.List[TV_Loggable]
+CapturedCall = T.Tuple[T.Callable[..., None], T.Tuple[T.Any, ...], T.Dict[str, T.Any]]
 
 class AnsiText:
     def __init__(self, *args: TV_LoggableList):
@@ -226,8 +230,37 @@ def force_print(*args: str, nested: str, **kwargs: T.Any) -> None:
         cleaned = raw.encode('ascii', 'replace').decode('ascii')
         print(cleaned, end='')
 
+def _captured(func: T.Callable[..., None], args: T.Tuple[T.Any, ...], kwargs: T.Dict[str, T.Any]) -> bool:
+    calls = getattr(_thread_state, 'calls', None)  # type: T.Optional[T.List[CapturedCall]]
+    if calls is None:
+        return False
+    calls.append((func, args, kwargs))
+    return True
+
+@contextmanager
+def capture() -> T.Generator[T.List[CapturedCall], None, None]:
+    """Defer everything logged by the current thread.
+
+    This is used when running work concurrently, so that the output can
+    later be written with replay() in a deterministic order, or to only
+    write it out if the work is not done again. Captures can be nested.
+    """
+    calls = []  # type: T.List[CapturedCall]
+    outer = getattr(_thread_state, 'calls', None)  # type: T.Optional[T.List[CapturedCall]]
+    _thread_state.calls = calls
+    try:
+        yield calls
+    finally:
+        _thread_state.calls = outer
+
+def replay(calls: T.List[CapturedCall]) -> None:
+    for func, args, kwargs in calls:
+        func(*args, **kwargs)
+
 # We really want a heterogeneous dict for this, but that's in typing_extensions
 def debug(*args: TV_Loggable, **kwargs: T.Any) -> None:
+    if _captured(debug, args, kwargs):
+        return
     arr = process_markup(args, False)
     if log_file is not None:
         print(*arr, file=log_file, **kwargs)
@@ -252,6 +285,8 @@ def log(*args: TV_Loggable, is_error: bool = False,
 
 def _log(*args: TV_Loggable, is_error: bool = False,
         **kwargs: T.Any) -> None:
+    if _captured(_log, args, dict(kwargs, is_error=is_error)):
+        return
     nested = kwargs.pop('nested', True)
     arr = process_markup(args, False)
     if log_file is not None:
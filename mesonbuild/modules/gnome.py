@@ -1288,12 +1288,14 @@ class GnomeModule(ExtensionModule):
         cfile_custom_target = build.CustomTarget(output, state.subdir, state.subproject, custom_kwargs)
         targets.append(cfile_custom_target)
 
+        # Regenerating the same header must not rebuild all of its users
         output = namebase + '.h'
         if mesonlib.version_compare(glib_version, '>= 2.56.2'):
             custom_kwargs = {'input': xml_files,
                              'output': output,
                              'command': cmd + ['--header', '--output', '@OUTPUT@', '@INPUT@'],
                              'build_by_default': build_by_default,
+                             'write_if_changed': True,
                              'install': install_header,
                              'install_dir': install_dir
                              }
@@ -1302,6 +1304,7 @@ class GnomeModule(ExtensionModule):
                              'output': output,
                              'command': cmd,
                              'build_by_default': build_by_default,
+                             'write_if_changed': True,
                              'install': install_header,
                              'install_dir': install_dir,
                              'depends': cfile_custom_target
@@ -14,9 +14,13 @@
 
 import re
 import codecs
+import hashlib
+import os
+import pickle
 import textwrap
 import types
 import typing as T
+import zlib
 from .mesonlib import MesonException
 from . import mlog
 
@@ -88,6 +92,8 @@ class BlockParseException(MesonException):
 TV_TokenTypes = T.TypeVar('TV_TokenTypes', int, str, bool)
 
 class Token(T.Generic[TV_TokenTypes]):
+    __slots__ = ('tid', 'filename', 'line_start', 'lineno', 'colno', 'bytespan', 'value')
+
     def __init__(self, tid: str, filename: str, line_start: int, lineno: int, colno: int, bytespan: T.Tuple[int, int], value: TV_TokenTypes):
         self.tid = tid                # type: str
         self.filename = filename      # type: str
@@ -105,48 +111,55 @@ class Token(T.Generic[TV_TokenTypes]):
         return NotImplemented
 
 class Lexer:
+
+    keywords = {'true', 'false', 'if', 'else', 'elif',
+                'endif', 'and', 'or', 'not', 'foreach', 'endforeach',
+                'in', 'continue', 'break'}
+    future_keywords = {'return'}
+    token_specification = [
+        # Need to be sorted longest to shortest.
+        ('ignore', re.compile(r'[ \t]+')),
+        ('fstring', re.compile(r"f'([^'\\]|(\\.))*'")),
+        ('id', re.compile('[_a-zA-Z][_0-9a-zA-Z]*')),
+        ('number', re.compile(r'0[bB][01]+|0[oO][0-7]+|0[xX][0-9a-fA-F]+|0|[1-9]\d*')),
+        ('eol_cont', re.compile(r'\\\n')),
+        ('eol', re.compile(r'\n')),
+        ('multiline_string', re.compile(r"'''(.|\n)*?'''")),
+        ('comment', re.compile(r'#.*')),
+        ('lparen', re.compile(r'\(')),
+        ('rparen', re.compile(r'\)')),
+        ('lbracket', re.compile(r'\[')),
+        ('rbracket', re.compile(r'\]')),
+        ('lcurl', re.compile(r'\{')),
+        ('rcurl', re.compile(r'\}')),
+        ('dblquote', re.compile(r'"')),
+        ('string', re.compile(r"'([^'\\]|(\\.))*'")),
+        ('comma', re.compile(r',')),
+        ('plusassign', re.compile(r'\+=')),
+        ('dot', re.compile(r'\.')),
+        ('plus', re.compile(r'\+')),
+        ('dash', re.compile(r'-')),
+        ('star', re.compile(r'\*')),
+        ('percent', re.compile(r'%')),
+        ('fslash', re.compile(r'/')),
+        ('colon', re.compile(r':')),
+        ('equal', re.compile(r'==')),
+        ('nequal', re.compile(r'!=')),
+        ('assign', re.compile(r'=')),
+        ('le', re.compile(r'<=')),
+        ('lt', re.compile(r'<')),
+        ('ge', re.compile(r'>=')),
+        ('gt', re.compile(r'>')),
+        ('questionmark', re.compile(r'\?')),
+    ]
+    # All of the above as a single regex, so that finding the next token
+    # is one match instead of one per token type. The alternatives are
+    # tried in order, like the list, and the name of the group that
+    # matched is the token type.
+    token_regex = re.compile('|'.join(f'(?P<{tid}>{reg.pattern})' for tid, reg in token_specification))
+
     def __init__(self, code: str):
         self.code = code
-        self.keywords = {'true', 'false', 'if', 'else', 'elif',
-                         'endif', 'and', 'or', 'not', 'foreach', 'endforeach',
-                         'in', 'continue', 'break'}
-        self.future_keywords = {'return'}
-        self.token_specification = [
-            # Need to be sorted longest to shortest.
-            ('ignore', re.compile(r'[ \t]')),
-            ('fstring', re.compile(r"f'([^'\\]|(\\.))*'")),
-            ('id', re.compile('[_a-zA-Z][_0-9a-zA-Z]*')),
-            ('number', re.compile(r'0[bB][01]+|0[oO][0-7]+|0[xX][0-9a-fA-F]+|0|[1-9]\d*')),
-            ('eol_cont', re.compile(r'\\\n')),
-            ('eol', re.compile(r'\n')),
-            ('multiline_string', re.compile(r"'''(.|\n)*?'''", re.M)),
-            ('comment', re.compile(r'#.*')),
-            ('lparen', re.compile(r'\(')),
-            ('rparen', re.compile(r'\)')),
-            ('lbracket', re.compile(r'\[')),
-            ('rbracket', re.compile(r'\]')),
-            ('lcurl', re.compile(r'\{')),
-            ('rcurl', re.compile(r'\}')),
-            ('dblquote', re.compile(r'"')),
-            ('string', re.compile(r"'([^'\\]|(\\.))*'")),
-            ('comma', re.compile(r',')),
-            ('plusassign', re.compile(r'\+=')),
-            ('dot', re.compile(r'\.')),
-            ('plus', re.compile(r'\+')),
-            ('dash', re.compile(r'-')),
-            ('star', re.compile(r'\*')),
-            ('percent', re.compile(r'%')),
-            ('fslash', re.compile(r'/')),
-            ('colon', re.compile(r':')),
-            ('equal', re.compile(r'==')),
-            ('nequal', re.compile(r'!=')),
-            ('assign', re.compile(r'=')),
-            ('le', re.compile(r'<=')),
-            ('lt', re.compile(r'<')),
-            ('ge', re.compile(r'>=')),
-            ('gt', re.compile(r'>')),
-            ('questionmark', re.compile(r'\?')),
-        ]
 
     def getline(self, line_start: int) -> str:
         return self.code[line_start:self.code.find('\n', line_start)]
@@ -159,85 +172,90 @@ class Lexer:
         bracket_count = 0
         curl_count = 0
         col = 0
-        while loc < len(self.code):
-            matched = False
+        code = self.code
+        code_len = len(code)
+        match = self.token_regex.match
+        while loc < code_len:
             value = None  # type: T.Union[str, bool, int]
-            for (tid, reg) in self.token_specification:
-                mo = reg.match(self.code, loc)
-                if mo:
-                    curline = lineno
-                    curline_start = line_start
-                    col = mo.start() - line_start
-                    matched = True
-                    span_start = loc
-                    loc = mo.end()
-                    span_end = loc
-                    bytespan = (span_start, span_end)
-                    match_text = mo.group()
-                    if tid == 'ignore' or tid == 'comment':
-                        break
-                    elif tid == 'lparen':
-                        par_count += 1
-                    elif tid == 'rparen':
-                        par_count -= 1
-                    elif tid == 'lbracket':
-                        bracket_count += 1
-                    elif tid == 'rbracket':
-                        bracket_count -= 1
-                    elif tid == 'lcurl':
-                        curl_count += 1
-                    elif tid == 'rcurl':
-                        curl_count -= 1
-                    elif tid == 'dblquote':
-                        raise ParseException('Double quotes are not supported. Use single quotes.', self.getline(line_start), lineno, col)
-                    elif tid in {'string', 'fstring'}:
-                        # Handle here and not on the regexp to give a better error message.
-                        if match_text.find("\n") != -1:
-                            mlog.warning(textwrap.dedent("""\
-                                    Newline character in a string detected, use ''' (three single quotes) for multiline strings instead.
-                                    This will become a hard error in a future Meson release.\
-                                """),
-                                self.getline(line_start),
-                                str(lineno),
-                                str(col)
-                            )
-                        value = match_text[2 if tid == 'fstring' else 1:-1]
-                        try:
-                            value = ESCAPE_SEQUENCE_SINGLE_RE.sub(decode_match, value)
-                        except MesonUnicodeDecodeError as err:
-                            raise MesonException(f"Failed to parse escape sequence: '{err.match}' in string:\n  {match_text}")
-                    elif tid == 'multiline_string':
-                        tid = 'string'
-                        value = match_text[3:-3]
-                        lines = match_text.split('\n')
-                        if len(lines) > 1:
-                            lineno += len(lines) - 1
-                            line_start = mo.end() - len(lines[-1])
-                    elif tid == 'number':
-                        value = int(match_text, base=0)
-                    elif tid == 'eol_cont':
-                        lineno += 1
-                        line_start = loc
-                        break
-                    elif tid == 'eol':
-                        lineno += 1
-                        line_start = loc
-                        if par_count > 0 or bracket_count > 0 or curl_count > 0:
-                            break
-                    elif tid == 'id':
-                        if match_text in self.keywords:
-                            tid = match_text
-                        else:
-                            if match_text in self.future_keywords:
-                                mlog.warning(f"Identifier '{match_text}' will become a reserved keyword in a future release. Please rename it.",
-                                             location=types.SimpleNamespace(filename=filename, lineno=lineno))
-                            value = match_text
-                    yield Token(tid, filename, curline_start, curline, col, bytespan, value)
-                    break
-            if not matched:
+            mo = match(code, loc)
+            if not mo:
                 raise ParseException('lexer', self.getline(line_start), lineno, col)
+            tid = mo.lastgroup
+            span_start = loc
+            loc = mo.end()
+            if tid == 'ignore':
+                # Errors point at the last blank of a run
+                col = loc - 1 - line_start
+                continue
+            col = span_start - line_start
+            if tid == 'comment':
+                continue
+            curline = lineno
+            curline_start = line_start
+            bytespan = (span_start, loc)
+            match_text = mo.group()
+            # Roughly sorted by how common the token types are
+            if tid == 'id':
+                if match_text in self.keywords:
+                    tid = match_text
+                else:
+                    if match_text in self.future_keywords:
+                        mlog.warning(f"Identifier '{match_text}' will become a reserved keyword in a future release. Please rename it.",
+                                     location=types.SimpleNamespace(filename=filename, lineno=lineno))
+                    value = match_text
+            elif tid == 'eol':
+                lineno += 1
+                line_start = loc
+                if par_count > 0 or bracket_count > 0 or curl_count > 0:
+                    continue
+            elif tid == 'string' or tid == 'fstring':
+                # Handle here and not on the regexp to give a better error message.
+                if match_text.find("\n") != -1:
+                    mlog.warning(textwrap.dedent("""\
+                            Newline character in a string detected, use ''' (three single quotes) for multiline strings instead.
+                            This will become a hard error in a future Meson release.\
+                        """),
+                        self.getline(line_start),
+                        str(lineno),
+                        str(col)
+                    )
+                value = match_text[2 if tid == 'fstring' else 1:-1]
+                try:
+                    value = ESCAPE_SEQUENCE_SINGLE_RE.sub(decode_match, value)
+                except MesonUnicodeDecodeError as err:
+                    raise MesonException(f"Failed to parse escape sequence: '{err.match}' in string:\n  {match_text}")
+            elif tid == 'lparen':
+                par_count += 1
+            elif tid == 'rparen':
+                par_count -= 1
+            elif tid == 'lbracket':
+                bracket_count += 1
+            elif tid == 'rbracket':
+                bracket_count -= 1
+            elif tid == 'lcurl':
+                curl_count += 1
+            elif tid == 'rcurl':
+                curl_count -= 1
+            elif tid == 'multiline_string':
+                tid = 'string'
+                value = match_text[3:-3]
+                lines = match_text.split('\n')
+                if len(lines) > 1:
+                    lineno += len(lines) - 1
+                    line_start = loc - len(lines[-1])
+            elif tid == 'number':
+                value = int(match_text, base=0)
+            elif tid == 'eol_cont':
+                lineno += 1
+                line_start = loc
+                continue
+            elif tid == 'dblquote':
+                raise ParseException('Double quotes are not supported. Use single quotes.', self.getline(line_start), lineno, col)
+            yield Token(tid, filename, curline_start, curline, col, bytespan, value)
 
 class BaseNode:
+    __slots__ = ('lineno', 'colno', 'filename', 'end_lineno', 'end_colno', 'level', 'ast_id', 'condition_level')
+
     def __init__(self, lineno: int, colno: int, filename: str, end_lineno: T.Optional[int] = None, end_colno: T.Optional[int] = None):
         self.lineno = lineno      # type: int
         self.colno = colno        # type: int
@@ -251,24 +269,28 @@ class BaseNode:
         self.condition_level = 0  # type: int
 
     def accept(self, visitor: 'AstVisitor') -> None:
-        fname = 'visit_{}'.format(type(self).__name__)
-        if hasattr(visitor, fname):
-            func = getattr(visitor, fname)
-            if callable(func):
-                func(self)
+        func = getattr(visitor, 'visit_' + type(self).__name__, None)
+        if callable(func):
+            func(self)
 
 class ElementaryNode(T.Generic[TV_TokenTypes], BaseNode):
+    __slots__ = ('value', 'bytespan')
+
     def __init__(self, token: Token[TV_TokenTypes]):
         super().__init__(token.lineno, token.colno, token.filename)
         self.value = token.value        # type: TV_TokenTypes
         self.bytespan = token.bytespan  # type: T.Tuple[int, int]
 
 class BooleanNode(ElementaryNode[bool]):
+    __slots__ = ()
+
     def __init__(self, token: Token[bool]):
         super().__init__(token)
         assert isinstance(self.value, bool)
 
 class IdNode(ElementaryNode[str]):
+    __slots__ = ()
+
     def __init__(self, token: Token[str]):
         super().__init__(token)
         assert isinstance(self.value, str)
@@ -277,11 +299,15 @@ class IdNode(ElementaryNode[str]):
         return "Id node: '%s' (%d, %d)." % (self.value, self.lineno, self.colno)
 
 class NumberNode(ElementaryNode[int]):
+    __slots__ = ()
+
     def __init__(self, token: Token[int]):
         super().__init__(token)
         assert isinstance(self.value, int)
 
 class StringNode(ElementaryNode[str]):
+    __slots__ = ()
+
     def __init__(self, token: Token[str]):
         super().__init__(token)
         assert isinstance(self.value, str)
@@ -290,6 +316,8 @@ class StringNode(ElementaryNode[str]):
         return "String node: '%s' (%d, %d)." % (self.value, self.lineno, self.colno)
 
 class FormatStringNode(ElementaryNode[str]):
+    __slots__ = ()
+
     def __init__(self, token: Token[str]):
         super().__init__(token)
         assert isinstance(self.value, str)
@@ -298,12 +326,14 @@ class FormatStringNode(ElementaryNode[str]):
         return "Format string node: '{self.value}' ({self.lineno}, {self.colno})."
 
 class ContinueNode(ElementaryNode):
-    pass
+    __slots__ = ()
 
 class BreakNode(ElementaryNode):
-    pass
+    __slots__ = ()
 
 class ArgumentNode(BaseNode):
+    __slots__ = ('arguments', 'commas', 'kwargs', 'order_error')
+
     def __init__(self, token: Token[TV_TokenTypes]):
         super().__init__(token.lineno, token.colno, token.filename)
         self.arguments = []  # type: T.List[BaseNode]
@@ -345,33 +375,45 @@ class ArgumentNode(BaseNode):
         return self.num_args() # Fixme
 
 class ArrayNode(BaseNode):
+    __slots__ = ('args',)
+
     def __init__(self, args: ArgumentNode, lineno: int, colno: int, end_lineno: int, end_colno: int):
         super().__init__(lineno, colno, args.filename, end_lineno=end_lineno, end_colno=end_colno)
         self.args = args              # type: ArgumentNode
 
 class DictNode(BaseNode):
+    __slots__ = ('args',)
+
     def __init__(self, args: ArgumentNode, lineno: int, colno: int, end_lineno: int, end_colno: int):
         super().__init__(lineno, colno, args.filename, end_lineno=end_lineno, end_colno=end_colno)
         self.args = args
 
 class EmptyNode(BaseNode):
+    __slots__ = ('value',)
+
     def __init__(self, lineno: int, colno: int, filename: str):
         super().__init__(lineno, colno, filename)
         self.value = None
 
 class OrNode(BaseNode):
+    __slots__ = ('left', 'right')
+
     def __init__(self, left: BaseNode, right: BaseNode):
         super().__init__(left.lineno, left.colno, left.filename)
         self.left = left    # type: BaseNode
         self.right = right  # type: BaseNode
 
 class AndNode(BaseNode):
+    __slots__ = ('left', 'right')
+
     def __init__(self, left: BaseNode, right: BaseNode):
         super().__init__(left.lineno, left.colno, left.filename)
         self.left = left    # type: BaseNode
         self.right = right  # type: BaseNode
 
 class ComparisonNode(BaseNode):
+    __slots__ = ('left', 'right', 'ctype')
+
     def __init__(self, ctype: str, left: BaseNode, right: BaseNode):
         super().__init__(left.lineno, left.colno, left.filename)
         self.left = left    # type: BaseNode
@@ -379,6 +421,8 @@ class ComparisonNode(BaseNode):
         self.ctype = ctype  # type: str
 
 class ArithmeticNode(BaseNode):
+    __slots__ = ('left', 'right', 'operation')
+
     def __init__(self, operation: str, left: BaseNode, right: BaseNode):
         super().__init__(left.lineno, left.colno, left.filename)
         self.left = left            # type: BaseNode
@@ -386,22 +430,30 @@ class ArithmeticNode(BaseNode):
         self.operation = operation  # type: str
 
 class NotNode(BaseNode):
+    __slots__ = ('value',)
+
     def __init__(self, token: Token[TV_TokenTypes], value: BaseNode):
         super().__init__(token.lineno, token.colno, token.filename)
         self.value = value  # type: BaseNode
 
 class CodeBlockNode(BaseNode):
+    __slots__ = ('lines',)
+
     def __init__(self, token: Token[TV_TokenTypes]):
         super().__init__(token.lineno, token.colno, token.filename)
         self.lines = []  # type: T.List[BaseNode]
 
 class IndexNode(BaseNode):
+    __slots__ = ('iobject', 'index')
+
     def __init__(self, iobject: BaseNode, index: BaseNode):
         super().__init__(iobject.lineno, iobject.colno, iobject.filename)
         self.iobject = iobject  # type: BaseNode
         self.index = index      # type: BaseNode
 
 class MethodNode(BaseNode):
+    __slots__ = ('source_object', 'name', 'args')
+
     def __init__(self, filename: str, lineno: int, colno: int, source_object: BaseNode, name: str, args: ArgumentNode):
         super().__init__(lineno, colno, filename)
         self.source_object = source_object  # type: BaseNode
@@ -410,6 +462,8 @@ class MethodNode(BaseNode):
         self.args = args                    # type: ArgumentNode
 
 class FunctionNode(BaseNode):
+    __slots__ = ('func_name', 'args')
+
     def __init__(self, filename: str, lineno: int, colno: int, end_lineno: int, end_colno: int, func_name: str, args: ArgumentNode):
         super().__init__(lineno, colno, filename, end_lineno=end_lineno, end_colno=end_colno)
         self.func_name = func_name  # type: str
@@ -417,6 +471,8 @@ class FunctionNode(BaseNode):
         self.args = args  # type: ArgumentNode
 
 class AssignmentNode(BaseNode):
+    __slots__ = ('var_name', 'value')
+
     def __init__(self, filename: str, lineno: int, colno: int, var_name: str, value: BaseNode):
         super().__init__(lineno, colno, filename)
         self.var_name = var_name  # type: str
@@ -424,6 +480,8 @@ class AssignmentNode(BaseNode):
         self.value = value  # type: BaseNode
 
 class PlusAssignmentNode(BaseNode):
+    __slots__ = ('var_name', 'value')
+
     def __init__(self, filename: str, lineno: int, colno: int, var_name: str, value: BaseNode):
         super().__init__(lineno, colno, filename)
         self.var_name = var_name  # type: str
@@ -431,6 +489,8 @@ class PlusAssignmentNode(BaseNode):
         self.value = value  # type: BaseNode
 
 class ForeachClauseNode(BaseNode):
+    __slots__ = ('varnames', 'items', 'block')
+
     def __init__(self, token: Token, varnames: T.List[str], items: BaseNode, block: CodeBlockNode):
         super().__init__(token.lineno, token.colno, token.filename)
         self.varnames = varnames  # type: T.List[str]
@@ -438,23 +498,31 @@ class ForeachClauseNode(BaseNode):
         self.block = block        # type: CodeBlockNode
 
 class IfNode(BaseNode):
+    __slots__ = ('condition', 'block')
+
     def __init__(self, linenode: BaseNode, condition: BaseNode, block: CodeBlockNode):
         super().__init__(linenode.lineno, linenode.colno, linenode.filename)
         self.condition = condition  # type: BaseNode
         self.block = block          # type: CodeBlockNode
 
 class IfClauseNode(BaseNode):
+    __slots__ = ('ifs', 'elseblock')
+
     def __init__(self, linenode: BaseNode):
         super().__init__(linenode.lineno, linenode.colno, linenode.filename)
         self.ifs = []          # type: T.List[IfNode]
         self.elseblock = None  # type: T.Union[EmptyNode, CodeBlockNode]
 
 class UMinusNode(BaseNode):
+    __slots__ = ('value',)
+
     def __init__(self, current_location: Token, value: BaseNode):
         super().__init__(current_location.lineno, current_location.colno, current_location.filename)
         self.value = value  # type: BaseNode
 
 class TernaryNode(BaseNode):
+    __slots__ = ('condition', 'trueblock', 'falseblock')
+
     def __init__(self, condition: BaseNode, trueblock: BaseNode, falseblock: BaseNode):
         super().__init__(condition.lineno, condition.colno, condition.filename)
         self.condition = condition    # type: BaseNode
@@ -812,3 +880,62 @@ class Parser:
                 block.lines.append(curline)
             cond = self.accept('eol')
         return block
+
+
+class ParseCache:
+
+    """On-disk cache of parsed build files.
+
+    Parsing every build file again on each reconfiguration is wasted work
+    when most of them did not change. The parsed tree of every file is
+    pickled and compressed into its own entry, named after the file path
+    and validated with a hash of the file content. Each lookup returns a new tree, so
+    callers are free to modify it like one coming from the Parser.
+    """
+
+    # Bump this when the AST node classes change
+    FORMAT_VERSION = 2
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def _path(self, filename: str) -> str:
+        name = hashlib.sha256(os.path.abspath(filename).encode('utf-8', errors='surrogateescape')).hexdigest()
+        return os.path.join(self.cache_dir, name)
+
+    def _code_hash(self, code: str) -> str:
+        from .coredata import version
+        h = hashlib.sha256()
+        h.update(f'{self.FORMAT_VERSION}\0{version}\0'.encode())
+        h.update(code.encode('utf-8', errors='surrogateescape'))
+        return h.hexdigest()
+
+    def parse(self, code: str, filename: str) -> 'CodeBlockNode':
+        path = self._path(filename)
+        code_hash = self._code_hash(code)
+        try:
+            with open(path, 'rb') as f:
+                cached_hash, codeblock = pickle.loads(zlib.decompress(f.read()))
+            if cached_hash == code_hash and isinstance(codeblock, CodeBlockNode):
+                return codeblock
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, zlib.error, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            mlog.debug(f'Ignoring unreadable parse cache entry {path}: {e}')
+
+        warnings = mlog.log_warnings_counter
+        codeblock = Parser(code, filename).parse()
+        # Files with warnings are not cached so that they are printed on
+        # every run, and are counted for --fatal-meson-warnings.
+        if mlog.log_warnings_counter != warnings:
+            return codeblock
+        tempname = path + '~'
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            data = zlib.compress(pickle.dumps((code_hash, codeblock), pickle.HIGHEST_PROTOCOL), 1)
+            with open(tempname, 'wb') as f:
+                f.write(data)
+            os.replace(tempname, path)
+        except (OSError, RecursionError, pickle.PicklingError) as e:
+            mlog.debug(f'Could not write parse cache entry {path}: {e}')
+        return codeblock
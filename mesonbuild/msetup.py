@@ -23,11 +23,13 @@ import argparse
 import tempfile
 import shutil
 import glob
+import pickle
 
 from . import environment, interpreter, mesonlib
 from . import build
 from . import mlog, coredata
 from . import mintro
+from .backend.backends import hash_depfile
 from .mconf import make_lower_case
 from .mesonlib import MesonException
 
@@ -196,34 +198,34 @@ class MesonApp:
             mlog.log('Build type:', mlog.bold('cross build'))
         else:
             mlog.log('Build type:', mlog.bold('native build'))
-        b = build.Build(env)
-
-        intr = interpreter.Interpreter(b)
-        if env.is_cross_build():
-            logger_fun = mlog.log
-        else:
-            logger_fun = mlog.debug
-        build_machine = intr.builtin['build_machine']
-        host_machine = intr.builtin['host_machine']
-        target_machine = intr.builtin['target_machine']
-        assert isinstance(build_machine, interpreter.MachineHolder)
-        assert isinstance(host_machine, interpreter.MachineHolder)
-        assert isinstance(target_machine, interpreter.MachineHolder)
-        logger_fun('Build machine cpu family:', mlog.bold(build_machine.cpu_family_method([], {})))
-        logger_fun('Build machine cpu:', mlog.bold(build_machine.cpu_method([], {})))
-        mlog.log('Host machine cpu family:', mlog.bold(host_machine.cpu_family_method([], {})))
-        mlog.log('Host machine cpu:', mlog.bold(host_machine.cpu_method([], {})))
-        logger_fun('Target machine cpu family:', mlog.bold(target_machine.cpu_family_method([], {})))
-        logger_fun('Target machine cpu:', mlog.bold(target_machine.cpu_method([], {})))
-        try:
-            if self.options.profile:
-                fname = os.path.join(self.build_dir, 'meson-private', 'profile-interpreter.log')
-                profile.runctx('intr.run()', globals(), locals(), filename=fname)
+        intr = None  # type: T.Optional[interpreter.Interpreter]
+        subdirs = self.get_changed_subdirs(env)
+        if subdirs:
+            previous = build.load(self.build_dir)
+            try:
+                subdirs = interpreter.check_subdirs(previous, subdirs)
+            except interpreter.IncrementalFallback as e:
+                mlog.log('Evaluating the whole project again because', str(e))
             else:
-                intr.run()
-        except Exception as e:
-            mintro.write_meson_info_file(b, [e])
-            raise
+                intr = self.rerun_subdirs(env, previous, subdirs)
+                if intr is None:
+                    # project() already used this one
+                    env = environment.Environment(self.source_dir, self.build_dir, self.options)
+        if intr is not None:
+            b = intr.build
+        else:
+            b = build.Build(env)
+            intr = interpreter.Interpreter(b)
+            self.log_machines(intr)
+            try:
+                if self.options.profile:
+                    fname = os.path.join(self.build_dir, 'meson-private', 'profile-interpreter.log')
+                    profile.runctx('intr.run()', globals(), locals(), filename=fname)
+                else:
+                    intr.run()
+            except Exception as e:
+                mintro.write_meson_info_file(b, [e])
+                raise
         # Print all default option values that don't match the current value
         for def_opt_name, def_opt_value, cur_opt_value in intr.get_non_matching_default_options():
             mlog.log('Option', mlog.bold(def_opt_name), 'is:',
@@ -275,6 +277,79 @@ class MesonApp:
                     os.unlink(cdf)
             raise
 
+    def log_machines(self, intr: interpreter.Interpreter) -> None:
+        if intr.environment.is_cross_build():
+            logger_fun = mlog.log
+        else:
+            logger_fun = mlog.debug
+        build_machine = intr.builtin['build_machine']
+        host_machine = intr.builtin['host_machine']
+        target_machine = intr.builtin['target_machine']
+        assert isinstance(build_machine, interpreter.MachineHolder)
+        assert isinstance(host_machine, interpreter.MachineHolder)
+        assert isinstance(target_machine, interpreter.MachineHolder)
+        logger_fun('Build machine cpu family:', mlog.bold(build_machine.cpu_family_method([], {})))
+        logger_fun('Build machine cpu:', mlog.bold(build_machine.cpu_method([], {})))
+        mlog.log('Host machine cpu family:', mlog.bold(host_machine.cpu_family_method([], {})))
+        mlog.log('Host machine cpu:', mlog.bold(host_machine.cpu_method([], {})))
+        logger_fun('Target machine cpu family:', mlog.bold(target_machine.cpu_family_method([], {})))
+        logger_fun('Target machine cpu:', mlog.bold(target_machine.cpu_method([], {})))
+
+    def get_changed_subdirs(self, env: environment.Environment) -> T.Optional[T.List[str]]:
+        """The subdirectories of the main project whose meson.build file
+        changed since the last configuration, or None if anything else
+        changed, so that the whole project must be evaluated again."""
+        if not self.options.reconfigure or not env.coredata.get_option(mesonlib.OptionKey('incremental_regen')):
+            return None
+        if any(k != mesonlib.OptionKey('backend') for k in self.options.cmd_line_options):
+            return None
+        try:
+            with open(os.path.join(env.get_scratch_dir(), 'regeninfo.dump'), 'rb') as f:
+                regeninfo = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        hashes = getattr(regeninfo, 'depfile_hashes', {})
+        subdirs = []  # type: T.List[str]
+        for f in regeninfo.depfiles:
+            path = os.path.join(self.build_dir, f)
+            if f in hashes and hash_depfile(path) == hashes[f]:
+                continue
+            path = os.path.relpath(path, self.source_dir)
+            if os.path.basename(path) != environment.build_filename or path.startswith('..'):
+                return None
+            subdir = os.path.dirname(path)
+            if not subdir:
+                return None
+            subdirs.append(subdir)
+        return subdirs or None
+
+    def rerun_subdirs(self, env: environment.Environment, previous: build.Build,
+                      subdirs: T.List[str]) -> T.Optional[interpreter.Interpreter]:
+        """Only evaluate the meson.build files of subdirs again, on top of
+        the previous build.
+
+        Returns None if the whole project must be evaluated instead. Nothing
+        the attempt logged is written out then, so that it is not logged
+        twice.
+        """
+        warnings = mlog.log_warnings_counter
+        b = build.Build(env)
+        try:
+            with mlog.capture() as calls:
+                intr = interpreter.Interpreter(b)
+                self.log_machines(intr)
+                intr.rerun_subdirs(previous, subdirs)
+        except interpreter.IncrementalFallback as e:
+            mlog.log_warnings_counter = warnings
+            mlog.log('Evaluating the whole project again because', str(e))
+            return None
+        except Exception as e:
+            mlog.replay(calls)
+            mintro.write_meson_info_file(b, [e])
+            raise
+        mlog.replay(calls)
+        return intr
+
 def run(options: argparse.Namespace) -> int:
     coredata.parse_cmd_line_options(options)
     app = MesonApp(options)
@@ -21,6 +21,7 @@ import argparse
 import asyncio
 import datetime
 import enum
+import hashlib
 import json
 import multiprocessing
 import os
@@ -91,6 +92,22 @@ def determine_worker_count() -> int:
             num_workers = 1
     return num_workers
 
+def determine_total_memory() -> T.Optional[int]:
+    '''Physical memory of the machine in megabytes, if it can be found.'''
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+def parse_shard(s: str) -> T.Tuple[int, int]:
+    try:
+        index, count = (int(x) for x in s.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected N/M, got {s!r}')
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f'shard {index} does not exist in {count} shards')
+    return index, count
+
 def add_arguments(parser: argparse.ArgumentParser) -> None:
     parser.add_argument('--repeat', default=1, dest='repeat', type=int,
                         help='Number of times to run the tests.')
@@ -133,6 +150,25 @@ def add_arguments(parser: argparse.ArgumentParser) -> None:
                         ' more time to execute. (<= 0 to disable timeout)')
     parser.add_argument('--setup', default=None, dest='setup',
                         help='Which test setup to use.')
+    parser.add_argument('--schedule', default='lpt', choices=['lpt', 'declared', 'random'],
+                        help='Order in which tests of the same priority are started: '
+                        'longest first according to previous runs (default), '
+                        'in the order they were declared or in random order.')
+    parser.add_argument('--failed-first', default=False, action='store_true',
+                        help='Start the tests that failed in the previous run before the others.')
+    parser.add_argument('--maxfail', default=0, type=int, metavar='N',
+                        help='Interrupt the remaining tests after N failures, '
+                        '0 to run all the tests (default).')
+    parser.add_argument('--cached', default=False, action='store_true',
+                        help='Do not run tests whose inputs did not change since they last passed.')
+    parser.add_argument('--shard', default=None, type=parse_shard, metavar='N/M',
+                        help='Only run the Nth of M parts of the selected tests.')
+    parser.add_argument('--shard-durations', default=None, metavar='FILE',
+                        help='Test history shared by all the shards, used to give them parts '
+                        'that take about as long.')
+    parser.add_argument('--merge-logs', default=[], nargs='+', metavar='LOG',
+                        help='Merge the JSON test logs of several runs into the log of this '
+                        'build directory and print their summary instead of running tests.')
     parser.add_argument('--test-args', default=[], type=split_args,
                         help='Arguments to pass to the specified test(s) or all tests')
     parser.add_argument('args', nargs='*',
@@ -1453,6 +1489,190 @@ class SingleTestRunner:
         self.runobj.complete(returncode, result, stdo, stde)
 
 
+class TestResources:
+    '''
+    Processors and memory shared by the tests running in parallel.
+
+    Tests get what they declared they use in the order they asked for it.
+    While the first waiting test does not fit, the tests behind it wait as
+    well even if they would fit, otherwise small tests could keep a test
+    that uses many processors from ever starting. A test that needs more
+    than there is runs alone.
+    '''
+
+    def __init__(self, cpus: int, memory: T.Optional[int]):
+        self.cpus = cpus
+        self.memory = memory
+        self.used_cpus = 0
+        self.used_memory = 0
+        self.condition = asyncio.Condition()
+        self.waiting = deque()  # type: T.Deque[object]
+
+    def clamp(self, test: TestSerialisation) -> T.Tuple[int, int]:
+        cpus = min(test.cpus, self.cpus)
+        memory = min(test.memory, self.memory) if self.memory is not None else 0
+        return cpus, memory
+
+    def fits(self, cpus: int, memory: int) -> bool:
+        if self.used_cpus + cpus > self.cpus:
+            return False
+        return self.memory is None or self.used_memory + memory <= self.memory
+
+    async def acquire(self, test: TestSerialisation) -> None:
+        cpus, memory = self.clamp(test)
+        ticket = object()
+        async with self.condition:
+            self.waiting.append(ticket)
+            try:
+                await self.condition.wait_for(
+                    lambda: self.waiting[0] is ticket and self.fits(cpus, memory))
+            finally:
+                # Whether it got the resources or was cancelled, the test
+                # is no longer in the way of the ones behind it
+                self.waiting.remove(ticket)
+                self.condition.notify_all()
+            self.used_cpus += cpus
+            self.used_memory += memory
+
+    async def release(self, test: TestSerialisation) -> None:
+        cpus, memory = self.clamp(test)
+        async with self.condition:
+            self.used_cpus -= cpus
+            self.used_memory -= memory
+            self.condition.notify_all()
+
+
+class TestHistory:
+    '''
+    Information about the tests of the previous runs, such as how long
+    they took, stored in the meson-logs directory of the build directory.
+    '''
+
+    VERSION = 1
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.tests = {}  # type: T.Dict[str, T.Dict[str, T.Any]]
+        try:
+            with open(filename, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION:
+                self.tests = data['tests']
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+
+    @staticmethod
+    def get_key(test: TestSerialisation) -> str:
+        return '+'.join(test.suite) + ' / ' + test.name
+
+    def get_duration(self, test: TestSerialisation) -> T.Optional[float]:
+        duration = self.tests.get(self.get_key(test), {}).get('duration')
+        if isinstance(duration, (int, float)):
+            return float(duration)
+        return None
+
+    def failed(self, test: TestSerialisation) -> bool:
+        try:
+            return TestResult(self.tests.get(self.get_key(test), {})['result']).is_bad()
+        except (KeyError, ValueError):
+            return False
+
+    def get_cache_key(self, test: TestSerialisation) -> T.Optional[str]:
+        key = self.tests.get(self.get_key(test), {}).get('cache_key')
+        if isinstance(key, str):
+            return key
+        return None
+
+    def record(self, result: 'TestRun', cache_key: T.Optional[str] = None) -> None:
+        self.update(result.test, result.res, result.duration, cache_key)
+
+    def update(self, test: TestSerialisation, res: TestResult, duration: T.Optional[float],
+               cache_key: T.Optional[str] = None) -> None:
+        if duration is None or res is TestResult.INTERRUPT:
+            return
+        entry = self.tests.setdefault(self.get_key(test), {})
+        entry['duration'] = duration
+        entry['result'] = res.value
+        # Only a pass can be reused by --cached. A pass without a key, i.e.
+        # when not running with --cached, keeps the key of the previous pass
+        # since the inputs it describes are still known to be good.
+        if res not in {TestResult.OK, TestResult.EXPECTEDFAIL}:
+            entry.pop('cache_key', None)
+        elif cache_key is not None:
+            entry['cache_key'] = cache_key
+
+    def save(self) -> None:
+        if not os.path.isdir(os.path.dirname(self.filename)):
+            return
+        tempfilename = self.filename + '~'
+        with open(tempfilename, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'tests': self.tests}, f)
+        os.replace(tempfilename, self.filename)
+
+
+class TestInputs:
+    '''
+    Computes the keys used by --cached to find out whether a test has to run
+    again. The key covers the contents of the test program, of its arguments
+    and of the targets it depends on, including the shared libraries it links
+    to, as well as its environment and working directory.
+    '''
+
+    def __init__(self, wd: str):
+        self.digests = {}       # type: T.Dict[str, T.Optional[str]]
+        self.target_files = {}  # type: T.Dict[str, T.List[str]]
+        for target in load_info_file(get_infodir(wd), kind='targets'):
+            self.target_files[target['id']] = target['filename']
+
+    def file_digest(self, path: str) -> T.Optional[str]:
+        if path not in self.digests:
+            digest = None  # type: T.Optional[str]
+            if os.path.isfile(path):
+                h = hashlib.sha256()
+                try:
+                    with open(path, 'rb') as f:
+                        for chunk in iter(lambda: f.read(65536), b''):
+                            h.update(chunk)
+                    digest = h.hexdigest()
+                except OSError:
+                    pass
+            self.digests[path] = digest
+        return self.digests[path]
+
+    def get_key(self, runner: 'SingleTestRunner') -> str:
+        test = runner.test
+        h = hashlib.sha256()
+
+        def add(s: str) -> None:
+            h.update(s.encode('utf-8', errors='surrogateescape'))
+            h.update(b'\0')
+
+        cmd = (runner.cmd or []) + test.cmd_args + runner.options.test_args
+        workdir = test.workdir or os.getcwd()
+        for s in [test.version, str(test.protocol), str(test.should_fail),
+                  str(runner.runobj.timeout), workdir] + cmd:
+            add(s)
+
+        files = set()  # type: T.Set[str]
+        for arg in cmd:
+            files.add(os.path.join(workdir, arg))
+        for d in test.depends + test.shared_libs:
+            files.update(self.target_files.get(d, []))
+        for f in sorted(files):
+            digest = self.file_digest(f)
+            if digest is not None:
+                add(f)
+                add(digest)
+
+        # The whole environment, except MALLOC_PERTURB_ which is random
+        # unless the user set it
+        for k, v in sorted(runner.runobj.env.items()):
+            if k != 'MALLOC_PERTURB_':
+                add(k)
+                add(v)
+        return h.hexdigest()
+
+
 class TestHarness:
     def __init__(self, options: argparse.Namespace):
         self.options = options
@@ -1463,12 +1683,16 @@ class TestHarness:
         self.success_count = 0
         self.skip_count = 0
         self.timeout_count = 0
+        self.cached_count = 0
         self.test_count = 0
         self.name_max_len = 0
         self.is_run = False
         self.loggers = []         # type: T.List[TestLogger]
         self.loggers.append(ConsoleLogger())
         self.need_console = False
+        self.predicted_time = None  # type: T.Optional[float]
+        self.actual_time = None     # type: T.Optional[float]
+        self.cache_keys = {}        # type: T.Dict[str, str]
 
         self.logfile_base = None  # type: T.Optional[str]
         if self.options.logbase and not self.options.gdb:
@@ -1487,7 +1711,7 @@ class TestHarness:
         try:
             if self.options.wd:
                 os.chdir(self.options.wd)
-            self.build_data = build.load(os.getcwd())
+            self.build_data = build.load_chunk(os.getcwd(), 'test_setups')
             if not self.options.setup:
                 self.options.setup = self.build_data.test_setup_default_name
             if self.options.benchmark:
@@ -1503,6 +1727,9 @@ class TestHarness:
                 ss.add(s)
         self.suites = list(ss)
 
+        history_name = 'benchmark-history.json' if self.options.benchmark else 'test-history.json'
+        self.history = TestHistory(os.path.join(self.options.wd, 'meson-logs', history_name))
+
     def load_tests(self, file_name: str) -> T.List[TestSerialisation]:
         datafile = Path('meson-private') / file_name
         if not datafile.is_file():
@@ -1562,24 +1789,28 @@ class TestHarness:
             env['MESON_EXE_WRAPPER'] = join_args(test.exe_runner.get_command())
         return SingleTestRunner(test, env, name, options)
 
-    def process_test_result(self, result: TestRun) -> None:
-        if result.res is TestResult.TIMEOUT:
+    def count_result(self, res: TestResult) -> None:
+        if res is TestResult.TIMEOUT:
             self.timeout_count += 1
-        elif result.res is TestResult.SKIP:
+        elif res is TestResult.SKIP:
             self.skip_count += 1
-        elif result.res is TestResult.OK:
+        elif res is TestResult.OK:
             self.success_count += 1
-        elif result.res in {TestResult.FAIL, TestResult.ERROR, TestResult.INTERRUPT}:
+        elif res in {TestResult.FAIL, TestResult.ERROR, TestResult.INTERRUPT}:
             self.fail_count += 1
-        elif result.res is TestResult.EXPECTEDFAIL:
+        elif res is TestResult.EXPECTEDFAIL:
             self.expectedfail_count += 1
-        elif result.res is TestResult.UNEXPECTEDPASS:
+        elif res is TestResult.UNEXPECTEDPASS:
             self.unexpectedpass_count += 1
         else:
-            sys.exit(f'Unknown test result encountered: {result.res}')
+            sys.exit(f'Unknown test result encountered: {res}')
 
+    def process_test_result(self, result: TestRun) -> None:
+        self.count_result(result.res)
         if result.res.is_bad():
             self.collected_failures.append(result)
+        if not self.options.gdb:
+            self.history.record(result, self.cache_keys.get(TestHistory.get_key(result.test)))
         for l in self.loggers:
             l.log(self, result)
 
@@ -1624,7 +1855,7 @@ class TestHarness:
         return prefix + left + middle + right
 
     def summary(self) -> str:
-        return textwrap.dedent('''
+        summary = textwrap.dedent('''
 
             Ok:                 {:<4}
             Expected Fail:      {:<4}
@@ -1634,6 +1865,16 @@ class TestHarness:
             Timeout:            {:<4}
             ''').format(self.success_count, self.expectedfail_count, self.fail_count,
                         self.unexpectedpass_count, self.skip_count, self.timeout_count)
+        if self.predicted_time is not None and self.actual_time is not None:
+            summary += textwrap.dedent('''
+                Predicted time:     {:.2f}s
+                Actual time:        {:.2f}s
+                ''').format(self.predicted_time, self.actual_time)
+        if self.cached_count:
+            summary += textwrap.dedent('''
+                Cached:             {:<4}
+                ''').format(self.cached_count)
+        return summary
 
     def total_failure_count(self) -> int:
         return self.fail_count + self.unexpectedpass_count + self.timeout_count
@@ -1658,9 +1899,14 @@ class TestHarness:
         try:
             if self.options.wd:
                 os.chdir(self.options.wd)
+            if self.options.cached:
+                tests = self.filter_cached(tests)
+                if not tests:
+                    print('All {} tests passed before and their inputs did not change.'.format(self.cached_count))
+                    return 0
             runners = []             # type: T.List[SingleTestRunner]
             for i in range(self.options.repeat):
-                runners.extend(self.get_test_runner(test) for test in tests)
+                runners.extend(self.order_runners([self.get_test_runner(test) for test in tests]))
                 if i == 0:
                     self.duration_max_len = max([len(str(int(runner.timeout or 99)))
                                                  for runner in runners])
@@ -1669,11 +1915,93 @@ class TestHarness:
                                              for runner in runners)
 
             self.test_count = len(runners)
+            self.predicted_time = self.predict_time(runners)
             self.run_tests(runners)
         finally:
             os.chdir(startdir)
         return self.total_failure_count()
 
+    def filter_cached(self, tests: T.List[TestSerialisation]) -> T.List[TestSerialisation]:
+        '''
+        Drop the tests that passed in a previous run with the very same
+        inputs, and remember the keys of the others for the next run.
+        '''
+        inputs = TestInputs(os.getcwd())
+        result = []
+        for test in tests:
+            key = inputs.get_key(self.get_test_runner(test))
+            if key == self.history.get_cache_key(test):
+                self.cached_count += 1
+            else:
+                self.cache_keys[TestHistory.get_key(test)] = key
+                result.append(test)
+        return result
+
+    def get_predicted_durations(self, runners: T.List[SingleTestRunner]) -> T.Optional[T.List[float]]:
+        '''
+        How long each test is expected to take according to the previous
+        runs, tests that never ran are assumed to take the average time.
+        Returns None if none of the tests ran before.
+        '''
+        durations = [self.history.get_duration(r.test) for r in runners]
+        known = [d for d in durations if d is not None]
+        if not known:
+            return None
+        average = sum(known) / len(known)
+        return [average if d is None else d for d in durations]
+
+    def order_runners(self, runners: T.List[SingleTestRunner]) -> T.List[SingleTestRunner]:
+        '''
+        Sort the tests in the order they are started, the tests with the
+        highest priority always come first. With the lpt schedule, tests
+        that do not run in parallel come first because they have to wait
+        for all the running tests to complete, then the tests that took
+        the longest in the previous runs. This keeps a long test from
+        being the only one still running at the end.
+
+        With --failed-first, the tests that failed in the previous run
+        come before all the others, whatever their priority.
+        '''
+        if self.options.schedule == 'declared':
+            ordered = runners
+        elif self.options.schedule == 'random':
+            ordered = runners[:]
+            random.shuffle(ordered)
+            ordered.sort(key=lambda r: -r.test.priority)
+        else:
+            durations = self.get_predicted_durations(runners) or [0.0] * len(runners)
+            order = sorted(range(len(runners)),
+                           key=lambda i: (-runners[i].test.priority, runners[i].is_parallel,
+                                          -durations[i] if runners[i].is_parallel else 0.0))
+            ordered = [runners[i] for i in order]
+        if self.options.failed_first:
+            ordered = sorted(ordered, key=lambda r: not self.history.failed(r.test))
+        return ordered
+
+    def predict_time(self, runners: T.List[SingleTestRunner]) -> T.Optional[float]:
+        '''
+        Simulate running the tests in order with their durations in the
+        previous runs to predict how long running all of them takes.
+        '''
+        durations = self.get_predicted_durations(runners)
+        if durations is None:
+            return None
+        # When each of the processors becomes available, a test using
+        # several of them waits for all of them. Tests start in order, so
+        # never before the one ahead of them.
+        slots = [0.0] * max(1, self.options.num_processes)
+        start = 0.0
+        for runner, duration in zip(runners, durations):
+            if runner.is_parallel:
+                cpus = min(runner.test.cpus, len(slots))
+                slots.sort()
+                start = max(start, slots[cpus - 1])
+                slots[:cpus] = [start + duration] * cpus
+            else:
+                start = max(slots)
+                slots = [start + duration] * len(slots)
+        return max(slots)
+
     @staticmethod
     def split_suite_string(suite: str) -> T.Tuple[str, str]:
         if ':' in suite:
@@ -1766,8 +2094,85 @@ class TestHarness:
             print('No suitable tests defined.')
             return []
 
+        if self.options.shard:
+            tests = self.shard_tests(tests)
+            if not tests:
+                print('No tests in this shard.')
+                return []
+
         return tests
 
+    def shard_tests(self, tests: T.List[TestSerialisation]) -> T.List[TestSerialisation]:
+        '''
+        Split the tests in parts using only what every shard has in common:
+        the names of the tests and, if given, the --shard-durations file.
+        The history of this build directory is not used, it differs from one
+        shard to another once they ran.
+
+        With durations, the longest test goes first to the least loaded
+        part. Without them, the tests sorted by name are dealt in turn.
+        '''
+        index, count = self.options.shard
+        order = sorted(range(len(tests)), key=lambda i: (TestHistory.get_key(tests[i]), i))
+        shard_of = [0] * len(tests)
+        if self.options.shard_durations:
+            history = TestHistory(self.options.shard_durations)
+            durations = [history.get_duration(t) for t in tests]
+            known = [d for d in durations if d is not None]
+            average = sum(known) / len(known) if known else 1.0
+            weights = [d if d is not None else average for d in durations]
+            # Sorting is stable, so equal durations stay sorted by name
+            order.sort(key=lambda i: -weights[i])
+            loads = [0.0] * count
+            for i in order:
+                shard = loads.index(min(loads))
+                loads[shard] += weights[i]
+                shard_of[i] = shard
+        else:
+            for n, i in enumerate(order):
+                shard_of[i] = n % count
+        return [t for i, t in enumerate(tests) if shard_of[i] == index - 1]
+
+    def merge_logs(self, filenames: T.List[str]) -> int:
+        '''
+        Combine the JSON logs of several runs, such as the shards of a test
+        run spread over several machines, into the JSON log of this build
+        directory and print the summary of all of them. Their durations
+        and results go into the test history, which can then be shared
+        with the shards of the next run through --shard-durations.
+        '''
+        results = []  # type: T.List[T.Dict[str, T.Any]]
+        for filename in filenames:
+            try:
+                with open(filename, encoding='utf-8') as f:
+                    for line in f:
+                        if line.strip():
+                            r = json.loads(line)
+                            TestResult(r['result'])
+                            results.append(r)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                raise TestException(f'Could not read test log {filename!r}: {e}')
+        results.sort(key=lambda r: r.get('starttime') or 0)
+
+        tests = {self.get_pretty_suite(t): t for t in self.tests}
+        for r in results:
+            res = TestResult(r['result'])
+            self.count_result(res)
+            if res.is_bad():
+                print('{} {}'.format(res.get_text(mlog.colorize_console()), r['name']))
+            if r['name'] in tests:
+                self.history.update(tests[r['name']], res, r.get('duration'))
+        self.history.save()
+        print(f'Test history written to {self.history.filename}')
+        if self.logfile_base:
+            filename = self.logfile_base + '.json'
+            with open(filename, 'w', encoding='utf-8') as f:
+                for r in results:
+                    f.write(json.dumps(r) + '\n')
+            print(f'Merged log written to {filename}')
+        print(self.summary())
+        return self.total_failure_count()
+
     def flush_logfiles(self) -> None:
         for l in self.loggers:
             l.flush()
@@ -1811,6 +2216,8 @@ class TestHarness:
             loop.run_until_complete(self._run_tests(runners))
         finally:
             self.close_logfiles()
+            if not self.options.gdb:
+                self.history.save()
 
     def log_subtest(self, test: TestRun, s: str, res: TestResult) -> None:
         for l in self.loggers:
@@ -1821,18 +2228,21 @@ class TestHarness:
             l.start_test(self, test)
 
     async def _run_tests(self, runners: T.List[SingleTestRunner]) -> None:
-        semaphore = asyncio.Semaphore(self.options.num_processes)
+        resources = TestResources(self.options.num_processes, determine_total_memory())
         futures = deque()  # type: T.Deque[asyncio.Future]
         running_tests = dict() # type: T.Dict[asyncio.Future, str]
         interrupted = False
         ctrlc_times = deque(maxlen=MAX_CTRLC) # type: T.Deque[float]
 
         async def run_test(test: SingleTestRunner) -> None:
-            async with semaphore:
+            await resources.acquire(test.test)
+            try:
                 if interrupted or (self.options.repeat > 1 and self.fail_count):
                     return
                 res = await test.run(self)
                 self.process_test_result(res)
+            finally:
+                await resources.release(test.test)
 
         def test_done(f: asyncio.Future) -> None:
             if not f.cancelled():
@@ -1842,6 +2252,12 @@ class TestHarness:
                 del running_tests[f]
             except KeyError:
                 pass
+            if (self.options.maxfail > 0 and not interrupted and
+                    self.total_failure_count() >= self.options.maxfail):
+                self.flush_logfiles()
+                mlog.warning('{} tests failed, interrupting the remaining tests'.format(
+                    self.total_failure_count()))
+                cancel_all_tests()
 
         def cancel_one_test(warn: bool) -> None:
             future = futures.popleft()
@@ -1886,6 +2302,7 @@ class TestHarness:
         for l in self.loggers:
             l.start(self)
 
+        starttime = time.time()
         if sys.platform != 'win32':
             asyncio.get_event_loop().add_signal_handler(signal.SIGINT, sigint_handler)
             asyncio.get_event_loop().add_signal_handler(signal.SIGTERM, sigterm_handler)
@@ -1904,6 +2321,7 @@ class TestHarness:
 
             await complete_all(futures)
         finally:
+            self.actual_time = time.time() - starttime
             if sys.platform != 'win32':
                 asyncio.get_event_loop().remove_signal_handler(signal.SIGINT)
                 asyncio.get_event_loop().remove_signal_handler(signal.SIGTERM)
@@ -1961,6 +2379,19 @@ def run(options: argparse.Namespace) -> int:
         print('Can not be both quiet and verbose at the same time.')
         return 1
 
+    if options.benchmark and options.cached:
+        print('Benchmarks can not be cached.')
+        return 1
+
+    if options.shard_durations:
+        if not options.shard:
+            print('--shard-durations can only be used with --shard.')
+            return 1
+        if not os.path.isfile(options.shard_durations):
+            print(f'Could not find shard durations file {options.shard_durations!r}.')
+            return 1
+        options.shard_durations = os.path.abspath(options.shard_durations)
+
     check_bin = None
     if options.gdb:
         options.verbose = True
@@ -1986,6 +2417,8 @@ def run(options: argparse.Namespace) -> int:
         try:
             if options.list:
                 return list_tests(th)
+            if options.merge_logs:
+                return th.merge_logs(options.merge_logs)
             return th.doit()
         except TestException as e:
             print('Meson test encountered an error:\n')
@@ -38,6 +38,7 @@ def add_arguments(parser, formatter=None):
     parser.add_argument('-s', '--sourcedir', type=str, default='.', metavar='SRCDIR', help='Path to source directory.')
     parser.add_argument('-V', '--verbose', action='store_true', default=False, help='Enable verbose output')
     parser.add_argument('-S', '--skip-errors', dest='skip', action='store_true', default=False, help='Skip errors instead of aborting')
+    parser.add_argument('--builddir', type=str, default=None, metavar='BUILDDIR', help='Build directory of the project, its parse cache is used if given.')
     subparsers = parser.add_subparsers(dest='type', title='Rewriter commands', description='Rewrite command to execute')
 
     # Target
@@ -349,9 +350,11 @@ rewriter_func_kwargs = {
 }
 
 class Rewriter:
-    def __init__(self, sourcedir: str, generator: str = 'ninja', skip_errors: bool = False):
+    def __init__(self, sourcedir: str, generator: str = 'ninja', skip_errors: bool = False,
+                 cache_dir: T.Optional[str] = None):
         self.sourcedir = sourcedir
-        self.interpreter = IntrospectionInterpreter(sourcedir, '', generator, visitors = [AstIDGenerator(), AstIndentationGenerator(), AstConditionLevel()])
+        self.interpreter = IntrospectionInterpreter(sourcedir, '', generator, visitors = [AstIDGenerator(), AstIndentationGenerator(), AstConditionLevel()],
+                                                    cache_dir=cache_dir)
         self.skip_errors = skip_errors
         self.modified_nodes = []
         self.to_remove_nodes = []
@@ -944,7 +947,10 @@ def run(options):
         mlog.set_quiet()
 
     try:
-        rewriter = Rewriter(options.sourcedir, skip_errors=options.skip)
+        cache_dir = None
+        if options.builddir is not None:
+            cache_dir = os.path.join(options.builddir, 'meson-private', 'parse-cache')
+        rewriter = Rewriter(options.sourcedir, skip_errors=options.skip, cache_dir=cache_dir)
         rewriter.analyze_meson()
 
         if options.type is None:
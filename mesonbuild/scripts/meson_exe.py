@@ -15,6 +15,7 @@
 import os
 import sys
 import argparse
+import hashlib
 import pickle
 import subprocess
 import typing as T
@@ -29,8 +30,48 @@ def buildparser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description='Custom executable wrapper for Meson. Do not run on your own, mmm\'kay?')
     parser.add_argument('--unpickle')
     parser.add_argument('--capture')
+    parser.add_argument('--write-if-changed', action='append', default=[])
     return parser
 
+def file_digest(fname: str) -> T.Optional[bytes]:
+    h = hashlib.sha256()
+    try:
+        with open(fname, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(chunk)
+    except OSError:
+        return None
+    return h.digest()
+
+def stat_outputs(outputs: T.List[str]) -> T.Dict[str, T.Tuple[os.stat_result, bytes]]:
+    '''Timestamp and content hash of the outputs that already exist.'''
+    result = {}
+    for o in outputs:
+        try:
+            st = os.stat(o)
+        except OSError:
+            continue
+        digest = file_digest(o)
+        if digest is not None:
+            result[o] = (st, digest)
+    return result
+
+def restore_unchanged_outputs(before: T.Dict[str, T.Tuple[os.stat_result, bytes]]) -> None:
+    '''
+    Give back their old timestamp to the outputs the command rewrote
+    with the same content, so that ninja (with restat) does not rebuild
+    what depends on them.
+    '''
+    for o, (old_st, old_digest) in before.items():
+        try:
+            st = os.stat(o)
+        except OSError:
+            continue
+        if st.st_mtime_ns == old_st.st_mtime_ns:
+            continue
+        if st.st_size == old_st.st_size and file_digest(o) == old_digest:
+            os.utime(o, ns=(st.st_atime_ns, old_st.st_mtime_ns))
+
 def run_exe(exe: ExecutableSerialisation, extra_env: T.Optional[dict] = None) -> int:
     if exe.exe_runner:
         if not exe.exe_runner.found():
@@ -58,6 +99,8 @@ def run_exe(exe: ExecutableSerialisation, extra_env: T.Optional[dict] = None) ->
         assert not exe.capture, 'Cannot capture and print to console at the same time'
         pipe = None
 
+    before = stat_outputs(exe.write_if_changed) if exe.write_if_changed else {}
+
     p = subprocess.Popen(cmd_args, env=child_env, cwd=exe.workdir,
                          close_fds=False, stdout=pipe, stderr=pipe)
     stdout, stderr = p.communicate()
@@ -90,6 +133,8 @@ def run_exe(exe: ExecutableSerialisation, extra_env: T.Optional[dict] = None) ->
             with open(exe.capture, 'wb') as output:
                 output.write(stdout)
 
+    restore_unchanged_outputs(before)
+
     return 0
 
 def run(args: T.List[str]) -> int:
@@ -103,13 +148,14 @@ def run(args: T.List[str]) -> int:
     if not options.unpickle and not cmd_args:
         parser.error('either --unpickle or executable and arguments are required')
     if options.unpickle:
-        if cmd_args or options.capture:
+        if cmd_args or options.capture or options.write_if_changed:
             parser.error('no other arguments can be used with --unpickle')
         with open(options.unpickle, 'rb') as f:
             exe = pickle.load(f)
             exe.pickled = True
     else:
         exe = ExecutableSerialisation(cmd_args, capture=options.capture)
+        exe.write_if_changed = options.write_if_changed
 
     return run_exe(exe)
 
@@ -16,23 +16,23 @@ import sys, os
 import pickle, subprocess
 import typing as T
 from ..coredata import CoreData
-from ..backend.backends import RegenInfo
+from ..backend.backends import RegenInfo, hash_depfile
 from ..mesonlib import OptionKey
 
 # This could also be used for XCode.
 
 def need_regen(regeninfo: RegenInfo, regen_timestamp: float) -> bool:
+    # Dumps written by older versions do not have hashes
+    hashes = getattr(regeninfo, 'depfile_hashes', {})
     for i in regeninfo.depfiles:
         curfile = os.path.join(regeninfo.build_dir, i)
         curtime = os.stat(curfile).st_mtime
         if curtime > regen_timestamp:
+            # The file was touched, or only comments or whitespace changed
+            if i in hashes and hash_depfile(curfile) == hashes[i]:
+                continue
             return True
-    # The timestamp file gets automatically deleted by MSBuild during a 'Clean' build.
-    # We must make sure to recreate it, even if we do not regenerate the solution.
-    # Otherwise, Visual Studio will always consider the REGEN project out of date.
     print("Everything is up-to-date, regeneration of build files is not needed.")
-    from ..backend.vs2010backend import Vs2010Backend
-    Vs2010Backend.touch_regen_timestamp(regeninfo.build_dir)
     return False
 
 def regen(regeninfo: RegenInfo, meson_command: T.List[str], backend: str) -> None:
@@ -58,6 +58,20 @@ def run(args: T.List[str]) -> int:
     regen_timestamp = os.stat(dumpfile).st_mtime
     if need_regen(regeninfo, regen_timestamp):
         regen(regeninfo, coredata.meson_command, backend)
+    else:
+        # Only check the hashes of the modified files again once they
+        # are modified again.
+        os.utime(dumpfile)
+        if backend == 'ninja':
+            # Ninja runs us because a dependency of build.ninja is newer than
+            # it, mark it as up to date or we would be run on every build.
+            os.utime(os.path.join(regeninfo.build_dir, 'build.ninja'))
+        else:
+            # The timestamp file gets automatically deleted by MSBuild during a 'Clean' build.
+            # We must make sure to recreate it, even if we do not regenerate the solution.
+            # Otherwise, Visual Studio will always consider the REGEN project out of date.
+            from ..backend.vs2010backend import Vs2010Backend
+            Vs2010Backend.touch_regen_timestamp(regeninfo.build_dir)
     return 0
 
 if __name__ == '__main__':
@@ -13,6 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import time
 import stat
 import subprocess
@@ -70,7 +71,7 @@ from mesonbuild.build import Target, ConfigurationData
 import mesonbuild.modules.pkgconfig
 from mesonbuild.scripts import destdir_join
 
-from mesonbuild.mtest import TAPParser, TestResult
+from mesonbuild.mtest import TAPParser, TestResources, TestResult, determine_total_memory
 from mesonbuild.mesonmain import setup_vsenv
 from mesonbuild.wrap.wrap import PackageDefinition, WrapException
 
@@ -1202,6 +1203,32 @@ class InternalTests(unittest.TestCase):
             deps = d.get_all_dependencies(target)
             self.assertEqual(sorted(deps), sorted(expdeps))
 
+    def test_depfile_parse(self):
+        for (lines, expected) in [
+                ([], []),
+                (['a: b c'], [(['a'], ['b', 'c'])]),
+                # continuations, no trailing newline on the last line
+                (['a b \\\n', ' c: d \\\n', ' e\n'], [(['a', 'b', 'c'], ['d', 'e'])]),
+                # escaped separators and backslashes
+                (['a\\:b\\ c: d\\\\ e\\x\n'], [(['a:b c'], ['d\\', 'ex'])]),
+                # $ is only special before another $
+                (['$$a$ b: $c$\\ d\n'], [(['$a$ b'], ['$c$\\', 'd'])]),
+                # a colon always ends a target, even an empty one
+                ([': a', 'b :c'], [([''], ['a']), (['b', ''], ['c'])]),
+        ]:
+            self.assertEqual(mesonbuild.depfile.parse(lines), expected)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filenames = []
+            for i in range(4):
+                filenames.append(os.path.join(tmpdir, f'{i}.d'))
+                with open(filenames[-1], 'w', encoding='utf-8') as f:
+                    f.write(f'out{i}.o: in{i}.c \\\n dir\\ {i}/in.h\n')
+            self.assertEqual(mesonbuild.depfile.parse_files(filenames),
+                             [[([f'out{i}.o'], [f'in{i}.c', f'dir {i}/in.h'])] for i in range(4)])
+            with self.assertRaises(FileNotFoundError):
+                mesonbuild.depfile.parse_files(filenames + [os.path.join(tmpdir, 'missing.d')])
+
     def test_log_once(self):
         f = io.StringIO()
         with mock.patch('mesonbuild.mlog.log_file', f), \
@@ -1620,6 +1647,246 @@ class InternalTests(unittest.TestCase):
 
         sys.stdout = sys.__stdout__
 
+    def test_compiler_check_cache(self) -> None:
+        from mesonbuild.compilers.checkcache import CompilerCheckCache
+        from mesonbuild.compilers.compilers import CompileResult
+        with tempfile.TemporaryDirectory() as d:
+            cache = CompilerCheckCache(d, max_size=4096)
+            key = cache.make_key(['cc'], '1.0', 'int x;', ['-O2'], 'compile')
+            self.assertNotEqual(key, cache.make_key(['cc'], '1.0', 'int x;', ['-O3'], 'compile'))
+            self.assertNotEqual(key, cache.make_key(['cc'], '1.1', 'int x;', ['-O2'], 'compile'))
+            self.assertNotEqual(key, cache.make_key(['cc'], '1.0', 'int x;', ['-O2'], 'link'))
+            self.assertIsNone(cache.get(key))
+            cache.put(key, CompileResult('out', 'err', ['-O2'], 0, command=['cc', '-O2']))
+            p = cache.get(key)
+            self.assertEqual((p.stdout, p.stderr, p.returncode, p.command), ('out', 'err', 0, ['cc', '-O2']))
+            # Entries holding something else are ignored
+            other = cache.make_key(['cc'], '1.0', 'int y;', [], 'compile')
+            os.makedirs(os.path.dirname(cache._path(other)), exist_ok=True)
+            with open(cache._path(other), 'wb') as f:
+                pickle.dump(['out', 'err'], f)
+            self.assertIsNone(cache.get(other))
+
+            # Entries that were not used recently are the first to go
+            os.utime(cache._path(key), (0, 0))
+            for i in range(50):
+                k = cache.make_key(['cc'], '1.0', f'int x{i};', [], 'compile')
+                cache.put(k, CompileResult('x' * 100, '', [], 1))
+            self.assertIsNone(cache.get(key))
+            self.assertIsNotNone(cache.get(k))
+            self.assertLessEqual(cache._scan_size(), 4096)
+
+    def test_coredata_check_cache_section(self) -> None:
+        from mesonbuild.compilers.compilers import CompileResult
+        with tempfile.TemporaryDirectory() as bdir:
+            env = get_fake_env('', bdir)
+            key = (('cc',), '1.0', 'int x;', (), 'compile')
+            env.coredata.compiler_check_cache[key] = CompileResult('out', 'err', [], 0)
+            mesonbuild.coredata.save(env.coredata, bdir)
+            cache_file = os.path.join(bdir, 'meson-private', 'compiler_check_cache.dat')
+            with open(os.path.join(bdir, 'meson-private', 'coredata.dat'), 'rb') as f:
+                self.assertIsNone(pickle.load(f)._compiler_check_cache)
+
+            cdata = mesonbuild.coredata.load(bdir)
+            self.assertIsNone(cdata._compiler_check_cache)
+            # Saving without touching the cache must not rewrite it
+            mtime = os.stat(cache_file).st_mtime_ns
+            mesonbuild.coredata.save(cdata, bdir)
+            self.assertEqual(os.stat(cache_file).st_mtime_ns, mtime)
+            self.assertEqual(cdata.compiler_check_cache[key].stdout, 'out')
+
+            # A corrupted cache is the same as an empty one
+            with open(cache_file, 'wb') as f:
+                f.write(b'garbage')
+            self.assertEqual(mesonbuild.coredata.load(bdir).compiler_check_cache, {})
+
+    def test_build_data_chunks(self) -> None:
+        with tempfile.TemporaryDirectory() as bdir:
+            env = get_fake_env('', bdir)
+            b = mesonbuild.build.Build(env)
+            b.project_name = 'chunks'
+            b.test_setup_default_name = 'foo'
+            mesonbuild.build.save(b, os.path.join(bdir, 'meson-private', 'build.dat'))
+
+            partial = mesonbuild.build.load_chunk(bdir, 'test_setups')
+            self.assertEqual(partial.project_name, 'chunks')
+            self.assertEqual(partial.test_setup_default_name, 'foo')
+            self.assertEqual(partial.test_setups, {})
+            with self.assertRaises(AttributeError):
+                partial.targets
+
+            # Build directories without chunks load the whole build data
+            os.unlink(mesonbuild.build.get_chunk_filename(bdir, 'devenv'))
+            full = mesonbuild.build.load_chunk(bdir, 'devenv')
+            self.assertEqual(full.project_name, 'chunks')
+            self.assertEqual(full.targets, {})
+
+    def test_regen_check_ignores_comments(self) -> None:
+        from mesonbuild.backend.backends import RegenInfo, hash_depfile
+        from mesonbuild.scripts.regen_checker import need_regen
+        with tempfile.TemporaryDirectory() as bdir:
+            os.mkdir(os.path.join(bdir, 'meson-private'))
+            build_file = os.path.join(bdir, 'meson.build')
+            with open(build_file, 'w') as f:
+                f.write("project('foo', 'c')\nexecutable('foo', 'foo.c')\n")
+            regeninfo = RegenInfo(bdir, bdir, ['meson.build'], {'meson.build': hash_depfile(build_file)})
+            with open(build_file, 'w') as f:
+                f.write("# A comment\nproject('foo',\n        'c')\n\n\nexecutable('foo', 'foo.c') # Another one\n")
+            with mock.patch('sys.stdout', io.StringIO()):
+                self.assertFalse(need_regen(regeninfo, 0))
+            with open(build_file, 'w') as f:
+                f.write("project('foo', 'c')\nexecutable('foo', 'bar.c')\n")
+            self.assertTrue(need_regen(regeninfo, 0))
+            # Dumps without hashes only look at the modification time
+            self.assertTrue(need_regen(RegenInfo(bdir, bdir, ['meson.build']), 0))
+
+    def test_lexer(self) -> None:
+        code = "foo = f'@x@' + 0x1F # comment\nif a\t!= [ 'b\\n',\n  '''c\nd''' ]\n\nendif\n"
+        tokens = [(t.tid, t.lineno, t.colno, t.bytespan, t.value)
+                  for t in mesonbuild.mparser.Lexer(code).lex('meson.build')]
+        self.assertEqual(tokens, [
+            ('id', 1, 0, (0, 3), 'foo'),
+            ('assign', 1, 4, (4, 5), None),
+            ('fstring', 1, 6, (6, 12), '@x@'),
+            ('plus', 1, 13, (13, 14), None),
+            ('number', 1, 15, (15, 19), 31),
+            ('eol', 1, 29, (29, 30), None),
+            ('if', 2, 0, (30, 32), None),
+            ('id', 2, 3, (33, 34), 'a'),
+            ('nequal', 2, 5, (35, 37), None),
+            ('lbracket', 2, 8, (38, 39), None),
+            ('string', 2, 10, (40, 45), 'b\n'),
+            ('comma', 2, 15, (45, 46), None),
+            ('string', 3, 2, (49, 58), 'c\nd'),
+            ('rbracket', 4, 5, (59, 60), None),
+            ('eol', 4, 6, (60, 61), None),
+            ('eol', 5, 0, (61, 62), None),
+            ('endif', 6, 0, (62, 67), None),
+            ('eol', 6, 5, (67, 68), None),
+        ])
+        with self.assertRaises(mesonbuild.mparser.ParseException) as cm:
+            list(mesonbuild.mparser.Lexer('x = 1   $').lex('meson.build'))
+        self.assertEqual((cm.exception.lineno, cm.exception.colno), (1, 7))
+
+    def test_ast_nodes_have_slots(self) -> None:
+        def subclasses(cls):
+            for c in cls.__subclasses__():
+                yield c
+                yield from subclasses(c)
+        for cls in [mesonbuild.mparser.Token, mesonbuild.mparser.BaseNode, *subclasses(mesonbuild.mparser.BaseNode)]:
+            # Typing creates subclasses for parametrized generics
+            if cls.__module__ != 'mesonbuild.mparser':
+                continue
+            self.assertIn('__slots__', cls.__dict__, cls.__name__)
+        node = mesonbuild.mparser.Parser("x = 'foo'", 'meson.build').parse()
+        self.assertFalse(hasattr(node.lines[0].value, '__dict__'))
+
+    def test_parse_cache(self) -> None:
+        code = "project('foo', 'c')\nexecutable('foo', 'foo.c')\n"
+        with tempfile.TemporaryDirectory() as cache_dir:
+            filename = os.path.join(cache_dir, 'meson.build')
+            cache = mesonbuild.mparser.ParseCache(cache_dir)
+            first = cache.parse(code, filename)
+            with mock.patch('mesonbuild.mparser.Parser') as parser:
+                second = cache.parse(code, filename)
+                parser.assert_not_called()
+            # Every lookup returns a new tree
+            self.assertIsNot(first, second)
+            self.assertEqual(second.lines[1].func_name, 'executable')
+            self.assertEqual(second.lines[1].filename, filename)
+
+            code = code.replace('foo.c', 'bar.c')
+            third = cache.parse(code, filename)
+            self.assertEqual(third.lines[1].args.arguments[1].value, 'bar.c')
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+    def test_cross_compute_int(self) -> None:
+        with tempfile.TemporaryDirectory() as bdir:
+            env = get_fake_env('', bdir)
+            cc = env.detect_c_compiler(MachineChoice.HOST)
+            if not hasattr(cc, '_extract_int'):
+                raise unittest.SkipTest('Only C-like compilers read values from object files')
+            compile_calls = 0
+            real_compile = cc.compile
+
+            def counting_compile(*args, **kwargs):
+                nonlocal compile_calls
+                compile_calls += 1
+                return real_compile(*args, **kwargs)
+
+            with mock.patch.object(cc, 'compile', counting_compile):
+                for expr, value in [('sizeof(char)', 1), ('-1234', -1234), ('1LL << 40', 1 << 40)]:
+                    compile_calls = 0
+                    self.assertEqual(cc.cross_compute_int(expr, None, None, None, '', env), value)
+                    self.assertEqual(compile_calls, 1)
+            with self.assertRaisesRegex(EnvironmentException, 'Value out of given range'):
+                cc.cross_compute_int('100', 0, 10, None, '', env)
+            # Falls back to bisection when the value can't be read back
+            with mock.patch.object(cc, '_extract_int', return_value=None):
+                self.assertEqual(cc.cross_compute_int('sizeof(char) + 41', None, None, None, '', env), 42)
+                self.assertEqual(cc.cross_compute_int('-1234', None, None, None, '', env), -1234)
+
+    def test_run_checks_order(self) -> None:
+        from mesonbuild.compilers import run_checks
+
+        def check(i: int) -> int:
+            # Finish in the reverse order of submission
+            time.sleep((5 - i) * 0.01)
+            mesonbuild.mlog.log('check', str(i))
+            if i == 3:
+                raise MesonException('check 3 failed')
+            return i * 2
+
+        sys.stdout = io.StringIO()
+        try:
+            self.assertEqual(run_checks([functools.partial(check, i) for i in range(3)]), [0, 2, 4])
+            self.assertEqual(sys.stdout.getvalue().splitlines(), ['check 0', 'check 1', 'check 2'])
+            sys.stdout = io.StringIO()
+            with self.assertRaisesRegex(MesonException, 'check 3 failed'):
+                run_checks([functools.partial(check, i) for i in range(5)])
+            self.assertEqual(sys.stdout.getvalue().splitlines(), ['check 0', 'check 1', 'check 2', 'check 3'])
+        finally:
+            sys.stdout = sys.__stdout__
+
+    def test_compiler_check_cache_shared(self) -> None:
+        with tempfile.TemporaryDirectory() as d, tempfile.TemporaryDirectory() as bdir:
+            env = get_fake_env('', bdir)
+            env.coredata.set_option(OptionKey('check_cache'), d)
+            cc = env.detect_c_compiler(MachineChoice.HOST)
+            code = 'int main(void) { return 0; }'
+            self.assertEqual(cc.compiles(code, env), (True, False))
+            # A fresh build directory has an empty per-build cache
+            env.coredata.compiler_check_cache.clear()
+            self.assertEqual(cc.compiles(code, env), (True, True))
+            self.assertEqual(cc.compiles(code, env, extra_args=['-DFOO']), (True, False))
+
+    def test_test_resources_order(self) -> None:
+        '''A test waiting for many processors is not overtaken by smaller ones.'''
+        started = []
+
+        async def run(resources, name, cpus, delay):
+            test = mock.Mock(cpus=cpus, memory=0)
+            await resources.acquire(test)
+            started.append(name)
+            await asyncio.sleep(delay)
+            await resources.release(test)
+
+        async def main():
+            resources = TestResources(2, None)
+            tasks = [asyncio.ensure_future(run(resources, 'first', 1, 0.05))]
+            await asyncio.sleep(0)
+            tasks.append(asyncio.ensure_future(run(resources, 'wide', 2, 0)))
+            await asyncio.sleep(0)
+            tasks += [asyncio.ensure_future(run(resources, f'narrow{i}', 1, 0.01)) for i in range(4)]
+            # A cancelled waiter does not block the others
+            cancelled = asyncio.ensure_future(run(resources, 'cancelled', 1, 0))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            await asyncio.gather(*tasks)
+
+        asyncio.get_event_loop().run_until_complete(main())
+        self.assertEqual(started, ['first', 'wide', 'narrow0', 'narrow1', 'narrow2', 'narrow3'])
+
 
 @unittest.skipIf(is_tarball(), 'Skipping because this is a tarball release')
 class DataTests(unittest.TestCase):
@@ -2776,6 +3043,149 @@ class AllPlatformTests(BasePlatformTests):
         self.assertTrue('ENV_B is 3' in other_log)
         self.assertTrue('ENV_C is 2' in other_log)
 
+    def test_test_schedule(self):
+        def start_order():
+            with open(os.path.join(self.logdir, 'testlog.json'), encoding='utf-8') as f:
+                results = [json.loads(l) for l in f]
+            return [r['name'] for r in sorted(results, key=lambda r: r['starttime'])]
+
+        testdir = os.path.join(self.unit_test_dir, '98 test schedule')
+        self.init(testdir)
+        self.build()
+        # Nothing is known about the tests yet
+        out = self._run(self.mtest_command + ['--num-processes=2'])
+        self.assertEqual(start_order(), ['short1', 'short2', 'long'])
+        self.assertNotIn('Predicted time:', out)
+        # The longest test starts first
+        out = self._run(self.mtest_command + ['--num-processes=2'])
+        self.assertEqual(start_order()[0], 'long')
+        self.assertIn('Predicted time:', out)
+        self.assertIn('Actual time:', out)
+        out = self._run(self.mtest_command + ['--num-processes=2', '--schedule=declared'])
+        self.assertEqual(start_order(), ['short1', 'short2', 'long'])
+
+    def test_test_shard(self):
+        def shard(n, extra_args=None):
+            out = self._run(self.mtest_command + ['--list', f'--shard={n}/2'] + (extra_args or []))
+            return set(out.split()) & {'short1', 'short2', 'long'}
+
+        testdir = os.path.join(self.unit_test_dir, '98 test schedule')
+        self.init(testdir)
+        self.build()
+        shards = [shard(1), shard(2)]
+        self.assertEqual(shards[0] | shards[1], {'short1', 'short2', 'long'})
+        self.assertFalse(shards[0] & shards[1])
+        # Each shard only records its own tests in the history of its build
+        # directory, which must not change the parts
+        self._run(self.mtest_command + ['--shard=1/2', '--logbase=shard1'])
+        self.assertEqual([shard(1), shard(2)], shards)
+        self._run(self.mtest_command + ['--shard=2/2', '--logbase=shard2'])
+        self.assertEqual([shard(1), shard(2)], shards)
+        with self.assertRaises(subprocess.CalledProcessError):
+            self._run(self.mtest_command + ['--shard=3/2'])
+
+        # The logs of the shards merge into the log and history of all the tests
+        out = self._run(self.mtest_command + ['--merge-logs',
+                                              os.path.join(self.logdir, 'shard1.json'),
+                                              os.path.join(self.logdir, 'shard2.json')])
+        self.assertRegex(out, r'Ok: +3')
+        with open(os.path.join(self.logdir, 'testlog.json'), encoding='utf-8') as f:
+            self.assertEqual(sorted(json.loads(l)['name'] for l in f), ['long', 'short1', 'short2'])
+
+        # The merged history balances the parts, the long test gets one of its own
+        durations = os.path.join(self.builddir, 'durations.json')
+        os.replace(os.path.join(self.logdir, 'test-history.json'), durations)
+        args = [f'--shard-durations={durations}']
+        self.assertIn({'long'}, [shard(1, args), shard(2, args)])
+        with self.assertRaises(subprocess.CalledProcessError):
+            self._run(self.mtest_command + args)
+
+    def test_failed_first_maxfail(self):
+        def run_tests(*args, fail=True):
+            env = os.environ.copy()
+            env['TEST_FAIL'] = '1' if fail else '0'
+            p = subprocess.run(self.mtest_command + ['--num-processes=1', '--schedule=declared'] + list(args),
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               universal_newlines=True, env=env)
+            print(p.stdout)
+            with open(os.path.join(self.logdir, 'testlog.json'), encoding='utf-8') as f:
+                results = [json.loads(l) for l in f]
+            return p.returncode, [r['name'] for r in sorted(results, key=lambda r: r['starttime'])]
+
+        testdir = os.path.join(self.unit_test_dir, '101 failed first')
+        self.init(testdir)
+        self.build()
+        self.assertEqual(run_tests('--maxfail=1'), (1, ['pass1', 'fail1']))
+        self.assertEqual(run_tests('--failed-first'), (2, ['fail1', 'pass1', 'pass2', 'fail2']))
+        self.assertEqual(run_tests('--failed-first', '--maxfail=1'), (1, ['fail1']))
+        # Passing tests are no longer considered as failed
+        self.assertEqual(run_tests('--failed-first', fail=False), (0, ['fail1', 'fail2', 'pass1', 'pass2']))
+        self.assertEqual(run_tests('--failed-first', fail=False), (0, ['pass1', 'fail1', 'pass2', 'fail2']))
+
+    def test_test_resources(self):
+        testdir = os.path.join(self.unit_test_dir, '99 test resources')
+        self.init(testdir)
+        self.build()
+        self._run(self.mtest_command + ['--num-processes=2', '--schedule=declared'])
+        with open(os.path.join(self.logdir, 'testlog.json'), encoding='utf-8') as f:
+            intervals = {r['name']: (r['starttime'], r['starttime'] + r['duration'])
+                         for r in map(json.loads, f)}
+
+        def overlap(a, b):
+            return intervals[a][0] < intervals[b][1] and intervals[b][0] < intervals[a][1]
+
+        self.assertFalse(overlap('wide1', 'wide2'))
+        self.assertTrue(overlap('narrow1', 'narrow2'))
+        if determine_total_memory() is not None:
+            self.assertFalse(overlap('huge1', 'huge2'))
+
+    def test_test_cached(self):
+        def ran_tests():
+            with open(os.path.join(self.logdir, 'testlog.json'), encoding='utf-8') as f:
+                return sorted(json.loads(l)['name'] for l in f)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            testdir = os.path.join(tmpdir, 'src')
+            shutil.copytree(os.path.join(self.unit_test_dir, '100 test cache'), testdir)
+            self.init(testdir)
+            self.build()
+            out = self._run(self.mtest_command + ['--cached'])
+            self.assertEqual(ran_tests(), ['linked', 'plain'])
+            self.assertNotIn('Cached:', out)
+            out = self._run(self.mtest_command + ['--cached'])
+            self.assertIn('All 2 tests passed before', out)
+
+            # Only the test linking to the library runs again, and keeps
+            # running until it passes
+            valuefile = os.path.join(testdir, 'value.c')
+            with open(valuefile, encoding='utf-8') as f:
+                source = f.read()
+            with open(valuefile, 'w', encoding='utf-8') as f:
+                f.write(source.replace('return 0', 'return 1'))
+            self.build()
+            self.assertFailedTestCount(1, self.mtest_command + ['--cached'])
+            self.assertEqual(ran_tests(), ['linked'])
+            self.assertFailedTestCount(1, self.mtest_command + ['--cached'])
+            self.assertEqual(ran_tests(), ['linked'])
+            with open(valuefile, 'w', encoding='utf-8') as f:
+                f.write(source)
+            self.build()
+            out = self._run(self.mtest_command + ['--cached'])
+            self.assertEqual(ran_tests(), ['linked'])
+            self.assertRegex(out, r'Cached: +1')
+
+            # Different arguments run all tests again
+            self._run(self.mtest_command + ['--cached', '--test-args=-v'])
+            self.assertEqual(ran_tests(), ['linked', 'plain'])
+
+            # So does any change to the environment
+            self._run(self.mtest_command + ['--cached'])
+            out = self._run(self.mtest_command + ['--cached'])
+            self.assertIn('All 2 tests passed before', out)
+            self._run(self.mtest_command + ['--cached'],
+                      override_envvars={'PATH': os.environ['PATH'] + os.pathsep + testdir})
+            self.assertEqual(ran_tests(), ['linked', 'plain'])
+
     def assertFailedTestCount(self, failure_count, command):
         try:
             self._run(command)
@@ -3142,9 +3552,10 @@ class AllPlatformTests(BasePlatformTests):
         self.build()
         # Immediately rebuilding should not do anything
         self.assertBuildIsNoop()
-        # Changing mtime of meson.build should not rebuild anything
+        # Changing mtime of meson.build should neither reconfigure nor
+        # rebuild anything
         self.utime(os.path.join(testdir, 'meson.build'))
-        self.assertReconfiguredBuildIsNoop()
+        self.assertBuildIsNoop()
         # Changing mtime of libefile.c should rebuild the library, but not relink the executable
         self.utime(os.path.join(testdir, 'libfile.c'))
         self.assertBuildRelinkedOnlyTarget('mylib')
@@ -3180,6 +3591,35 @@ class AllPlatformTests(BasePlatformTests):
             self.utime(os.path.join(testdir, f))
             self.assertBuildRelinkedOnlyTarget('prog')
 
+    def test_custom_target_write_if_changed(self):
+        '''
+        Test that outputs of a custom target with write_if_changed that
+        are regenerated with the same content do not cause a rebuild.
+        '''
+        if self.backend is not Backend.ninja:
+            raise unittest.SkipTest(f'write_if_changed is not implemented for {self.backend.name!r} backend')
+        with tempfile.TemporaryDirectory() as tmpdir:
+            testdir = os.path.join(tmpdir, 'src')
+            shutil.copytree(os.path.join(self.unit_test_dir, '97 write if changed'), testdir)
+            self.init(testdir)
+            self.build()
+            header = os.path.join(self.builddir, 'header.h')
+            mtime = os.stat(header).st_mtime_ns
+            # The header is generated again but keeps its timestamp
+            with open(os.path.join(testdir, 'header.h.in'), 'a') as f:
+                f.write('% Another comment\n')
+            self.utime(os.path.join(testdir, 'header.h.in'))
+            out = self.build()
+            self.assertIn('Generating header', out)
+            self.assertNotIn('prog.c', out)
+            self.assertEqual(os.stat(header).st_mtime_ns, mtime)
+            self.assertBuildIsNoop()
+            # Real changes still rebuild the users of the header
+            with open(os.path.join(testdir, 'header.h.in'), 'a') as f:
+                f.write('#define OTHER_VALUE 1\n')
+            self.utime(os.path.join(testdir, 'header.h.in'))
+            self.assertBuildRelinkedOnlyTarget('prog')
+
     def test_source_generator_program_cause_rebuild(self):
         '''
         Test that changes to generator programs in the source tree cause
@@ -4514,6 +4954,102 @@ class AllPlatformTests(BasePlatformTests):
         self.build()
         self.run_tests()
 
+    def test_parallel_target_generation(self):
+        if self.backend is not Backend.ninja:
+            raise unittest.SkipTest(f'{self.backend.name!r} backend does not generate targets in parallel')
+        for name in ['6 linkshared', '49 custom target', '51 run target']:
+            testdir = os.path.join(self.common_test_dir, name)
+            self.init(testdir)
+            serial = Path(self.builddir, 'build.ninja').read_bytes()
+            self.init(testdir, extra_args=['--wipe', '-Dbackend_generate_jobs=4'])
+            self.assertEqual(Path(self.builddir, 'build.ninja').read_bytes(), serial)
+            self.wipe()
+
+    def test_split_build_ninja(self):
+        if self.backend is not Backend.ninja:
+            raise unittest.SkipTest(f'{self.backend.name!r} backend does not write build.ninja')
+        testdir = os.path.join(self.common_test_dir, '157 custom target subdir depend files')
+        self.init(testdir, extra_args=['-Dbackend_split_build_ninja=true'])
+        build_ninja = Path(self.builddir, 'build.ninja').read_text()
+        self.assertIn('subninja meson-private/ninja-fragments/build.ninja\n', build_ninja)
+        self.assertRegex(build_ninja, r'subninja meson-private/ninja-fragments/build@[0-9a-f]{7}@subdir\.ninja\n')
+        from mesonbuild.backend.ninjabackend import NinjaBackend
+        self.assertNotEqual(NinjaBackend.get_fragment_filename('a@b'),
+                            NinjaBackend.get_fragment_filename(os.path.join('a', 'b')))
+        self.build()
+        # Fragments that did not change are not rewritten
+        fragments = Path(self.builddir, 'meson-private', 'ninja-fragments').glob('*.ninja')
+        mtimes = {f: f.stat().st_mtime_ns for f in fragments}
+        self.assertEqual(len(mtimes), 2)
+        self.init(testdir, extra_args=['--reconfigure'])
+        self.assertEqual({f: f.stat().st_mtime_ns for f in mtimes}, mtimes)
+        self.assertBuildIsNoop()
+
+    def test_ninja_shared_variables(self):
+        if self.backend is not Backend.ninja:
+            raise unittest.SkipTest(f'{self.backend.name!r} backend does not write build.ninja')
+        testdir = os.path.join(self.common_test_dir, '120 extract all shared library')
+        self.init(testdir)
+        # The compiler arguments shared by the objects of a library are
+        # only written once
+        build_ninja = Path(self.builddir, 'build.ninja').read_text()
+        self.assertEqual(build_ninja.count(' ARGS = $ARGS_0\n'), 4)
+        self.assertEqual(build_ninja.count('\nARGS_0 = '), 2)
+        for each in self.get_compdb():
+            self.assertNotIn('$ARGS_0', each['command'])
+            self.assertIn('-Wall', each['command'])
+        self.build()
+
+    def test_compdb_generation(self):
+        if self.backend is not Backend.ninja:
+            raise unittest.SkipTest(f'{self.backend.name!r} backend does not write compile_commands.json')
+        testdir = os.path.join(self.common_test_dir, '98 subproject subdir')
+        self.init(testdir)
+        compdb = Path(self.builddir, 'compile_commands.json')
+        sub_compdb = Path(self.builddir, 'subprojects', 'sub', 'compile_commands.json')
+        # Same content as what ninja writes
+        rules = subprocess.check_output(self.build_command + ['-t', 'rules'], cwd=self.builddir,
+                                        universal_newlines=True).split()
+        rules = [r for r in rules if 'COMPILER' in r or 'PCH' in r]
+        ninja_compdb = subprocess.check_output(self.build_command + ['-t', 'compdb', '-x'] + rules,
+                                               cwd=self.builddir)
+        self.assertEqual(json.loads(compdb.read_text()), json.loads(ninja_compdb))
+        self.assertEqual(len(json.loads(compdb.read_text())), 2)
+        # Not rewritten when unchanged
+        mtime = compdb.stat().st_mtime_ns
+        self.init(testdir, extra_args=['--reconfigure'])
+        self.assertEqual(compdb.stat().st_mtime_ns, mtime)
+        # One database per subproject
+        self.setconf('-Dbackend_split_compdb=true')
+        self.build()
+        self.assertEqual([e['file'] for e in json.loads(compdb.read_text())],
+                         [os.path.join(os.path.relpath(testdir, self.builddir), 'prog.c')])
+        self.assertEqual(len(json.loads(sub_compdb.read_text())), 1)
+        self.setconf('-Dbackend_split_compdb=false')
+        self.build()
+        self.assertFalse(sub_compdb.exists())
+        self.assertEqual(len(json.loads(compdb.read_text())), 2)
+
+    def test_failed_generation_cleanup(self):
+        '''
+        If generating the ninja files fails, none of the temporary files
+        are left behind and the previous files are kept.
+        '''
+        if self.backend is not Backend.ninja:
+            raise unittest.SkipTest(f'Not applicable to the {self.backend.name!r} backend')
+        testdir = os.path.join(self.common_test_dir, '98 subproject subdir')
+        self.init(testdir, extra_args=['-Dbackend_split_build_ninja=true', '-Dbackend_split_compdb=true'])
+        before = sorted(p.relative_to(self.builddir) for p in Path(self.builddir).rglob('*'))
+        compdb = Path(self.builddir, 'compile_commands.json').read_text()
+        with mock.patch('mesonbuild.backend.ninjabackend.NinjaBackend.generate_tests',
+                        side_effect=MesonException('generation failed')):
+            with self.assertRaises(RuntimeError):
+                self.init(testdir, extra_args=['--reconfigure'], inprocess=True)
+        after = sorted(p.relative_to(self.builddir) for p in Path(self.builddir).rglob('*'))
+        self.assertEqual([p for p in after if p.name.endswith('~')], [])
+        self.assertEqual([p for p in before if p not in after], [])
+        self.assertEqual(Path(self.builddir, 'compile_commands.json').read_text(), compdb)
+
     def test_wipe_from_builddir(self):
         testdir = os.path.join(self.common_test_dir, '157 custom target subdir depend files')
         self.init(testdir)
@@ -4776,6 +5312,8 @@ class AllPlatformTests(BasePlatformTests):
             ('depends', list),
             ('workdir', (str, None)),
             ('priority', int),
+            ('cpus', int),
+            ('memory', int),
         ]
 
         buildoptions_keylist = [
@@ -5319,6 +5857,70 @@ class AllPlatformTests(BasePlatformTests):
             self._run([*self.meson_command, 'compile', '-C', self.builddir, '--vs-args=-t:{}:Clean'.format(re.sub(r'[\%\$\@\;\.\(\)\']', '_', get_exe_name('trivialprog')))])
             self.assertPathDoesNotExist(os.path.join(self.builddir, get_exe_name('trivialprog')))
 
+    @skipIfNoExecutable('ninja')
+    def test_reconfigure_changed_subdirs(self):
+        if self.backend is not Backend.ninja:
+            raise unittest.SkipTest(f'{self.backend.name!r} backend does not regenerate through the regen checker')
+        with tempfile.TemporaryDirectory() as tmpdir:
+            testdir = os.path.join(tmpdir, 'project')
+            shutil.copytree(os.path.join(self.unit_test_dir, '96 reconfigure subdirs'), testdir)
+
+            def edit(subdir, text, old=None):
+                filename = os.path.join(testdir, subdir, 'meson.build')
+                with open(filename, encoding='utf-8') as f:
+                    code = f.read()
+                with open(filename, 'w', encoding='utf-8') as f:
+                    f.write(code.replace(old, text) if old else code + text)
+
+            self.init(testdir, extra_args=['-Dincremental_regen=true'])
+            self.build()
+            # Only a is evaluated again, with the variables it uses
+            edit('a', "test('a2', executable('a2', 'a2.c', link_with : lib, include_directories : inc))\n")
+            out = self.build()
+            self.assertIn('Evaluated again: a\n', out)
+            self.assertNotIn('Message: b is b', out)
+            self.assertEqual([t['name'] for t in self.introspect('--tests')], ['a', 'a2'])
+            self.assertEqual(sorted(t['name'] for t in self.introspect('--targets')), ['a', 'a2', 'b', 'lib'])
+            self.run_tests()
+            # b_name is used afterwards
+            edit('b', "b_name = 'bee'", "b_name = 'b'")
+            out = self.build()
+            self.assertIn("because b changes variable 'b_name' that is used afterwards", out)
+            self.assertIn('Message: b is bee', out)
+            # Both are evaluated again, in order, and what they added before
+            # is replaced
+            edit('a', '', "test('a2', executable('a2', 'a2.c', link_with : lib, include_directories : inc))\n")
+            edit('b', "executable('b2', 'b.c')\n")
+            out = self.build()
+            self.assertIn('Evaluated again: a, b\n', out)
+            self.assertEqual([t['name'] for t in self.introspect('--tests')], ['a'])
+            self.assertEqual(sorted(t['name'] for t in self.introspect('--targets')), ['a', 'b', 'b2', 'lib'])
+            # cc was not used by a so far
+            edit('a', "message(cc.get_id())\n")
+            out = self.build()
+            self.assertIn("because a uses variable 'cc' that it did not use before", out)
+            # What the attempt logged is dropped
+            self.assertEqual(out.count('Project name:'), 1)
+            # Subdirectories calling other functions are always evaluated with
+            # the whole project
+            edit('a', "summary('a', true)\n")
+            out = self.build()
+            self.assertIn('because a calls summary()', out)
+            edit('a', "message('a')\n")
+            out = self.build()
+            self.assertIn('because a calls summary()', out)
+            # As is the project when anything else changes
+            edit('', "message('top')\n")
+            out = self.build()
+            self.assertNotIn('Evaluated again', out)
+            self.assertIn('Message: top', out)
+            self.assertBuildIsNoop()
+            self.setconf('-Dincremental_regen=false')
+            edit('b', "executable('b3', 'b.c')\n")
+            out = self.build()
+            self.assertNotIn('Evaluated again', out)
+            self.assertIn('Message: b is bee', out)
+
     def test_spurious_reconfigure_built_dep_file(self):
         testdir = os.path.join(self.unit_test_dir, '74 dep files')
 
@@ -5684,13 +6286,17 @@ class AllPlatformTests(BasePlatformTests):
         # This checks a bug where if a non-meson project is used as a third
         # level (or deeper) subproject it doesn't cause a rebuild if the build
         # files for that project are changed
-        testdir = os.path.join(self.unit_test_dir, '85 nested subproject regenerate depends')
-        cmakefile = Path(testdir) / 'subprojects' / 'sub2' / 'CMakeLists.txt'
-        self.init(testdir)
-        self.build()
-        with cmakefile.open('a') as f:
-            os.utime(str(cmakefile))
-        self.assertReconfiguredBuildIsNoop()
+        # Only touching the file does not cause a reconfiguration, so work
+        # on a copy that can be modified.
+        with tempfile.TemporaryDirectory() as tmpdir:
+            testdir = os.path.join(tmpdir, 'project')
+            shutil.copytree(os.path.join(self.unit_test_dir, '85 nested subproject regenerate depends'), testdir)
+            cmakefile = Path(testdir) / 'subprojects' / 'sub2' / 'CMakeLists.txt'
+            self.init(testdir)
+            self.build()
+            with cmakefile.open('a') as f:
+                f.write('# Some change\n')
+            self.assertReconfiguredBuildIsNoop()
 
     def test_version_file(self):
         srcdir = os.path.join(self.common_test_dir, '2 cpp')
@@ -7080,6 +7686,60 @@ class LinuxlikeTests(BasePlatformTests):
         self.assertPathDoesNotExist(os.path.join(self.builddir, 'user@exe/user-unity.c'))
         self.build()
 
+    def test_unity_partition_cost(self):
+        def read_groups():
+            groups = []
+            for f in sorted(glob(os.path.join(self.builddir, 'prog.p', 'prog-unity*.c'))):
+                with open(f) as ifile:
+                    groups.append({os.path.basename(l.strip()[9:-1]) for l in ifile})
+            return groups
+
+        with tempfile.TemporaryDirectory() as testdir:
+            names = ['a', 'b', 'c', 'd', 'heavy']
+            with open(os.path.join(testdir, 'meson.build'), 'w') as f:
+                f.write("project('unity partition', 'c')\n")
+                f.write("executable('prog', 'main.c', {})\n".format(', '.join(f"'{n}.c'" for n in names)))
+            with open(os.path.join(testdir, 'main.c'), 'w') as f:
+                f.write(''.join(f'int {n}(void);\n' for n in names))
+                f.write('int main(void) {{ return {}; }}\n'.format(' + '.join(f'{n}()' for n in names)))
+            for n in names:
+                with open(os.path.join(testdir, f'{n}.c'), 'w') as f:
+                    if n == 'heavy':
+                        f.write('/* padding */\n' * 1000)
+                    f.write(f'int {n}(void) {{ return 0; }}\n')
+
+            # Without build times, heavy.c is expensive because of its size
+            self.init(testdir, extra_args=['-Dunity=on', '-Dunity_size=2', '-Dunity_partition=cost'])
+            groups = read_groups()
+            self.assertEqual(len(groups), 3)
+            self.assertIn({'heavy.c'}, groups)
+            self.build()
+
+            # Make the group with most sources take much longer than the others
+            slow = max(groups, key=len)
+            self.assertGreater(len(slow), 1)
+            lines = []
+            with open(os.path.join(self.builddir, '.ninja_log')) as f:
+                for l in f:
+                    fields = l.split('\t')
+                    m = re.search(r'prog-unity(\d+)\.c\.o$', fields[3]) if len(fields) > 3 else None
+                    if m:
+                        fields[0:2] = ['0', '3000' if groups[int(m.group(1))] == slow else '10']
+                    lines.append('\t'.join(fields))
+            with open(os.path.join(self.builddir, '.ninja_log'), 'w') as f:
+                f.writelines(lines)
+            self.init(testdir, extra_args=['--reconfigure'])
+            groups = read_groups()
+            self.assertEqual(len(groups), 3)
+            # The slow sources are now spread over all unity files
+            self.assertEqual(max(len(g & slow) for g in groups), -(-len(slow) // 3))
+
+            # The times of the old groups do not apply to the new ones, and
+            # sizes alone do not justify going back to the old groups.
+            self.init(testdir, extra_args=['--reconfigure'])
+            self.assertEqual(read_groups(), groups)
+            self.build()
+
     def test_installed_modes(self):
         '''
         Test that files installed by these tests have the correct permissions.
@@ -7493,6 +8153,130 @@ class LinuxlikeTests(BasePlatformTests):
         for i in compdb:
             self.assertIn("-fsanitize=address", i["command"])
 
+    def test_auto_pch(self):
+        with tempfile.TemporaryDirectory() as testdir:
+            os.mkdir(os.path.join(testdir, 'include'))
+            with open(os.path.join(testdir, 'include', 'proj.h'), 'w') as f:
+                f.write('#define PROJ 0\n')
+            with open(os.path.join(testdir, 'meson.build'), 'w') as f:
+                f.write("project('auto pch', 'c')\n")
+                f.write("executable('prog', 'main.c', 'a.c', 'b.c', 'd.c', 'e.c', include_directories : 'include')\n")
+                f.write("executable('win', 'w1.c', 'w2.c', 'w3.c', build_by_default : false)\n")
+            common = ('/* Leading comments are fine */\n#include <stdio.h>\n#include <string.h>\n'
+                      '#include <proj.h>\n#ifdef _WIN32\n#include <windows.h>\n#endif\n')
+            with open(os.path.join(testdir, 'main.c'), 'w') as f:
+                f.write(common + '#include <stdlib.h>\nint a(void);\nint b(void);\nint d(void);\nint e(void);\n'
+                        'int main(void) { return a() + b() + d() + e() + PROJ; }\n')
+            for n in ['a', 'b']:
+                with open(os.path.join(testdir, f'{n}.c'), 'w') as f:
+                    f.write(common + f'int {n}(void) {{ return (int)strlen(""); }}\n')
+            # Must not see stdio.h before its definition
+            with open(os.path.join(testdir, 'd.c'), 'w') as f:
+                f.write('#define _GNU_SOURCE\n#include <stdio.h>\n#include <string.h>\n'
+                        'int d(void) { return (int)strlen(""); }\n')
+            # Nor after a header of the project, which could define some
+            with open(os.path.join(testdir, 'e.c'), 'w') as f:
+                f.write('#include <proj.h>\n#include <stdio.h>\n#include <string.h>\n'
+                        'int e(void) { return (int)strlen("") + PROJ; }\n')
+            for n in ['w1', 'w2', 'w3']:
+                with open(os.path.join(testdir, f'{n}.c'), 'w') as f:
+                    f.write('#include <stdio.h>\n#include <windows.h>\n')
+                    if n == 'w1':
+                        f.write('int main(void) { return 0; }\n')
+
+            self.init(testdir, extra_args=['-Dauto_pch=target'])
+            header = os.path.join(self.builddir, 'prog.p', 'meson_auto_pch-c.h')
+            with open(header) as f:
+                includes = [l for l in f.read().splitlines() if l.startswith('#include')]
+            # proj.h belongs to the project, stdlib.h is not common enough
+            # and windows.h is only included conditionally
+            self.assertEqual(includes, ['#include <stdio.h>', '#include <string.h>'])
+            self.assertIn('Automatic precompiled header for prog (c): stdio.h, string.h.\n', self.get_meson_log())
+            if not is_windows():
+                # Not found
+                self.assertIn('Automatic precompiled header for win (c): stdio.h.\n', self.get_meson_log())
+            for i in self.get_compdb():
+                if i['file'].endswith(('d.c', 'e.c')):
+                    self.assertNotIn('meson_auto_pch-c.h', i['command'])
+                else:
+                    self.assertIn('meson_auto_pch-c.h', i['command'])
+            self.build()
+
+            self.setconf('-Db_pch=false')
+            self.build()
+            for i in self.get_compdb():
+                self.assertNotIn('meson_auto_pch-c.h', i['command'])
+
+    def test_shared_pch(self):
+        with tempfile.TemporaryDirectory() as testdir:
+            os.mkdir(os.path.join(testdir, 'pch'))
+            with open(os.path.join(testdir, 'pch', 'common.h'), 'w') as f:
+                f.write('#include <stdio.h>\n')
+            for n in ['a', 'b', 'c']:
+                with open(os.path.join(testdir, f'{n}.c'), 'w') as f:
+                    f.write('int main(void) { printf("Hello\\n"); return 0; }\n')
+            with open(os.path.join(testdir, 'meson.build'), 'w') as f:
+                f.write("project('shared pch', 'c')\n"
+                        "executable('a', 'a.c', c_pch : 'pch/common.h')\n"
+                        "executable('b', 'b.c', c_pch : 'pch/common.h')\n"
+                        "executable('c', 'c.c', c_pch : 'pch/common.h', c_args : '-DOTHER')\n")
+            self.init(testdir)
+            pch_dirs = {}
+            for i in self.get_compdb():
+                m = re.search(r'-I(meson-pch/[0-9a-f]+) ', i['command'])
+                pch_dirs[os.path.basename(i['file'])] = m.group(1) if m else None
+            # c has different arguments, so it has its own
+            self.assertIsNotNone(pch_dirs['a.c'])
+            self.assertEqual(pch_dirs['a.c'], pch_dirs['b.c'])
+            self.assertIsNone(pch_dirs['c.c'])
+            self.build()
+            self.assertPathExists(os.path.join(self.builddir, pch_dirs['a.c'], 'common.h.gch'))
+            self.assertPathDoesNotExist(os.path.join(self.builddir, 'a.p', 'common.h.gch'))
+            self.assertPathExists(os.path.join(self.builddir, 'c.p', 'common.h.gch'))
+
+            # Back to a precompiled header of its own
+            with open(os.path.join(testdir, 'meson.build'), 'w') as f:
+                f.write("project('shared pch', 'c')\n"
+                        "executable('a', 'a.c', c_pch : 'pch/common.h')\n")
+            self.build()
+            self.assertPathExists(os.path.join(self.builddir, 'a.p', 'common.h.gch'))
+            self.assertNotIn('meson-pch', self.get_compdb()[0]['command'])
+
+    def test_heavy_link_pool(self):
+        def link_pools():
+            pools = {}
+            with open(os.path.join(self.builddir, 'build.ninja')) as f:
+                statement = None
+                for line in f:
+                    if line.startswith('build '):
+                        statement = line.split(':')[0][len('build '):]
+                    elif line.startswith(' pool = ') and statement in ('big', 'small'):
+                        pools[statement] = line.split(' = ')[1].strip()
+            return pools
+
+        with tempfile.TemporaryDirectory() as testdir:
+            for n in ['big', 'small']:
+                with open(os.path.join(testdir, f'{n}.c'), 'w') as f:
+                    f.write('int main(void) { return 0; }\n')
+            with open(os.path.join(testdir, 'meson.build'), 'w') as f:
+                f.write("project('heavy links', 'c')\n"
+                        "executable('big', 'big.c')\n"
+                        "executable('small', 'small.c')\n")
+            self.init(testdir, extra_args=['-Dbackend_max_heavy_links=1', '-Db_lto=true'])
+            self.build()
+            with open(os.path.join(self.builddir, 'build.ninja')) as f:
+                self.assertIn('pool heavy_link_pool\n  depth = 1\n', f.read())
+            self.assertEqual(link_pools(), {})
+            # Pretend that the object of big was huge in the last build
+            os.truncate(os.path.join(self.builddir, 'big.p', 'big.c.o'), 256 * 1024 * 1024)
+            self.setconf('-Dbackend_max_heavy_links=2')
+            self.build('build.ninja')
+            self.assertEqual(link_pools(), {'big': 'heavy_link_pool'})
+            # Without link time optimization it is not heavy enough
+            self.setconf('-Db_lto=false')
+            self.build('build.ninja')
+            self.assertEqual(link_pools(), {})
+
     def test_cross_find_program(self):
         testdir = os.path.join(self.unit_test_dir, '11 cross prog')
         crossfile = tempfile.NamedTemporaryFile(mode='w')
@@ -0,0 +1,11 @@
+#if defined _WIN32 || defined __CYGWIN__
+#define DLL_IMPORT __declspec(dllimport)
+#else
+#define DLL_IMPORT
+#endif
+
+DLL_IMPORT int value(void);
+
+int main(void) {
+    return value();
+}
@@ -0,0 +1,7 @@
+#include <stdlib.h>
+#include <string.h>
+
+int main(void) {
+    const char *value = getenv("VALUE");
+    return value != NULL && strcmp(value, "0") == 0 ? 0 : 1;
+}
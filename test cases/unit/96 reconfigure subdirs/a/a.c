@@ -0,0 +1,7 @@
+#include <zero.h>
+
+int lib(void);
+
+int main(void) {
+    return lib() + ZERO;
+}
@@ -0,0 +1 @@
+#define ZERO 0
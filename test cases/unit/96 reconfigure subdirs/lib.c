@@ -0,0 +1 @@
+int lib(void) { return 0; }
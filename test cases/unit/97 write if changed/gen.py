@@ -0,0 +1,10 @@
+#!/usr/bin/env python3
+
+# Always rewrites the output, without the comments of the input
+
+import sys
+
+with open(sys.argv[1]) as f:
+    lines = [l for l in f if not l.startswith('%')]
+with open(sys.argv[2], 'w') as f:
+    f.writelines(lines)
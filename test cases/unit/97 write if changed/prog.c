@@ -0,0 +1,5 @@
+#include "header.h"
+
+int main(void) {
+    return RETURN_VALUE;
+}
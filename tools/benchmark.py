@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+
+# Copyright 2021 The Meson development team
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Micro benchmarks of Meson internals on synthetic data.
+
+Run from the source root, e.g.:
+
+    tools/benchmark.py coredata --size 20000
+    tools/benchmark.py build_data --size 20000
+    tools/benchmark.py parse --size 500
+    tools/benchmark.py lexer
+    tools/benchmark.py ast --size 500
+    tools/benchmark.py foreach --size 100000
+    tools/benchmark.py ninja --size 2000
+    tools/benchmark.py depfile --size 100000
+    tools/benchmark.py auto_pch --size 20
+'''
+
+import argparse
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import typing as T
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mesonbuild import build, coredata, depfile, mparser  # noqa: E402
+from mesonbuild.compilers.compilers import CompileResult  # noqa: E402
+from mesonbuild.mesonlib import MesonException  # noqa: E402
+
+BENCHMARKS = {}  # type: T.Dict[str, T.Callable[[argparse.Namespace], None]]
+
+def benchmark(func: T.Callable[[argparse.Namespace], None]) -> T.Callable[[argparse.Namespace], None]:
+    BENCHMARKS[func.__name__.replace('bench_', '')] = func
+    return func
+
+def timeit(name: str, func: T.Callable[[], T.Any], iterations: int) -> float:
+    best = float('inf')
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    print(f'{name:<50} {best * 1000:10.2f} ms')
+    return best
+
+def fake_coredata(scratch_dir: str) -> coredata.CoreData:
+    options = argparse.Namespace(cross_file=None, native_file=[], cmd_line_options={})
+    return coredata.CoreData(options, scratch_dir, [sys.executable, 'meson.py'])
+
+@benchmark
+def bench_coredata(args: argparse.Namespace) -> None:
+    '''Loading coredata.dat with a big compiler check cache.'''
+    with tempfile.TemporaryDirectory() as build_dir:
+        private_dir = os.path.join(build_dir, 'meson-private')
+        os.mkdir(private_dir)
+        cdata = fake_coredata(private_dir)
+        for i in range(args.size):
+            code = f'#include <header{i}.h>\nint main(void) {{ return 0; }}\n'
+            key = (('cc',), '10.2.1', code, ('-I/usr/include/foo', '-DBAR=1'), 'compile')
+            cdata.compiler_check_cache[key] = CompileResult('', 'some warning\n' * 4, list(key[3]), 0)
+        coredata.save(cdata, build_dir)
+
+        # What loading used to cost when the check cache was part of coredata.dat
+        monolithic = os.path.join(private_dir, 'monolithic.dat')
+        state = cdata.__dict__.copy()
+        with open(monolithic, 'wb') as f:
+            pickle.dump(state, f)
+
+        def load_monolithic() -> None:
+            with open(monolithic, 'rb') as f:
+                pickle.load(f)
+
+        def load_with_cache() -> None:
+            len(coredata.load(build_dir).compiler_check_cache)
+
+        for fname in ['coredata.dat', 'compiler_check_cache.dat', 'monolithic.dat']:
+            print(f'{fname:<50} {os.path.getsize(os.path.join(private_dir, fname)):10} bytes')
+        timeit('monolithic load', load_monolithic, args.iterations)
+        timeit('coredata.load() (mconf, mintro)', lambda: coredata.load(build_dir), args.iterations)
+        timeit('coredata.load() + check cache (reconfigure)', load_with_cache, args.iterations)
+        timeit('coredata.save() without changes', lambda: coredata.save(cdata, build_dir), args.iterations)
+
+@benchmark
+def bench_build_data(args: argparse.Namespace) -> None:
+    '''Loading build.dat of a project with many targets.'''
+    with tempfile.TemporaryDirectory() as build_dir:
+        private_dir = os.path.join(build_dir, 'meson-private')
+        os.mkdir(private_dir)
+        b = build.Build.__new__(build.Build)
+        b.__dict__.update(project_name='bench', test_setups={}, test_setup_default_name=None,
+                          devenv=[], targets={})
+        for i in range(args.size):
+            t = build.RunTarget(f'target{i}', [sys.executable, '-c', f'print({i})'], [], f'sub{i % 100}', '')
+            b.targets[t.get_id()] = t
+        filename = os.path.join(private_dir, 'build.dat')
+        build.save(b, filename)
+
+        print(f'{"build.dat":<50} {os.path.getsize(filename):10} bytes')
+        timeit('build.load() (mdist, mconf)', lambda: build.load(build_dir), args.iterations)
+        timeit("build.load_chunk('test_setups') (meson test)",
+               lambda: build.load_chunk(build_dir, 'test_setups'), args.iterations)
+        timeit("build.load_chunk('devenv') (meson devenv)",
+               lambda: build.load_chunk(build_dir, 'devenv'), args.iterations)
+
+def synthetic_build_file(index: int) -> str:
+    lines = [f"# Build file number {index}",
+             f"sources_{index} = files("]
+    lines += [f"  'src/file{i}.c'," for i in range(20)]
+    lines += [")",
+              f"conf_{index} = configuration_data()",
+              f"foreach opt : ['a', 'b', 'c']",
+              f"  conf_{index}.set('HAVE_' + opt.to_upper(), get_option(opt))",
+              "endforeach",
+              f"if host_machine.system() == 'linux' and not get_option('foo')",
+              f"  lib_{index} = static_library('lib{index}', sources_{index}, include_directories : inc,",
+              f"                             c_args : ['-DFOO={index}', '-DBAR'], install : true)",
+              "else",
+              f"  lib_{index} = shared_library('lib{index}', sources_{index}, version : '1.2.3')",
+              "endif",
+              f"test('test{index}', executable('test{index}', 'test.c', link_with : lib_{index}))",
+              ""]
+    return '\n'.join(lines)
+
+@benchmark
+def bench_parse(args: argparse.Namespace) -> None:
+    '''Parsing a tree of --size build files, with and without the parse cache.'''
+    with tempfile.TemporaryDirectory() as build_dir:
+        cache = mparser.ParseCache(os.path.join(build_dir, 'parse-cache'))
+        files = [(synthetic_build_file(i), f'/src/dir{i}/meson.build') for i in range(args.size)]
+        print(f'{"source":<50} {sum(len(c) for c, _ in files):10} bytes')
+
+        def parse() -> None:
+            for code, filename in files:
+                mparser.Parser(code, filename).parse()
+
+        def parse_cached() -> None:
+            for code, filename in files:
+                cache.parse(code, filename)
+
+        timeit('Parser.parse()', parse, args.iterations)
+        parse_cached()
+        print(f'{"cache entries":<50} {sum(os.path.getsize(os.path.join(cache.cache_dir, f)) for f in os.listdir(cache.cache_dir)):10} bytes')
+        timeit('ParseCache.parse() (reconfigure)', parse_cached, args.iterations)
+
+@benchmark
+def bench_lexer(args: argparse.Namespace) -> None:
+    '''Lexing all the build files of the test suite.'''
+    root = Path(__file__).resolve().parent.parent / 'test cases'
+    files = []  # type: T.List[T.Tuple[str, str]]
+    for f in sorted(root.glob('**/meson.build')):
+        code = f.read_text(encoding='utf-8', errors='replace')
+        try:
+            list(mparser.Lexer(code).lex(str(f)))
+        except MesonException:
+            # Some tests check lexer errors
+            continue
+        files.append((code, str(f)))
+    print(f'{"corpus":<50} {sum(c.count(chr(10)) for c, _ in files):10} lines')
+
+    def lex() -> None:
+        for code, filename in files:
+            for _ in mparser.Lexer(code).lex(filename):
+                pass
+
+    timeit('Lexer.lex()', lex, args.iterations)
+
+@benchmark
+def bench_ast(args: argparse.Namespace) -> None:
+    '''Time and memory needed to build and walk the trees of --size build files.'''
+    from mesonbuild.ast import AstIDGenerator, AstIndentationGenerator
+    files = [(synthetic_build_file(i), f'/src/dir{i}/meson.build') for i in range(args.size)]
+
+    tracemalloc.start()
+    trees = [mparser.Parser(code, filename).parse() for code, filename in files]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{"memory of the trees":<50} {size:10} bytes')
+    del trees
+
+    tracemalloc.start()
+    tokens = [list(mparser.Lexer(code).lex(filename)) for code, filename in files]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{"memory of the tokens":<50} {size:10} bytes')
+    del tokens
+
+    timeit('Parser.parse()', lambda: [mparser.Parser(code, filename).parse() for code, filename in files],
+           args.iterations)
+    trees = [mparser.Parser(code, filename).parse() for code, filename in files]
+
+    def walk() -> None:
+        for tree in trees:
+            tree.accept(AstIDGenerator())
+            tree.accept(AstIndentationGenerator())
+
+    timeit('visitors', walk, args.iterations)
+
+FOREACH_CODE = '''
+total = 0
+foreach j : range(@SIZE@)
+  names = []
+  conf = {}
+  foreach i : range(100)
+    name = 'item_@0@'.format(i)
+    if i.is_even() and not name.contains('7')
+      names += name.to_upper()
+    elif name.endswith('3') or i % 5 == 0
+      conf += {name.underscorify(): i}
+    else
+      total += i
+    endif
+  endforeach
+  foreach n : names
+    if conf.has_key(n.to_lower()) or names.length() > 0 and n.startswith('ITEM')
+      total += n.split('_').get(1).to_int()
+    endif
+  endforeach
+endforeach
+'''
+
+@benchmark
+def bench_foreach(args: argparse.Namespace) -> None:
+    '''Interpreting loops with about --size iterations using builtin types only.'''
+    from mesonbuild import environment
+    from mesonbuild.interpreter import Interpreter
+    with tempfile.TemporaryDirectory() as build_dir:
+        options = argparse.Namespace(cross_file=None, native_file=[], cmd_line_options={},
+                                     backend='ninja', wrap_mode=None, prefix='')
+        env = environment.Environment('', build_dir, options)
+        intr = Interpreter(build.Build(env), mock=True)
+        code = FOREACH_CODE.replace('@SIZE@', str(max(1, args.size // 100)))
+        ast = mparser.Parser(code, 'meson.build').parse()
+        timeit('InterpreterBase.evaluate_codeblock()', lambda: intr.evaluate_codeblock(ast), args.iterations)
+
+def synthetic_project(source_dir: str, num_sources: int) -> None:
+    lines = ["project('bench', 'c')",
+             "inc = include_directories('include')"]
+    os.mkdir(os.path.join(source_dir, 'include'))
+    for i in range(max(1, num_sources // 20)):
+        subdir = os.path.join(source_dir, f'sub{i}')
+        os.mkdir(subdir)
+        sources = [f's{j}.c' for j in range(20)]
+        for s in sources:
+            Path(subdir, s).write_text(f'int f{i}_{s[:-2]}(void) {{ return {i}; }}\n')
+        Path(subdir, 'meson.build').write_text(
+            f"lib{i} = static_library('lib{i}', {sources!r}, include_directories : inc,\n"
+            f"                         c_args : ['-DLIB={i}', '-DFOO=\"bar\"'])\n")
+        lines.append(f"subdir('sub{i}')")
+    Path(source_dir, 'meson.build').write_text('\n'.join(lines) + '\n')
+
+@benchmark
+def bench_ninja(args: argparse.Namespace) -> None:
+    '''Configuring a project with --size C files in static libraries of 20 files.'''
+    import resource
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source_dir = os.path.join(tmpdir, 'src')
+        build_dir = os.path.join(tmpdir, 'build')
+        os.mkdir(source_dir)
+        synthetic_project(source_dir, args.size)
+        meson = [sys.executable, str(Path(__file__).resolve().parent.parent / 'meson.py')]
+        subprocess.run(meson + ['setup', build_dir, source_dir], check=True, stdout=subprocess.DEVNULL)
+        print(f'{"build.ninja":<50} {os.path.getsize(os.path.join(build_dir, "build.ninja")):10} bytes')
+
+        def regenerate() -> None:
+            subprocess.run(meson + ['setup', '--reconfigure', build_dir, source_dir],
+                           check=True, stdout=subprocess.DEVNULL)
+
+        timeit('meson setup --reconfigure', regenerate, args.iterations)
+        # Includes the memory used by the interpreter, but the build
+        # statements dominate it for big projects.
+        maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        print(f'{"peak RSS":<50} {maxrss:10} KiB')
+
+def legacy_depfile_parse(lines: T.Iterable[str]) -> T.List[depfile.Rule]:
+    # The character by character parser depfile.parse() replaced
+    rules = []  # type: T.List[depfile.Rule]
+    targets = []  # type: T.List[str]
+    deps = []  # type: T.List[str]
+    in_deps = False
+    out = ''
+    for line in lines:
+        if not line.endswith('\n'):
+            line += '\n'
+        escape = None
+        for c in line:
+            if escape:
+                if escape == '$' and c != '$':
+                    out += '$'
+                if escape == '\\' and c == '\n':
+                    continue
+                out += c
+                escape = None
+                continue
+            if c == '\\' or c == '$':
+                escape = c
+                continue
+            elif c in (' ', '\n'):
+                if out != '':
+                    if in_deps:
+                        deps.append(out)
+                    else:
+                        targets.append(out)
+                out = ''
+                if c == '\n':
+                    rules.append((targets, deps))
+                    targets = []
+                    deps = []
+                    in_deps = False
+                continue
+            elif c == ':':
+                targets.append(out)
+                out = ''
+                in_deps = True
+                continue
+            out += c
+    return rules
+
+@benchmark
+def bench_depfile(args: argparse.Namespace) -> None:
+    '''Parsing depfiles with --size dependencies in total.'''
+    lines = ['out/gen\\ file.o out/gen$$.h: \\\n']
+    lines += [f'  /usr/include/some\\ dir/header{i}.h ../src/sub{i % 100}/file{i}.c \\\n' for i in range(args.size // 2)]
+    lines += ['  ../src/last.c\n', '\n', '../src/last.c:\n']
+    print(f'{"depfile":<50} {sum(len(l) for l in lines):10} bytes')
+    if legacy_depfile_parse(lines) != depfile.parse(lines):
+        raise SystemExit('depfile.parse() does not match the legacy parser')
+    timeit('legacy character by character parser', lambda: legacy_depfile_parse(lines), args.iterations)
+    timeit('depfile.parse()', lambda: depfile.parse(lines), args.iterations)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filenames = []
+        chunk = max(1, len(lines) // 100)
+        for i in range(0, len(lines), chunk):
+            filenames.append(os.path.join(tmpdir, f'{i}.d'))
+            Path(filenames[-1]).write_text(''.join(lines[i:i + chunk]), encoding='utf-8')
+
+        def parse_serially() -> None:
+            for f in filenames:
+                with open(f, encoding='utf-8') as fp:
+                    depfile.parse(fp)
+
+        timeit(f'depfile.parse() of {len(filenames)} files', parse_serially, args.iterations)
+        timeit(f'depfile.parse_files() of {len(filenames)} files', lambda: depfile.parse_files(filenames),
+               args.iterations)
+
+@benchmark
+def bench_auto_pch(args: argparse.Namespace) -> None:
+    '''Building an executable of --size C++ files using the standard library, without and with auto_pch.'''
+    from mesonbuild.backend.backends import read_ninja_log
+    headers = ['algorithm', 'functional', 'iostream', 'map', 'memory', 'regex', 'sstream', 'string', 'vector']
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source_dir = os.path.join(tmpdir, 'src')
+        build_dir = os.path.join(tmpdir, 'build')
+        os.mkdir(source_dir)
+        sources = [f's{i}.cpp' for i in range(args.size)]
+        for i, s in enumerate(sources):
+            Path(source_dir, s).write_text(''.join(f'#include <{h}>\n' for h in headers) +
+                                           f'int f{i}() {{ return std::vector<int>{{{i}}}.front(); }}\n')
+        Path(source_dir, 'main.cpp').write_text('int main() { return 0; }\n')
+        Path(source_dir, 'meson.build').write_text(
+            f"project('bench', 'cpp')\nexecutable('prog', 'main.cpp', {sources!r})\n")
+        meson = [sys.executable, str(Path(__file__).resolve().parent.parent / 'meson.py')]
+        subprocess.run(meson + ['setup', build_dir, source_dir], check=True, stdout=subprocess.DEVNULL)
+        for value in ['off', 'target']:
+            subprocess.run(meson + ['configure', build_dir, f'-Dauto_pch={value}'], check=True, stdout=subprocess.DEVNULL)
+            subprocess.run(['ninja', '-C', build_dir, 'build.ninja'], check=True, stdout=subprocess.DEVNULL)
+
+            def clean_build() -> None:
+                subprocess.run(['ninja', '-C', build_dir, 'clean'], check=True, stdout=subprocess.DEVNULL)
+                subprocess.run(['ninja', '-C', build_dir], check=True, stdout=subprocess.DEVNULL)
+
+            timeit(f'clean build with auto_pch={value}', clean_build, args.iterations)
+            durations = read_ninja_log(os.path.join(build_dir, '.ninja_log'))
+            total = sum(d for o, d in durations.items() if o.endswith(('.o', '.obj', '.gch', '.pch')))
+            print(f'{"  compile time of all objects and headers":<50} {total:10} ms')
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS), nargs='+')
+    parser.add_argument('--size', type=int, default=10000,
+                        help='Size of the synthetic input, its meaning depends on the benchmark.')
+    parser.add_argument('--iterations', type=int, default=5,
+                        help='Number of runs, the best one is reported.')
+    args = parser.parse_args()
+    for name in args.benchmark:
+        print(f'{name}: {BENCHMARKS[name].__doc__}')
+        BENCHMARKS[name](args)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())